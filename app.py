@@ -1,51 +1,107 @@
+import os
+import sqlite3
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from config.accounts import ACCOUNTS
+from tweet_aggregates import AGGREGATE_COLUMNS, TABLES, build_aggregates, has_aggregates, read_aggregate
+from thread_index import INDEX_PATH as THREAD_INDEX_PATH
+from tweet_search import INDEX_PATH, search
+from tweet_store import has_dataset, prepare_tweets, read_tweets
+
 # Title of the app
 st.title('Multilingual Tweet Sentiment and Topic Analysis for Multiple Accounts')
 
 st.markdown('''This application allows you to analyze tweets from multiple accounts,
 including performing sentiment and topic analysis to understand user feedback in multiple languages.''')
 
+# "postgres" serves counts, rankings and tweet lists from the database (see dashboard_db.py)
+USE_DATABASE = os.environ.get("DASHBOARD_BACKEND", "files") == "postgres"
+# Seconds database results are reused before new rows show up
+DB_CACHE_TTL = 60
+
+# Map each account to its corresponding CSV file
+account_files = {account: config['final'] for account, config in ACCOUNTS.items()}
+
+@st.cache_data(ttl=DB_CACHE_TTL)
+def load_accounts():
+    """The accounts to offer: every account with tweets in the database, or the configured CSVs."""
+    if not USE_DATABASE:
+        return list(account_files)
+    from dashboard_db import list_accounts
+    return list_accounts()
+
 # Sidebar setup for account selection
 st.sidebar.title("Select Account")
-account = st.sidebar.selectbox("Choose an account to analyze", ["Cashe App", "Fibe India", "Home Credit", "Kreditbee"])
+accounts = load_accounts()
+if not accounts:
+    st.error("No accounts have tweets in the database yet. Run `python dashboard_db.py load` to add them.")
+    st.stop()
+account = st.sidebar.selectbox("Choose an account to analyze", accounts)
 
-# Map each account to its corresponding CSV file
-account_files = {
-    'Home Credit': 'final_tweets/HomeCredit.csv',
-    'Fibe India': "final_tweets/Fibe.csv",
-    'Cashe App': 'final_tweets/CasheApp.csv',
-    'Kreditbee': 'final_tweets/KreditBee.csv'
-}
+# Columns the sample tweet tables need
+SAMPLE_COLUMNS = ('author_name', 'text', 'timestamp', 'sentiment', 'topics')
 
 # Function to load and preprocess data
 @st.cache_data  # Cache the data loading to improve performance
-def load_data(file_path):
+def load_data(account, columns=None):
+    """Load an account's tweets, reading only the given columns when the Parquet dataset is available."""
     try:
-        df = pd.read_csv(file_path)
-        # Add sentiment score mapping
-        sentiment_map = {'positive': 5, 'neutral': 2.5, 'negative': 0}
-        df['score'] = df['sentiment'].map(sentiment_map)
+        slug = ACCOUNTS[account]['slug']
+        if has_dataset(slug):
+            df = read_tweets(slug, columns)
+        else:
+            df = pd.read_csv(account_files[account], usecols=list(columns) if columns else None)
+            df = prepare_tweets(df) if 'timestamp' in df else df
+        if 'sentiment' in df:
+            # Add sentiment score mapping
+            sentiment_map = {'positive': 5, 'neutral': 2.5, 'negative': 0}
+            df['score'] = df['sentiment'].astype(str).map(sentiment_map)
         return df
     except Exception as e:
-        st.error(f"Error loading data from {file_path}: {str(e)}")
+        st.error(f"Error loading data for {account}: {str(e)}")
+        return None
+
+@st.cache_data(ttl=DB_CACHE_TTL if USE_DATABASE else None)
+def load_aggregates(account):
+    """Load an account's precomputed summary tables, building them from its tweets if they were never published."""
+    try:
+        if USE_DATABASE:
+            from dashboard_db import read_db_aggregates
+            return read_db_aggregates(account)
+        slug = ACCOUNTS[account]['slug']
+        if has_aggregates(slug):
+            return {name: read_aggregate(slug, name) for name in TABLES}
+        df = load_data(account, tuple(AGGREGATE_COLUMNS))
+        return build_aggregates(df) if df is not None else None
+    except Exception as e:
+        st.error(f"Error loading aggregates for {account}: {str(e)}")
         return None
 
-# Load all datasets at startup for ranking
-all_account_data = {}
-overall_scores = {}
+@st.cache_data(ttl=DB_CACHE_TTL)
+def load_tweet_list(account, sentiment=None, topic=None, limit=10):
+    """An account's newest tweets with the given sentiment or topic, read from the database."""
+    from dashboard_db import recent_tweets
+    return recent_tweets(account, sentiment, topic, limit)
 
-for acc, file_path in account_files.items():
-    df = load_data(file_path)
-    if df is not None:
-        all_account_data[acc] = df
-        overall_scores[acc] = df['score'].mean()
+@st.cache_data(ttl=DB_CACHE_TTL if USE_DATABASE else None)
+def load_rankings():
+    """Rank accounts from their precomputed summaries, or the database's score rollup."""
+    if USE_DATABASE:
+        from dashboard_db import account_rankings
+        return account_rankings()
+    overall_scores = {}
+    for acc in account_files:
+        acc_aggregates = load_aggregates(acc)
+        if acc_aggregates is not None:
+            overall_scores[acc] = acc_aggregates['summary']['score'].iloc[0]
+    ranked_df = pd.DataFrame(overall_scores.items(), columns=['Account', 'Overall Sentiment Score'])
+    return ranked_df.sort_values('Overall Sentiment Score', ascending=False)
 
 # Display rankings
-ranked_df = pd.DataFrame(overall_scores.items(), columns=['Account', 'Overall Sentiment Score'])
-ranked_df = ranked_df.sort_values('Overall Sentiment Score', ascending=False)
+ranked_df = load_rankings()
 
 st.markdown("### Ranking of Accounts Based on Overall Sentiment Score")
 st.write(ranked_df)
@@ -55,16 +111,18 @@ fig = px.bar(ranked_df, x='Account', y='Overall Sentiment Score', color='Overall
              title="Overall Sentiment Score by Account", range_y=[0, 5])
 st.plotly_chart(fig)
 
-# Load data for selected account
-tweet_data = all_account_data.get(account)
+# Load the summary tables for selected account; raw tweets are only read when a table of tweets is shown
+aggregates = load_aggregates(account)
 
-if tweet_data is None:
+if aggregates is None:
     st.error(f"Could not load data for {account}")
     st.stop()
 
 # Display dataset information
 if st.checkbox("Show Raw Data"):
-    st.write(tweet_data.head(50))
+    raw_data = load_tweet_list(account, limit=50) if USE_DATABASE else load_data(account)
+    if raw_data is not None:
+        st.write(raw_data.head(50))
 
 # Main analysis selection
 analysis_type = st.sidebar.radio("Choose Analysis Type", ["Sentiment Analysis", "Topic Analysis"])
@@ -76,17 +134,22 @@ if analysis_type == "Sentiment Analysis":
     # Sidebar options for sentiment filtering
     st.sidebar.subheader('Filter by Sentiment')
     sentiment_choice = st.sidebar.radio('Sentiment Type', ('positive', 'negative', 'neutral'))
-    filtered_data = tweet_data[tweet_data['sentiment'] == sentiment_choice]
 
-    st.write(f"### Sample {sentiment_choice} Tweets from {account}")
-    st.write(filtered_data[['author_name', 'text', 'timestamp']].head(10))
+    if st.checkbox(f"Show sample {sentiment_choice} tweets"):
+        if USE_DATABASE:
+            filtered_data = load_tweet_list(account, sentiment=sentiment_choice)
+        else:
+            tweet_data = load_data(account, SAMPLE_COLUMNS)
+            filtered_data = tweet_data[tweet_data['sentiment'] == sentiment_choice] if tweet_data is not None else None
+        if filtered_data is not None:
+            st.write(f"### Sample {sentiment_choice} Tweets from {account}")
+            st.write(filtered_data[['author_name', 'text', 'timestamp']].head(10))
 
     # Visualization options
     st.sidebar.subheader('Sentiment Visualization')
     sentiment_visualization = st.sidebar.selectbox("Select Visualization", ["Histogram", "Pie Chart"])
 
-    sentiment_counts = tweet_data['sentiment'].value_counts().reset_index()
-    sentiment_counts.columns = ['Sentiment', 'Count']
+    sentiment_counts = aggregates['sentiment_counts']
 
     if sentiment_visualization == "Histogram":
         fig = px.bar(sentiment_counts, x='Sentiment', y='Count', color='Count',
@@ -100,21 +163,25 @@ if analysis_type == "Sentiment Analysis":
 elif analysis_type == "Topic Analysis":
     st.header("Topic Analysis")
 
-    topics = sorted(tweet_data['topics'].unique())
+    topic_counts = aggregates['topic_counts']
+    topics = sorted(topic_counts['Topic'])
     
     st.sidebar.subheader('Filter by Topic')
     selected_topic = st.sidebar.selectbox("Select Topic", topics)
-    topic_filtered_data = tweet_data[tweet_data['topics'] == selected_topic]
 
-    st.write(f"### Tweets on the Topic: {selected_topic} for {account}")
-    st.write(topic_filtered_data[['author_name', 'text', 'timestamp']].head(10))
+    if st.checkbox("Show tweets on this topic"):
+        if USE_DATABASE:
+            topic_filtered_data = load_tweet_list(account, topic=selected_topic)
+        else:
+            tweet_data = load_data(account, SAMPLE_COLUMNS)
+            topic_filtered_data = tweet_data[tweet_data['topics'] == selected_topic] if tweet_data is not None else None
+        if topic_filtered_data is not None:
+            st.write(f"### Tweets on the Topic: {selected_topic} for {account}")
+            st.write(topic_filtered_data[['author_name', 'text', 'timestamp']].head(10))
 
     st.sidebar.subheader("Topic Visualization")
     topic_visualization = st.sidebar.selectbox("Select Visualization Type", ["Bar Chart", "Pie Chart"])
 
-    topic_counts = tweet_data['topics'].value_counts().reset_index()
-    topic_counts.columns = ['Topic', 'Count']
-
     if topic_visualization == "Bar Chart":
         fig = px.bar(topic_counts, x='Topic', y='Count', color='Count',
                     title=f'Topic Frequency for {account}')
@@ -127,13 +194,8 @@ elif analysis_type == "Topic Analysis":
 st.header("Monthly Trends")
 
 try:
-    # Convert timestamp to datetime
-    tweet_data['year_month'] = pd.to_datetime(tweet_data['timestamp']).dt.to_period('M').dt.to_timestamp()
-
     # Monthly sentiment trends
-    monthly_sentiment_counts = (tweet_data.groupby(['year_month', 'sentiment'])
-                              .size()
-                              .reset_index(name='count'))
+    monthly_sentiment_counts = aggregates['monthly_sentiment']
     
     fig_sentiment = px.line(monthly_sentiment_counts, 
                           x='year_month', 
@@ -149,9 +211,7 @@ try:
     st.plotly_chart(fig_sentiment)
 
     # Monthly topic trends
-    monthly_topic_counts = (tweet_data.groupby(['year_month', 'topics'])
-                          .size()
-                          .reset_index(name='count'))
+    monthly_topic_counts = aggregates['monthly_topics']
     
     fig_topic = px.line(monthly_topic_counts, 
                        x='year_month', 
@@ -167,4 +227,81 @@ try:
     st.plotly_chart(fig_topic)
 
 except Exception as e:
-    st.error(f"Error creating trends: {str(e)}")
\ No newline at end of file
+    st.error(f"Error creating trends: {str(e)}")
+
+# First-response and resolution times of each account's support threads
+st.header("Support Response Times")
+
+@st.cache_data
+def load_response_times(index_mtime):
+    """Per-account response times over every indexed thread; index_mtime refreshes them when the index changes."""
+    from thread_index import connect, read_index, response_summary, thread_times
+    conn = connect(THREAD_INDEX_PATH)
+    try:
+        summary = response_summary(thread_times(read_index(conn)))
+    finally:
+        conn.close()
+    # The index knows accounts by their handle
+    names = {config['handle'].lower(): name for name, config in ACCOUNTS.items()}
+    summary['account'] = summary['account'].map(lambda handle: names.get(handle, handle))
+    return summary
+
+if not os.path.exists(THREAD_INDEX_PATH):
+    st.info("The thread index has not been built yet. Run `python thread_index.py add-cases` to create it.")
+else:
+    response_times = load_response_times(os.path.getmtime(THREAD_INDEX_PATH))
+    selected = response_times[response_times['account'] == account]
+    if len(selected):
+        col1, col2, col3 = st.columns(3)
+        median_hours = selected['median_first_response_hours'].iloc[0]
+        # An account with no answered threads has no median
+        col1.metric("Median first response", "–" if pd.isna(median_hours) else f"{median_hours:.1f} h")
+        col2.metric("Threads answered", f"{selected['response_rate'].iloc[0]:.0%}")
+        col3.metric("Threads resolved", f"{selected['resolution_rate'].iloc[0]:.0%}")
+    st.write(response_times)
+    fig = px.bar(response_times, x='account', y='median_first_response_hours',
+                 title="Median Hours to First Response by Account")
+    st.plotly_chart(fig)
+
+# Keyword search across every account, served from the prebuilt full-text index
+st.header("Search Tweets")
+
+@st.cache_resource
+def get_search_connection():
+    """Open the search index once per server process, or return None if it has not been built."""
+    if not os.path.exists(INDEX_PATH):
+        return None
+    return sqlite3.connect(INDEX_PATH, check_same_thread=False)
+
+search_conn = get_search_connection()
+
+if search_conn is None:
+    st.info("The search index has not been built yet. Run `python tweet_search.py` to create it.")
+else:
+    query = st.text_input("Keywords, \"quoted phrases\" or a loan id (add * for prefix matches)")
+    col1, col2 = st.columns(2)
+    search_accounts = col1.multiselect("Accounts", list(account_files), default=list(account_files))
+    search_sentiment = col2.selectbox("Sentiment", ["Any", "positive", "negative", "neutral"])
+    topic_options = [row[0] for row in search_conn.execute(
+        "SELECT DISTINCT topics FROM tweets WHERE topics IS NOT NULL ORDER BY topics")]
+    search_topic = col1.selectbox("Topic", ["Any"] + topic_options)
+    date_range = col2.date_input("Date range", value=())
+    page_size = 20
+
+    if query:
+        start_date = date_range[0] if len(date_range) > 0 else None
+        end_date = date_range[1] if len(date_range) > 1 else start_date
+        page = st.number_input("Page", min_value=1, value=1, step=1)
+        try:
+            results, total = search(
+                search_conn, query, search_accounts,
+                sentiment=None if search_sentiment == "Any" else search_sentiment,
+                topic=None if search_topic == "Any" else search_topic,
+                start_date=start_date, end_date=end_date,
+                page=page, page_size=page_size
+            )
+            pages = max(1, -(-total // page_size))
+            st.write(f"{total} matching tweets (page {min(page, pages)} of {pages})")
+            st.write(results[['account', 'author_name', 'text', 'timestamp', 'sentiment', 'topics', 'tweet_link']])
+        except sqlite3.Error as e:
+            st.error(f"Search failed: {str(e)}")
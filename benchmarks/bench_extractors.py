@@ -0,0 +1,89 @@
+"""Compare the HTML extraction backends on saved timeline pages.
+
+Runs every backend over the fixtures in benchmarks/fixtures, checks that they produce
+identical tweet records and reports parse and extraction throughput.
+
+    python benchmarks/bench_extractors.py [--repeat 5] [fixture.html ...]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tweet_extractors import EXTRACTORS, get_extractor
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def run_backend(extractor, html):
+    articles = extractor.parse_articles(html)
+    return [extractor.extract_tweet_data(article) for article in articles]
+
+
+def time_backend(extractor, html, repeat):
+    best = float("inf")
+    records = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = run_backend(extractor, html)
+        best = min(best, time.perf_counter() - start)
+    return records, best
+
+
+def diff_records(expected, actual):
+    """Return human readable differences between two lists of tweet records"""
+    problems = []
+    if len(expected) != len(actual):
+        problems.append(f"record count {len(expected)} != {len(actual)}")
+    for i, (left, right) in enumerate(zip(expected, actual)):
+        for field in left:
+            if left[field] != right.get(field):
+                problems.append(f"record {i} ({left.get('tweet_id')}) {field}: {left[field]!r} != {right.get(field)!r}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixtures", nargs="*", help="Timeline HTML files (default: benchmarks/fixtures/*.html)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per backend; the best time is reported")
+    args = parser.parse_args()
+
+    fixtures = args.fixtures or sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html")))
+    if not fixtures:
+        sys.exit("No fixtures found")
+
+    backends = [get_extractor(name) for name in EXTRACTORS]
+    reference = backends[0]
+    mismatches = 0
+
+    print(f"{'fixture':<32} {'backend':<8} {'tweets':>7} {'seconds':>9} {'tweets/sec':>11} {'speedup':>8}")
+    for path in fixtures:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+
+        baseline_records, baseline_time = time_backend(reference, html, args.repeat)
+        for extractor in backends:
+            if extractor is reference:
+                records, elapsed = baseline_records, baseline_time
+            else:
+                records, elapsed = time_backend(extractor, html, args.repeat)
+                problems = diff_records(baseline_records, records)
+                if problems:
+                    mismatches += len(problems)
+                    for problem in problems[:10]:
+                        print(f"  MISMATCH {extractor.name}: {problem}")
+
+            rate = len(records) / elapsed if elapsed else float("inf")
+            print(f"{os.path.basename(path):<32} {extractor.name:<8} {len(records):>7} {elapsed:>9.4f} "
+                  f"{rate:>11.0f} {baseline_time / elapsed:>7.1f}x")
+
+    if mismatches:
+        sys.exit(f"{mismatches} field(s) differ between backends")
+    print("All backends produced identical records")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""Time every pipeline stage on synthetic corpora and record the results as JSON.
+
+Each stage runs in a fresh process so its peak memory is measured on its own. Results
+go to benchmarks/results/<timestamp>.json; pass an earlier file to --compare to flag
+stages that got slower or use more memory.
+
+    python benchmarks/run_benchmarks.py [--scales 1 10] [--stages clean sentiment] [--repeat 3]
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/20241101-120000.json
+    python benchmarks/run_benchmarks.py --sentiment pytorch    # score with the real model (or onnx)
+
+The sentiment stage uses a keyword stub by default so the suite runs offline.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import CORPUS_DIR, SCALES, load_corpus
+from near_duplicates import NearDuplicateIndex
+from sentiment_analysis import score_file
+from text_cleaning import clean_file
+from tweet_aggregates import AGGREGATE_COLUMNS, build_aggregates
+from tweet_extractors import EXTRACTORS, get_extractor
+from tweet_search import connect, index_account, search
+from timeline_responses import parse_response
+from tweet_store import prepare_tweets, publish_account
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+ACCOUNT = "Synthetic"
+SEARCH_QUERIES = ["loan closure", "harassment", "refund", "\"recovery agents\"", "disburs*", "rbi guidelines"]
+
+# The stages log every step at INFO; keep the benchmark output to the results table
+logging.getLogger().setLevel(logging.WARNING)
+
+
+class StubScorer:
+    """Offline stand-in for SentimentScorer that labels tweets by keyword."""
+
+    NEGATIVE = ("harass", "worst", "abusive", "not credited", "pending", "fraud", "calling", "refund")
+    POSITIVE = ("thanks", "thank you", "resolved", "closed now")
+
+    def score(self, texts):
+        scored = []
+        for text in texts:
+            if not isinstance(text, str):
+                scored.append(("NEUTRAL", 0))
+                continue
+            lowered = text.lower()
+            if any(word in lowered for word in self.POSITIVE):
+                scored.append(("positive", 0.9))
+            elif any(word in lowered for word in self.NEGATIVE):
+                scored.append(("negative", 0.9))
+            else:
+                scored.append(("neutral", 0.6))
+        return scored
+
+    def close(self):
+        pass
+
+
+def bench_extract(corpus, work_dir, options):
+    extractor = get_extractor(options["extractor"])
+    records = 0
+    for page in corpus["pages"]:
+        with open(os.path.join(corpus["dir"], page), encoding="utf-8") as f:
+            html = f.read()
+        records += sum(1 for article in extractor.parse_articles(html) if extractor.extract_tweet_data(article))
+    return records, {"pages": len(corpus["pages"]), "backend": options["extractor"]}
+
+
+def bench_responses(corpus, work_dir, options):
+    # The same pages as bench_extract, read from timeline API responses instead of HTML
+    records = 0
+    for response in corpus["responses"]:
+        with open(os.path.join(corpus["dir"], response), encoding="utf-8") as f:
+            records += len(parse_response(f.read()))
+    return records, {"responses": len(corpus["responses"])}
+
+
+def bench_clean(corpus, work_dir, options):
+    stats = clean_file(os.path.join(corpus["dir"], corpus["raw"]), os.path.join(work_dir, "cleaned.csv"))
+    return stats["rows_in"], {"rows_out": stats["rows_out"], "steps": stats["steps"]}
+
+
+def bench_near_duplicates(corpus, work_dir, options):
+    tweets = pd.read_csv(os.path.join(corpus["dir"], corpus["final"]), usecols=["tweet_id", "text"])
+    index = NearDuplicateIndex(os.path.join(work_dir, "near_duplicates.sqlite"))
+    try:
+        pairs = index.add(tweets["tweet_id"].astype(str).tolist(), tweets["text"].tolist(), ACCOUNT)
+    finally:
+        index.close()
+    return len(tweets), {"pairs": pairs}
+
+
+def bench_sentiment(corpus, work_dir, options):
+    if options["sentiment"] == "stub":
+        scorer = StubScorer()
+    else:
+        from sentiment_analysis import SentimentScorer
+        scorer = SentimentScorer(batch_size=options["batch_size"], backend=options["sentiment"])
+    try:
+        count, _ = score_file(scorer, os.path.join(corpus["dir"], corpus["final"]),
+                              os.path.join(work_dir, "scored.csv"))
+    finally:
+        scorer.close()
+    return count, {"scorer": options["sentiment"]}
+
+
+def bench_store(corpus, work_dir, options):
+    written = publish_account(os.path.join(corpus["dir"], corpus["final"]), ACCOUNT, os.path.join(work_dir, "dataset"))
+    return written, {}
+
+
+def bench_aggregates(corpus, work_dir, options):
+    df = prepare_tweets(pd.read_csv(os.path.join(corpus["dir"], corpus["final"]), usecols=AGGREGATE_COLUMNS))
+    tables = build_aggregates(df)
+    return len(df), {"tables": len(tables)}
+
+
+def bench_search(corpus, work_dir, options):
+    df = prepare_tweets(pd.read_csv(os.path.join(corpus["dir"], corpus["final"])))
+    conn = connect(os.path.join(work_dir, "search.sqlite"))
+    try:
+        started = time.perf_counter()
+        rows = index_account(conn, ACCOUNT, df)
+        index_seconds = time.perf_counter() - started
+
+        latencies = []
+        for _ in range(options["query_repeat"]):
+            for query in SEARCH_QUERIES:
+                started = time.perf_counter()
+                search(conn, query, accounts=[ACCOUNT], sentiment="negative")
+                latencies.append(time.perf_counter() - started)
+    finally:
+        conn.close()
+    latencies = pd.Series(latencies) * 1000
+    return rows, {"index_seconds": index_seconds, "query_p50_ms": latencies.quantile(0.5),
+                  "query_p95_ms": latencies.quantile(0.95)}
+
+
+def bench_conversations(corpus, work_dir, options):
+    from db_operations.insert_inbound import iter_json_array
+    conversations = messages = 0
+    for record, _ in iter_json_array(os.path.join(corpus["dir"], corpus["conversations_file"])):
+        conversations += 1
+        messages += len(record["conversation"])
+    return conversations, {"messages": messages}
+
+
+STAGES = {
+    "extract": bench_extract,
+    "responses": bench_responses,
+    "clean": bench_clean,
+    "near_duplicates": bench_near_duplicates,
+    "sentiment": bench_sentiment,
+    "store": bench_store,
+    "aggregates": bench_aggregates,
+    "search": bench_search,
+    "conversations": bench_conversations,
+}
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, or None where the resource module is missing."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_stage(name, corpus, work_dir, options):
+    """Run one stage and return its timing and memory; meant to be the only work of a fresh process."""
+    logging.getLogger().setLevel(options["log_level"])
+    baseline = peak_rss_mb()
+    if options["trace_memory"]:
+        tracemalloc.start()
+    started = time.perf_counter()
+    rows, extra = STAGES[name](corpus, work_dir, options)
+    seconds = time.perf_counter() - started
+    traced = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if options["trace_memory"] else None
+    tracemalloc.stop()
+    return {
+        "seconds": seconds,
+        "rows": rows,
+        "rows_per_sec": rows / seconds if seconds > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "baseline_rss_mb": baseline,
+        "peak_traced_mb": traced,
+        **extra,
+    }
+
+
+def run_isolated(name, corpus, work_dir, options):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_stage, name, corpus, work_dir, options).result()
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, results, tolerance):
+    """Print the change against an earlier results file and return the regressions found."""
+    before = {(entry["scale"], entry["stage"]): entry for entry in previous["results"]}
+    regressions = []
+    print(f"\nCompared with {previous.get('git_commit') or 'unknown commit'} ({previous.get('created')}):")
+    print(f"{'scale':>6} {'stage':<16} {'seconds':>17} {'change':>8} {'peak MB':>17} {'change':>8}")
+    for entry in results:
+        old = before.get((entry["scale"], entry["stage"]))
+        if old is None or old["rows"] != entry["rows"]:
+            continue
+        time_change = entry["seconds"] / old["seconds"] - 1 if old["seconds"] else 0.0
+        memory_change = 0.0
+        if old.get("peak_rss_mb") and entry.get("peak_rss_mb"):
+            memory_change = entry["peak_rss_mb"] / old["peak_rss_mb"] - 1
+        flag = ""
+        if time_change > tolerance or memory_change > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(entry)
+        print(f"{entry['scale']:>5}x {entry['stage']:<16} {old['seconds']:>8.3f} {entry['seconds']:>8.3f} "
+              f"{time_change:>+8.0%} {old.get('peak_rss_mb') or 0:>8.1f} {entry.get('peak_rss_mb') or 0:>8.1f} "
+              f"{memory_change:>+8.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10],
+                        help=f"Multiples of the current volume to run (suggested: {' '.join(map(str, SCALES))})")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage; the best time is reported")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpus")
+    parser.add_argument("--corpus-dir", default=CORPUS_DIR, help="Where generated corpora are kept between runs")
+    parser.add_argument("--max-pages", type=int, default=None, help="Cap on timeline pages per scale")
+    parser.add_argument("--regenerate", action="store_true", help="Generate the corpora again")
+    parser.add_argument("--extractor", choices=list(EXTRACTORS), default="lxml")
+    parser.add_argument("--sentiment", choices=["stub", "pytorch", "onnx"], default="stub",
+                        help="Keyword stub, the real model, or its int8 ONNX export")
+    parser.add_argument("--batch-size", type=int, default=32, help="Batch size for --sentiment model")
+    parser.add_argument("--query-repeat", type=int, default=20, help="Times each search query is run")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also record peak Python allocations with tracemalloc (slows the stages down)")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Slowdown counted as a regression")
+    parser.add_argument("--verbose", action="store_true", help="Show the stages' own log output")
+    args = parser.parse_args()
+
+    options = {
+        "extractor": args.extractor,
+        "sentiment": args.sentiment,
+        "batch_size": args.batch_size,
+        "query_repeat": args.query_repeat,
+        "trace_memory": args.trace_memory,
+        "log_level": logging.INFO if args.verbose else logging.WARNING,
+    }
+    created = datetime.now(timezone.utc)
+    results = []
+
+    print(f"{'scale':>6} {'stage':<16} {'rows':>10} {'seconds':>9} {'rows/sec':>11} {'peak MB':>8}")
+    for scale in args.scales:
+        corpus_dir = os.path.join(args.corpus_dir, f"x{scale}-seed{args.seed}")
+        started = time.perf_counter()
+        corpus = load_corpus(corpus_dir, scale, args.seed, args.max_pages, args.regenerate)
+        corpus["dir"] = corpus_dir
+        print(f"Corpus for {scale}x ready in {time.perf_counter() - started:.1f}s: {corpus['tweets']} "
+                        f"tweets, {len(corpus['pages'])} pages, {corpus['conversations']} conversations")
+
+        for stage in args.stages:
+            runs = []
+            for _ in range(args.repeat):
+                with tempfile.TemporaryDirectory(prefix="bench-") as work_dir:
+                    runs.append(run_isolated(stage, corpus, work_dir, options))
+            best = min(runs, key=lambda run: run["seconds"])
+            peaks = [run["peak_rss_mb"] for run in runs if run["peak_rss_mb"] is not None]
+            best["peak_rss_mb"] = max(peaks) if peaks else None
+            entry = {"scale": scale, "stage": stage, **best}
+            results.append(entry)
+            rate = f"{entry['rows_per_sec']:>11,.0f}" if entry["rows_per_sec"] else f"{'-':>11}"
+            peak = f"{entry['peak_rss_mb']:>8.1f}" if entry["peak_rss_mb"] else f"{'-':>8}"
+            print(f"{scale:>5}x {stage:<16} {entry['rows']:>10,} {entry['seconds']:>9.3f} {rate} {peak}")
+
+    report = {
+        "created": created.isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": args.seed,
+        "options": options,
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, created.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=float)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        if previous.get("options") != options:
+            print(f"Note: options differ from the earlier run ({previous.get('options')})")
+        regressions = compare(previous, results, args.tolerance)
+        if regressions:
+            sys.exit(f"{len(regressions)} stage(s) regressed by more than {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
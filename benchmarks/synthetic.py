@@ -0,0 +1,520 @@
+"""Synthetic tweet corpus for the benchmark suite.
+
+Generates multilingual complaint tweets in the raw_tweets and final_tweets CSV schemas,
+timeline HTML pages in X's article markup, the same pages as timeline API responses, and
+conversations JSON, at a multiple of the volume the project has scraped so far.
+
+    python benchmarks/synthetic.py --scale 10 [--seed 0] [--out benchmarks/corpus/x10]
+
+At 1000x the timeline pages take roughly 25 GB; --max-pages caps them.
+"""
+import argparse
+import html
+import json
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_cleaning import CLEAN_TEXT_PATTERN
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+# Rows in final_tweets/*.csv and threads in conversations/*.json at 1x
+BASE_VOLUME = {"tweets": 3041, "conversations": 64}
+SCALES = (1, 10, 100, 1000)
+PAGE_SIZE = 100  # Articles per saved timeline page, about one long scroll session
+
+COMPANY = {"name": "KreditBee", "handle": "kreditbee"}
+START = pd.Timestamp("2023-01-01", tz="UTC")
+END = pd.Timestamp("2024-12-31", tz="UTC")
+TWITTER_EPOCH_MS = 1288834974657
+
+DUPLICATE_RATE = 0.05  # Re-scraped tweets the cleaning stage should drop
+COMPANY_RATE = 0.02  # Company posts mixed into the timeline
+IMAGE_RATE = 0.15
+
+RAW_COLUMNS = ["tweet_id", "tweet_link", "author_name", "author_handle", "text", "timestamp", "likes", "retweets",
+               "replies", "image_urls", "is_reply", "reply_to", "reply_to_id", "conversation_id"]
+FINAL_COLUMNS = ["tweet_id", "tweet_link", "author_name", "author_handle", "text", "timestamp", "likes", "retweets",
+                 "replies", "image_urls", "is_reply", "year_month", "language", "tweets_transl", "topics",
+                 "sentiment", "sentiment_score"]
+
+# (language, weight, text, English text, topic, sentiment)
+TEMPLATES = [
+    ("en", 14, "{mention} I have already paid my loan {loan} on {date} but your recovery agents are still "
+               "calling me. Please close my account",
+     "I have already paid my loan {loan} on {date} but your recovery agents are still calling me. "
+     "Please close my account", "request for loan closure", "negative"),
+    ("en", 12, "{mention} my loan closure request {ticket} is pending for {days} days, no response from "
+               "customer care",
+     "my loan closure request {ticket} is pending for {days} days, no response from customer care",
+     "request for loan closure", "negative"),
+    ("en", 10, "{mention} disbursal of Rs {amount} still not credited to my account, ticket {ticket}. "
+               "Worst service ever",
+     "disbursal of Rs {amount} still not credited to my account, ticket {ticket}. Worst service ever",
+     "delayed disbursal", "negative"),
+    ("en", 10, "{mention} your agents are calling my relatives and sharing my loan details. This is against "
+               "RBI guidelines {regulator}",
+     "your agents are calling my relatives and sharing my loan details. This is against RBI guidelines",
+     "Misuse of customer information", "negative"),
+    ("en", 9, "{mention} collection agent used abusive language on call today at {time}, loan {loan}. "
+              "Is this how you treat customers?",
+     "collection agent used abusive language on call today at {time}, loan {loan}. "
+     "Is this how you treat customers?", "collection agency misconduct", "negative"),
+    ("en", 8, "{mention} getting {days} harassment calls a day from unknown numbers about loan {loan}",
+     "getting {days} harassment calls a day from unknown numbers about loan {loan}",
+     "harassment calls", "negative"),
+    ("en", 7, "{mention} EMI of Rs {amount} was deducted twice this month, please refund it",
+     "EMI of Rs {amount} was deducted twice this month, please refund it", "payment delay", "neutral"),
+    ("en", 6, "{mention} you are charging hidden fees without consent, this is non-compliance with RBI "
+              "norms {regulator}",
+     "you are charging hidden fees without consent, this is non-compliance with RBI norms",
+     "non-compliance with laws", "negative"),
+    ("en", 6, "{mention} thanks for resolving my issue so quickly, loan {loan} is closed now",
+     "thanks for resolving my issue so quickly, loan {loan} is closed now",
+     "unsatisfactory customer service", "positive"),
+    ("en", 4, "{mention} please share the NOC for loan {loan}, I closed it on {date}",
+     "please share the NOC for loan {loan}, I closed it on {date}", "request for loan closure", "neutral"),
+    ("hi-Latn", 4, "{mention} maine {date} ko pura payment kar diya phir bhi aapke agent call kar rahe hain, "
+                   "loan {loan} band karo",
+     "I made the full payment on {date} but your agents are still calling, close loan {loan}",
+     "harassment by recovery agents", "negative"),
+    ("hi-Latn", 3, "{mention} bhai {days} din ho gaye Rs {amount} abhi tak account me nahi aaya",
+     "brother it has been {days} days and Rs {amount} has still not come into the account",
+     "delayed disbursal", "negative"),
+    ("hi", 3, "{mention} मैंने लोन {loan} का पूरा भुगतान कर दिया है फिर भी रिकवरी एजेंट परेशान कर रहे हैं",
+     "I have fully repaid loan {loan} but recovery agents are still harassing me",
+     "harassment by recovery agents", "negative"),
+    ("hi", 2, "{mention} Rs {amount} का रिफंड {days} दिन से लंबित है, कृपया मदद करें",
+     "the refund of Rs {amount} has been pending for {days} days, please help", "payment delay", "negative"),
+    ("mr", 1, "{mention} माझे कर्ज {loan} बंद करा, मी {date} रोजी पूर्ण रक्कम भरली आहे",
+     "close my loan {loan}, I paid the full amount on {date}", "request for loan closure", "negative"),
+    ("ta", 1, "{mention} என் கடன் {loan} மூடப்படவில்லை, {days} நாட்களாக காத்திருக்கிறேன்",
+     "my loan {loan} has not been closed, I have been waiting for {days} days", "request for loan closure",
+     "negative"),
+    ("bn", 1, "{mention} আমার লোন {loan} এখনও বন্ধ হয়নি, দয়া করে সাহায্য করুন",
+     "my loan {loan} is still not closed, please help", "request for loan closure", "negative"),
+]
+# langdetect rarely recognises romanised Hindi and guesses a Latin-script language instead
+HINGLISH_DETECTIONS = ["id", "so", "tl", "af", "sw"]
+SUFFIXES = ["", "", "", " 😡", " 🙏", " 😤😤", " #fraud", " #{company}Fraud", " @RBI", " https://t.co/{code}"]
+
+FIRST_NAMES = ["Aarav", "Priya", "Rahul", "Sneha", "Vikram", "Anjali", "Suman", "Arjun", "Kavya", "Rohit",
+               "Neha", "Amit", "Pooja", "Sanjay", "Divya", "Karthik", "Meera", "Naveen", "Farhan", "Lakshmi"]
+LAST_NAMES = ["Sharma", "Patel", "Mishra", "Reddy", "Iyer", "Singh", "Khan", "Das", "Nair", "Gupta", "Joshi",
+              "Kumar", "Chawla", "Banerjee", "Rao"]
+ALPHABET = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"))
+
+COMPANY_RESPONSES = [
+    "Hello {first},\n\nThank you for reaching out to us. We'll certainly help you with your query. For the "
+    "security of your personal information, kindly DM (Direct Message) us your registered contact details to "
+    "assist you better. \n\nBest,\nTeam {company}.",
+    "Hi {first},\n\nWe have forwarded your concern to the respective team and they will get back to you within "
+    "{days} working days.\n\nRegards,\nTeam {company}.",
+    "Hello {first}, we regret the inconvenience caused. Your request {ticket} has been resolved, please check "
+    "your registered email.\n\nTeam {company}.",
+]
+
+
+def _codes(rng, count, length):
+    """Random base62 strings, like media keys and t.co links."""
+    return ["".join(row) for row in ALPHABET[rng.integers(0, len(ALPHABET), (count, length))]]
+
+
+def _authors(rng, count):
+    first = rng.choice(FIRST_NAMES, count)
+    last = rng.choice(LAST_NAMES, count)
+    digits = rng.integers(10, 10 ** 8, count)
+    names = [f"{f} {l}" for f, l in zip(first, last)]
+    handles = [f"@{f}{l[:3]}{d}" for f, l, d in zip(first, last, digits)]
+    return names, handles
+
+
+def _counts(rng, count, shape):
+    """Engagement counts: mostly zero with a long tail of popular tweets."""
+    return np.floor(rng.pareto(shape, count)).astype(np.int64)
+
+
+def generate_tweets(count, seed=0, company=COMPANY):
+    """Return count tweets as scraped, newest first, with their language, translation, topic and sentiment."""
+    rng = np.random.default_rng(seed)
+    weights = np.array([template[1] for template in TEMPLATES], dtype=float)
+    choice = rng.choice(len(TEMPLATES), count, p=weights / weights.sum())
+
+    names, handles = _authors(rng, max(20, count // 3))
+    # Some customers complain many times, so draw authors from a skewed distribution
+    author = np.minimum(np.floor(rng.pareto(1.2, count) * 5).astype(np.int64), len(names) - 1)
+
+    seconds = np.sort(rng.integers(int(START.timestamp()), int(END.timestamp()), count))[::-1]
+    timestamps = pd.to_datetime(seconds, unit="s", utc=True)
+    tweet_ids = ((seconds.astype(np.int64) * 1000 - TWITTER_EPOCH_MS) << 22) | rng.integers(0, 1 << 22, count)
+
+    slots = {
+        "loan": [f"KB{n:08d}" for n in rng.integers(0, 10 ** 8, count)],
+        "ticket": [f"#{n}" for n in rng.integers(10 ** 6, 10 ** 7, count)],
+        "amount": rng.choice([500, 1500, 2500, 4999, 10000, 25000, 50000], count),
+        "days": rng.integers(2, 60, count),
+        "date": [f"{d:02d}/{m:02d}" for d, m in zip(rng.integers(1, 29, count), rng.integers(1, 13, count))],
+        "time": [f"{h}:{m:02d}" for h, m in zip(rng.integers(8, 21, count), rng.integers(0, 60, count))],
+        "regulator": rng.choice(["@RBI", "@RBIsays", "#RBI"], count),
+    }
+    suffixes = rng.choice(SUFFIXES, count)
+    links = _codes(rng, count, 10)
+
+    texts, english, languages = [], [], []
+    for i in range(count):
+        language, _, text, translation, _, _ = TEMPLATES[choice[i]]
+        values = {key: column[i] for key, column in slots.items()}
+        values["mention"] = f"@{company['handle']}"
+        suffix = suffixes[i].format(company=company["name"], code=links[i])
+        texts.append(text.format(**values) + suffix)
+        english.append(translation.format(**values) + suffix)
+        languages.append(HINGLISH_DETECTIONS[i % len(HINGLISH_DETECTIONS)] if language == "hi-Latn" else language)
+
+    media = _codes(rng, count * 2, 15)
+    has_images = rng.random(count) < IMAGE_RATE
+    image_urls = [
+        "|".join(f"https://pbs.twimg.com/media/{media[2 * i + k]}?format=jpg&name=small"
+                 for k in range(1 + (i % 3 == 0))) if has_images[i] else None
+        for i in range(count)
+    ]
+
+    tweets = pd.DataFrame({
+        "tweet_id": tweet_ids,
+        "author_name": [names[a] for a in author],
+        "author_handle": [handles[a] for a in author],
+        "text": texts,
+        "timestamp": timestamps,
+        "likes": _counts(rng, count, 1.5),
+        "retweets": _counts(rng, count, 2.5),
+        "replies": _counts(rng, count, 2.0),
+        "image_urls": image_urls,
+        "is_reply": False,
+        "language": languages,
+        "tweets_transl": english,
+        "topics": [TEMPLATES[c][4] for c in choice],
+        "sentiment": [TEMPLATES[c][5] for c in choice],
+        "sentiment_score": rng.uniform(0.5, 0.99, count).round(6),
+    })
+    tweets["tweet_link"] = "https://x.com/" + tweets["author_handle"].str[1:] + "/status/" + tweets["tweet_id"].astype(str)
+    return tweets
+
+
+def raw_frame(tweets, seed=0, company=COMPANY):
+    """The tweets in the raw_tweets CSV schema, with re-scraped duplicates and company posts mixed in."""
+    rng = np.random.default_rng(seed + 1)
+    raw = tweets.copy()
+    raw["timestamp"] = raw["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+    duplicates = raw.sample(frac=DUPLICATE_RATE, random_state=rng.integers(2 ** 31))
+    # The scraper keeps surrounding whitespace, which is stripped before de-duplication
+    duplicates["text"] = duplicates["text"] + "  \n"
+    company_posts = raw.sample(frac=COMPANY_RATE, random_state=rng.integers(2 ** 31))
+    company_posts = company_posts.assign(author_name=company["name"], author_handle=f"@{company['handle']}")
+
+    raw = pd.concat([raw, duplicates, company_posts]).sort_values("timestamp", ascending=False, kind="stable")
+    raw["reply_to"] = None
+    raw["reply_to_id"] = None
+    raw["conversation_id"] = None
+    return raw[RAW_COLUMNS].reset_index(drop=True)
+
+
+def final_frame(tweets):
+    """The tweets in the final_tweets CSV schema, with text cleaned the way text_cleaning.py does."""
+    final = tweets.copy()
+    final["text"] = final["text"].str.strip().str.replace(CLEAN_TEXT_PATTERN, "", regex=True).str.lower()
+    final["year_month"] = final["timestamp"].dt.strftime("%Y-%m")
+    final["timestamp"] = final["timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S+00:00")
+    return final[FINAL_COLUMNS]
+
+
+SPAN = '<span class="css-1jxf684 r-bcqeeo r-1ttztb7 r-qvutc0 r-poiln3">{}</span>'
+TEXT_CLASS = ('css-146c3p1 r-8akbws r-krxsd3 r-dnmrzs r-1udh08x r-bcqeeo r-1ttztb7 r-qvutc0 r-37j5jr r-a023e6 '
+              'r-rjixqe r-16dba41 r-bnwqim')
+TOKEN_PATTERN = re.compile(r'(@\w+|#\w+)')
+
+
+def _format_count(n):
+    """Counts as X shows them: blank for zero, 1.2K, 3M."""
+    if n >= 1000000:
+        return f"{n / 1000000:.1f}M".replace(".0M", "M")
+    if n >= 1000:
+        return f"{n / 1000:.1f}K".replace(".0K", "K")
+    return str(n) if n else ""
+
+
+def _button(testid, n, label):
+    count = _format_count(n)
+    inner = (f'<span data-testid="app-text-transition-container"><span class="css-1jxf684 r-1ttztb7 r-qvutc0 '
+             f'r-poiln3 r-n6v787 r-1cwl3u0 r-1k6nrdp r-n7gxbd">{count}</span></span>') if count else ''
+    return (f'<div class="css-175oi2r r-18u37iz r-1h0z5md r-13awgt0"><button aria-label="{n} {label}. {label}" '
+            f'role="button" class="css-175oi2r r-1777fci r-bt1l66 r-bztko3 r-lrvibr r-1loqt21 r-1ny4l3l" '
+            f'data-testid="{testid}" type="button"><div dir="ltr" class="css-146c3p1 r-bcqeeo r-1ttztb7 r-qvutc0 '
+            f'r-37j5jr r-a023e6 r-rjixqe r-16dba41 r-1awozwy r-6koalj r-1h0z5md r-o7ynqc r-clp7b1 r-3s2u2q" '
+            f'style="color: rgb(83, 100, 113);"><div class="css-175oi2r r-xoduu5"><svg viewBox="0 0 24 24" '
+            f'aria-hidden="true" class="r-4qtqp9 r-yyyyoo r-dnmrzs r-bnwqim r-lrvibr r-m6rgpd r-1xvli5t r-1hdv0qi">'
+            f'<g><path d="M1.751 10c0-4.42 3.584-8 8.005-8h4.366c4.49 0 7.501 3.58 7.501 8z"></path></g></svg></div>'
+            f'<div class="css-175oi2r r-xoduu5 r-1udh08x">{inner}</div></div></button></div>')
+
+
+def _tweet_text(text):
+    parts = []
+    for token in TOKEN_PATTERN.split(text):
+        if not token:
+            continue
+        escaped = html.escape(token)
+        if token.startswith("@"):
+            parts.append(f'<div class="css-175oi2r r-xoduu5"><span class="r-18u37iz"><a dir="ltr" href="/{token[1:]}" '
+                         f'role="link" class="css-1jxf684 r-bcqeeo r-1ttztb7 r-qvutc0 r-poiln3 r-1loqt21">{escaped}'
+                         f'</a></span></div>')
+        elif token.startswith("#"):
+            parts.append(f'<span class="r-18u37iz"><a dir="ltr" href="/hashtag/{token[1:]}?src=hashtag_click" '
+                         f'role="link" class="css-1jxf684 r-bcqeeo r-1ttztb7 r-qvutc0 r-poiln3 r-1loqt21">{escaped}'
+                         f'</a></span>')
+        else:
+            parts.append(SPAN.format(escaped))
+    return "".join(parts)
+
+
+def render_article(tweet, company=COMPANY, replying=False):
+    """One tweet as an <article data-testid="tweet"> element of the timeline."""
+    handle = tweet["author_handle"].lstrip("@")
+    tweet_id = tweet["tweet_id"]
+    timestamp = tweet["timestamp"].strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    images = tweet["image_urls"].split("|") if isinstance(tweet["image_urls"], str) else []
+    photos = "".join(
+        f'<div class="css-175oi2r r-1adg3ll r-1udh08x"><a href="/{handle}/status/{tweet_id}/photo/{i + 1}" '
+        f'role="link" class="css-175oi2r r-1pi2tsx r-1ny4l3l r-1loqt21"><div aria-label="Image" '
+        f'class="css-175oi2r r-1p0dtai r-1mlwlqe r-1d2f490 r-11wrixw r-61z16t" data-testid="tweetPhoto">'
+        f'<img alt="Image" draggable="true" src="{html.escape(url)}" class="css-9pa8cd"></div></a></div>'
+        for i, url in enumerate(images))
+    media = f'<div class="css-175oi2r r-9aw3ui r-1s2bzr4"><div class="css-175oi2r r-1ssbvtb">{photos}</div></div>' if photos else ''
+    reply = (f'<div class="css-175oi2r r-4qtqp9 r-zl2h9q"><div dir="ltr" class="css-146c3p1 r-bcqeeo r-1ttztb7">'
+             f'Replying to <div class="css-175oi2r r-1wbh5a2 r-dnmrzs"><a href="/{company["handle"]}" role="link" '
+             f'class="css-175oi2r r-1wbh5a2 r-dnmrzs r-1loqt21">{SPAN.format("@" + company["handle"])}</a></div>'
+             f'</div></div>') if replying else ''
+    language = tweet["language"] if len(tweet["language"]) == 2 else "en"
+    return (
+        f'<article aria-labelledby="id__{tweet_id}" role="article" tabindex="0" class="css-175oi2r r-18u37iz '
+        f'r-1udh08x r-i023vh r-1qhn6m8" data-testid="tweet"><div class="css-175oi2r r-eqz5dr r-16y2uox r-1wbh5a2">'
+        f'<div class="css-175oi2r r-18u37iz"><div class="css-175oi2r r-18kxxzh r-1wron08 r-onrtq4 r-1awozwy">'
+        f'<div class="css-175oi2r" data-testid="Tweet-User-Avatar"><a href="/{handle}" role="link" '
+        f'class="css-175oi2r r-1pi2tsx r-13qz1uu r-1loqt21"><img alt="" draggable="true" '
+        f'src="https://pbs.twimg.com/profile_images/{tweet_id}/avatar_normal.jpg" class="css-9pa8cd"></a></div>'
+        f'</div><div class="css-175oi2r r-1iusvr4 r-16y2uox r-1777fci r-kzbkwu"><div class="css-175oi2r r-zl2h9q">'
+        f'<div class="css-175oi2r r-1wbh5a2 r-dnmrzs r-1ny4l3l r-1awozwy r-18u37iz" id="id__u{tweet_id}" '
+        f'data-testid="User-Name"><div class="css-175oi2r r-1wbh5a2 r-dnmrzs"><a href="/{handle}" role="link" '
+        f'class="css-175oi2r r-1wbh5a2 r-dnmrzs r-1ny4l3l r-1loqt21"><div dir="ltr" class="css-146c3p1 r-bcqeeo '
+        f'r-1ttztb7 r-qvutc0 r-37j5jr r-a023e6 r-rjixqe r-b88u0q r-1awozwy r-6koalj r-1udh08x r-3s2u2q">'
+        f'<span class="css-1jxf684 r-dnmrzs r-1udh08x r-3s2u2q r-bcqeeo r-1ttztb7 r-qvutc0 r-poiln3">'
+        f'{SPAN.format(html.escape(tweet["author_name"]))}</span></div></a></div>'
+        f'<div class="css-175oi2r r-18u37iz r-1wbh5a2 r-1ez5h0i"><a href="/{handle}" role="link" tabindex="-1" '
+        f'class="css-175oi2r r-1wbh5a2 r-dnmrzs r-1ny4l3l r-1loqt21"><div dir="ltr" class="css-146c3p1 r-dnmrzs '
+        f'r-1udh08x r-3s2u2q r-bcqeeo r-1ttztb7 r-qvutc0">{SPAN.format("@" + handle)}</div></a>'
+        f'<div dir="ltr" aria-hidden="true" class="css-146c3p1 r-bcqeeo r-1ttztb7">{SPAN.format("·")}</div>'
+        f'<div class="css-175oi2r r-18u37iz r-1q142lx"><a href="/{handle}/status/{tweet_id}" dir="ltr" '
+        f'aria-label="{timestamp[:10]}" role="link" class="css-146c3p1 r-bcqeeo r-1ttztb7 r-qvutc0 r-1loqt21">'
+        f'<time datetime="{timestamp}">{timestamp[:10]}</time></a></div></div></div></div>'
+        f'{reply}'
+        f'<div class="css-175oi2r"><div dir="auto" lang="{language}" class="{TEXT_CLASS}" id="id__t{tweet_id}" '
+        f'data-testid="tweetText" style="color: rgb(15, 20, 25);">{_tweet_text(tweet["text"])}</div></div>'
+        f'{media}'
+        f'<div class="css-175oi2r"><div aria-label="{tweet["replies"]} replies, {tweet["retweets"]} reposts, '
+        f'{tweet["likes"]} likes" role="group" class="css-175oi2r r-1kbdv8c r-18u37iz r-1wtj0ep r-1ye8kvj r-1s2bzr4" '
+        f'id="id__g{tweet_id}">{_button("reply", tweet["replies"], "Reply")}'
+        f'{_button("retweet", tweet["retweets"], "Repost")}{_button("like", tweet["likes"], "Like")}'
+        f'</div></div></div></div></div></article>'
+    )
+
+
+def render_timeline(tweets, company=COMPANY):
+    """A saved timeline page holding one article per tweet, laid out like X's virtualised list."""
+    parts = [f'<!DOCTYPE html><html dir="ltr" lang="en"><head><meta charset="utf-8"><title>{company["name"]} '
+             f'(@{company["handle"]}) / X</title></head><body><div id="react-root"><main role="main">'
+             f'<section aria-labelledby="accessible-list-0" role="region"><div aria-label="Timeline: '
+             f'{company["name"]}’s posts" class="css-175oi2r"><div style="position: relative;">']
+    for i, tweet in enumerate(tweets.to_dict("records")):
+        parts.append(f'<div class="css-175oi2r r-1igl3o0 r-qklmqi r-1adg3ll r-1ny4l3l" data-testid="cellInnerDiv" '
+                     f'style="transform: translateY({i * 180}px); position: absolute; width: 100%;">')
+        parts.append(render_article(tweet, company, replying=i % 4 == 0))
+        parts.append('</div>')
+    parts.append('</div></div></section></main></div></body></html>\n')
+    return "".join(parts)
+
+
+def _response_tweet(tweet, company=COMPANY, replying=False):
+    handle = tweet["author_handle"].lstrip("@")
+    tweet_id = str(tweet["tweet_id"])
+    text = html.escape(tweet["text"], quote=False)
+    images = tweet["image_urls"].split("|") if isinstance(tweet["image_urls"], str) else []
+    legacy = {
+        "id_str": tweet_id,
+        "created_at": tweet["timestamp"].strftime("%a %b %d %H:%M:%S +0000 %Y"),
+        "conversation_id_str": tweet_id,
+        "full_text": text,
+        "display_text_range": [0, len(text)],
+        "entities": {"hashtags": [], "urls": [], "user_mentions": []},
+        "favorite_count": int(tweet["likes"]),
+        "retweet_count": int(tweet["retweets"]),
+        "reply_count": int(tweet["replies"]),
+        "quote_count": 0,
+        "lang": tweet["language"] if len(tweet["language"]) == 2 else "en",
+        "user_id_str": tweet_id,
+    }
+    if images:
+        legacy["extended_entities"] = {"media": [{"type": "photo", "media_url_https": url.split("?")[0]}
+                                                 for url in images]}
+    if replying:
+        # Replies to the company thread under the company's tweet, a day before the reply
+        parent = str(int(tweet_id) - (86400000 << 22))
+        legacy.update(in_reply_to_status_id_str=parent, in_reply_to_screen_name=company["handle"],
+                      conversation_id_str=parent)
+    return {
+        "entryId": f"tweet-{tweet_id}",
+        "sortIndex": tweet_id,
+        "content": {"entryType": "TimelineTimelineItem", "__typename": "TimelineTimelineItem", "itemContent": {
+            "itemType": "TimelineTweet", "__typename": "TimelineTweet", "tweetDisplayType": "Tweet",
+            "tweet_results": {"result": {
+                "__typename": "Tweet",
+                "rest_id": tweet_id,
+                "core": {"user_results": {"result": {"__typename": "User", "rest_id": tweet_id, "legacy": {
+                    "name": tweet["author_name"], "screen_name": handle}}}},
+                "legacy": legacy,
+            }},
+        }},
+    }
+
+
+def render_timeline_response(tweets, company=COMPANY):
+    """A UserTweetsAndReplies API response holding the tweets of one timeline page."""
+    entries = [_response_tweet(tweet, company, replying=i % 4 == 0)
+               for i, tweet in enumerate(tweets.to_dict("records"))]
+    entries.append({"entryId": f"cursor-bottom-{entries[-1]['sortIndex']}", "sortIndex": entries[-1]["sortIndex"],
+                    "content": {"entryType": "TimelineTimelineCursor", "__typename": "TimelineTimelineCursor",
+                                "value": entries[-1]["sortIndex"], "cursorType": "Bottom"}})
+    instructions = [{"type": "TimelineClearCache"}, {"type": "TimelineAddEntries", "entries": entries}]
+    return json.dumps({"data": {"user": {"result": {"__typename": "User", "timeline_v2": {"timeline": {
+        "instructions": instructions, "metadata": {"scribeConfig": {"page": "profileReplies"}}}}}}}},
+        ensure_ascii=False)
+
+
+def generate_conversations(count, seed=0, company=COMPANY):
+    """Return count threads in the conversations/*.json schema, each a customer complaint and the replies."""
+    rng = np.random.default_rng(seed + 2)
+    names, handles = _authors(rng, max(10, count))
+    complaints = generate_tweets(count * 2, seed + 3, company)
+    company_name = company["name"]
+    company_handle = f"@{company['handle']}"
+    seconds = rng.integers(int(START.timestamp()), int(END.timestamp()), count)
+    lengths = rng.integers(2, 6, count)
+
+    conversations = []
+    for i in range(count):
+        customer = rng.integers(len(names))
+        first = names[customer].split()[0]
+        started = pd.Timestamp(int(seconds[i]), unit="s", tz="UTC")
+        tweet_id = ((int(seconds[i]) * 1000 - TWITTER_EPOCH_MS) << 22) | int(rng.integers(0, 1 << 22))
+        messages = []
+        for turn in range(lengths[i]):
+            if turn % 2 == 0:
+                # The scraper only sees timestamps on some customer tweets
+                message = {"author_name": names[customer], "author_handle": handles[customer],
+                           "text": complaints["text"].iat[(2 * i + turn // 2) % len(complaints)]}
+                if rng.random() < 0.3:
+                    message["timestamp"] = (started + pd.Timedelta(hours=turn)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+                message["type"] = "customer_tweet"
+            else:
+                text = COMPANY_RESPONSES[rng.integers(len(COMPANY_RESPONSES))].format(
+                    first=first, company=company["name"], days=rng.integers(2, 8),
+                    ticket=f"#{rng.integers(10 ** 6, 10 ** 7)}")
+                message = {"author_name": company_name, "author_handle": company_handle, "text": text,
+                           "timestamp": (started + pd.Timedelta(hours=turn)).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                           "type": "company_response"}
+            messages.append(message)
+        conversations.append({"tweet_id": str(tweet_id), "author_name": company_name,
+                              "author_handle": company_handle, "conversation": messages})
+    return conversations
+
+
+def write_corpus(out_dir, scale, seed=0, max_pages=None):
+    """Generate the corpus for one scale into out_dir and return its manifest."""
+    os.makedirs(os.path.join(out_dir, "timeline"), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, "responses"), exist_ok=True)
+    tweets = generate_tweets(BASE_VOLUME["tweets"] * scale, seed)
+
+    raw = raw_frame(tweets, seed)
+    raw.to_csv(os.path.join(out_dir, "raw.csv"), index=False)
+    final_path = os.path.join(out_dir, "final.csv")
+    final_frame(tweets).to_csv(final_path, index=False)
+
+    pages, responses = [], []
+    for start in range(0, len(tweets), PAGE_SIZE):
+        if max_pages is not None and len(pages) >= max_pages:
+            break
+        path = os.path.join(out_dir, "timeline", f"page_{len(pages):06d}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(render_timeline(tweets.iloc[start:start + PAGE_SIZE]))
+        pages.append(os.path.relpath(path, out_dir))
+        # Named like the scraper's recordings, so timeline_responses.py replay reads the directory
+        path = os.path.join(out_dir, "responses", f"{len(responses):06d}_UserTweetsAndReplies.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(render_timeline_response(tweets.iloc[start:start + PAGE_SIZE]))
+        responses.append(os.path.relpath(path, out_dir))
+
+    conversations_path = os.path.join(out_dir, "conversations.json")
+    with open(conversations_path, "w", encoding="utf-8") as f:
+        json.dump(generate_conversations(BASE_VOLUME["conversations"] * scale, seed), f, indent=4, ensure_ascii=False)
+
+    manifest = {
+        "scale": scale,
+        "seed": seed,
+        "tweets": len(tweets),
+        "raw_rows": len(raw),
+        "articles": min(len(tweets), len(pages) * PAGE_SIZE),
+        "conversations": BASE_VOLUME["conversations"] * scale,
+        "raw": "raw.csv",
+        "final": "final.csv",
+        "pages": pages,
+        "responses": responses,
+        "conversations_file": "conversations.json",
+    }
+    with open(os.path.join(out_dir, "manifest.json.tmp"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(os.path.join(out_dir, "manifest.json.tmp"), os.path.join(out_dir, "manifest.json"))
+    return manifest
+
+
+def load_corpus(out_dir, scale, seed=0, max_pages=None, regenerate=False):
+    """Return the manifest of a previously generated corpus, generating it if it is missing or different."""
+    path = os.path.join(out_dir, "manifest.json")
+    if not regenerate and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        pages_wanted = -(-manifest["tweets"] // PAGE_SIZE) if max_pages is None else max_pages
+        if (manifest["scale"] == scale and manifest["seed"] == seed and len(manifest["pages"]) >= pages_wanted
+                and len(manifest.get("responses", [])) == len(manifest["pages"])):
+            return manifest
+    return write_corpus(out_dir, scale, seed, max_pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1, help="Multiple of the current scraped volume")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Output directory (default: benchmarks/corpus/x<scale>-seed<seed>)")
+    parser.add_argument("--max-pages", type=int, default=None, help=f"Cap on timeline pages of {PAGE_SIZE} tweets")
+    args = parser.parse_args()
+
+    out_dir = args.out or os.path.join(CORPUS_DIR, f"x{args.scale}-seed{args.seed}")
+    manifest = write_corpus(out_dir, args.scale, args.seed, args.max_pages)
+    print(f"Wrote {manifest['raw_rows']} raw rows, {manifest['tweets']} final tweets, {len(manifest['pages'])} "
+          f"timeline pages and {manifest['conversations']} conversations to {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import json
+import logging
+import os
+
+
+class CheckpointJournal:
+    """Append-only JSON Lines journal of scraped tweet records.
+
+    Each checkpoint appends only the records scraped since the previous one, so its cost
+    is proportional to the new tweets rather than the whole run. A record that was cut
+    short by a crash is dropped on the next load, and compact() rewrites the journal
+    atomically without duplicates.
+    """
+
+    def __init__(self, path, fsync_every=200):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.unsynced = 0
+        self.file = None
+
+    def _open(self):
+        if self.file is None:
+            self.file = open(self.path, 'a', encoding='utf-8')
+        return self.file
+
+    def append(self, records):
+        """Append records to the journal, forcing them to disk every fsync_every records"""
+        if not records:
+            return
+        f = self._open()
+        f.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+        f.flush()
+        self.unsynced += len(records)
+        if self.unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        if self.file is not None and self.unsynced:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+
+    def iter_records(self):
+        """Stream records from the journal, stopping at a truncated or corrupt tail"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    logging.warning(f"Ignoring truncated record at the end of {self.path}")
+                    return
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logging.warning(f"Ignoring corrupt record at the end of {self.path}")
+                    return
+
+    def repair(self):
+        """Cut off a partially written record left by a crash so new appends start on a clean line"""
+        if not os.path.exists(self.path):
+            return
+        valid_bytes = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    json.loads(line)
+                except ValueError:
+                    break
+                valid_bytes += len(line)
+        if valid_bytes < os.path.getsize(self.path):
+            self.close()
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_bytes)
+            logging.warning(f"Truncated {self.path} to its last complete record")
+
+    def compact(self, key='tweet_id'):
+        """Rewrite the journal keeping the first record for each key"""
+        self.close()
+        tmp_path = self.path + '.tmp'
+        seen = set()
+        kept = 0
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            for record in self.iter_records():
+                if record.get(key) in seen:
+                    continue
+                seen.add(record.get(key))
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                kept += 1
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, self.path)
+        logging.info(f"Compacted {self.path} to {kept} records")
+        return kept
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
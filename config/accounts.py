@@ -0,0 +1,56 @@
+"""Accounts tracked by the pipeline and the files each stage reads and writes."""
+
+ACCOUNTS = {
+    'Cashe App': {
+        'handle': 'CASHeApp',
+        'slug': 'CasheApp',
+        'raw': 'raw_tweets/cash_app_timeline_tweets.csv',
+        'cleaned': 'cleaned_tweets/CasheApp.csv',
+        'translated': 'translated_tweets/CasheApp.csv',
+        'partial': 'partially_processed_tweets/filtered_df_casheApp.csv',
+        'final': 'final_tweets/CasheApp.csv',
+    },
+    'Fibe India': {
+        'handle': 'FibeIndia',
+        'slug': 'Fibe',
+        'raw': 'raw_tweets/fibe_india_timeline_tweets3.csv',
+        'cleaned': 'cleaned_tweets/Fibe.csv',
+        'translated': 'translated_tweets/Fibe.csv',
+        'partial': 'partially_processed_tweets/filtered_df_fibe.csv',
+        'final': 'final_tweets/Fibe.csv',
+    },
+    'Home Credit': {
+        'handle': 'HomeCredit_In',
+        'slug': 'HomeCredit',
+        'raw': 'raw_tweets/home_credit_timeline_tweets.csv',
+        'cleaned': 'cleaned_tweets/HomeCredit.csv',
+        'translated': 'translated_tweets/HomeCredit.csv',
+        'partial': 'partially_processed_tweets/filtered_df_home_credit.csv',
+        'final': 'final_tweets/HomeCredit.csv',
+    },
+    'Kreditbee': {
+        'handle': 'kreditbee',
+        'slug': 'KreditBee',
+        'raw': 'raw_tweets/kredit_bee_timeline_tweets.csv',
+        'cleaned': 'cleaned_tweets/KreditBee.csv',
+        'translated': 'translated_tweets/KreditBee.csv',
+        'partial': 'partially_processed_tweets/filtered_df_kredit_bee.csv',
+        'final': 'final_tweets/KreditBee.csv',
+    },
+}
+
+
+def resolve_accounts(names=None):
+    """Return the (name, config) pairs for the requested accounts, matching on name or slug."""
+    if not names:
+        return list(ACCOUNTS.items())
+
+    selected = []
+    for name in names:
+        for account, config in ACCOUNTS.items():
+            if name.lower() in (account.lower(), config['slug'].lower()):
+                selected.append((account, config))
+                break
+        else:
+            raise ValueError(f"Unknown account: {name}")
+    return selected
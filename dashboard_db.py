@@ -0,0 +1,177 @@
+"""Dashboard queries against Postgres, served from rollup tables the database keeps current.
+
+    python dashboard_db.py setup              # apply db_operations/schema.sql and count existing tweets
+    python dashboard_db.py load               # sync every account's final CSV into the tweets table
+    python dashboard_db.py load Fibe
+    python dashboard_db.py rebuild            # recount the rollups from the tweets table
+
+Triggers on the tweets table fold each inserted, updated or deleted batch into tweet_rollups,
+one row per account, month, sentiment and topic. The dashboard's counts, trends and ranking
+read that table, which grows with the number of months rather than the number of tweets;
+tweet lists read tweets through its (account, timestamp) and (account, topics) indexes.
+Accounts are whatever the tweets table holds, so a new account needs no code change.
+
+Run the dashboard against the database with DASHBOARD_BACKEND=postgres streamlit run app.py.
+"""
+import argparse
+import logging
+import os
+
+import pandas as pd
+
+from config.accounts import resolve_accounts
+from db_operations.connection_pool import get_pool
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db_operations", "schema.sql")
+TWEET_LIST_COLUMNS = ("author_name", "text", "timestamp", "sentiment", "topics")
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def query(sql, params=(), pool=None):
+    """Run a read query on a pooled connection and return the result as a DataFrame"""
+    pool = pool or get_pool()
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+
+def list_accounts(pool=None):
+    return query("SELECT DISTINCT account FROM tweet_rollups ORDER BY account", pool=pool)['account'].tolist()
+
+
+def account_rankings(pool=None):
+    """Each account's mean sentiment score, best first"""
+    rankings = query("SELECT account, score FROM account_scores WHERE score IS NOT NULL ORDER BY score DESC",
+                     pool=pool)
+    rankings.columns = ['Account', 'Overall Sentiment Score']
+    rankings['Overall Sentiment Score'] = rankings['Overall Sentiment Score'].astype(float)
+    return rankings
+
+
+def read_db_aggregates(account, pool=None):
+    """Return the same tables as tweet_aggregates.build_aggregates, computed from the rollups"""
+    rollups = query("""
+        SELECT CASE WHEN isfinite(month) THEN month END AS month, sentiment, topics, tweets, scored, score_sum
+        FROM tweet_rollups WHERE account = %s
+    """, (account,), pool=pool)
+    # min/max on the (account, timestamp) index reads one entry at each end
+    bounds = query("SELECT min(timestamp) AS first_tweet, max(timestamp) AS last_tweet FROM tweets WHERE account = %s",
+                   (account,), pool=pool)
+
+    rollups['tweets'] = rollups['tweets'].astype(int)
+    rollups['month'] = pd.to_datetime(rollups['month'])
+    dated = rollups[rollups['month'].notna()]
+    with_sentiment = rollups['sentiment'] != ''
+    with_topic = rollups['topics'] != ''
+
+    def counts(mask, column, name):
+        table = (rollups[mask].groupby(column)['tweets'].sum()
+                 .sort_values(ascending=False).reset_index())
+        table.columns = [name, 'Count']
+        return table
+
+    def monthly(column):
+        return (dated[dated[column] != ''].groupby(['month', column])['tweets'].sum()
+                .reset_index().rename(columns={'month': 'year_month', 'tweets': 'count'}))
+
+    scored = rollups['scored'].sum()
+    summary = pd.DataFrame({
+        'tweets': [int(rollups['tweets'].sum())],
+        'score': [float(rollups['score_sum'].sum() / scored) if scored else float('nan')],
+        'first_tweet': pd.to_datetime(bounds['first_tweet'], utc=True),
+        'last_tweet': pd.to_datetime(bounds['last_tweet'], utc=True),
+    })
+
+    return {
+        'summary': summary,
+        'sentiment_counts': counts(with_sentiment, 'sentiment', 'Sentiment'),
+        'topic_counts': counts(with_topic, 'topics', 'Topic'),
+        'monthly_sentiment': monthly('sentiment'),
+        'monthly_topics': monthly('topics'),
+    }
+
+
+def recent_tweets(account, sentiment=None, topic=None, limit=10, pool=None):
+    """An account's newest tweets, optionally with one sentiment or topic"""
+    conditions, params = ["account = %s", "timestamp IS NOT NULL"], [account]
+    if sentiment is not None:
+        conditions.append("sentiment = %s")
+        params.append(sentiment)
+    if topic is not None:
+        conditions.append("topics = %s")
+        params.append(topic)
+    return query(f"""
+        SELECT {', '.join(TWEET_LIST_COLUMNS)} FROM tweets
+        WHERE {' AND '.join(conditions)}
+        ORDER BY timestamp DESC
+        LIMIT %s
+    """, (*params, limit), pool=pool)
+
+
+def apply_schema(pool=None, schema_path=SCHEMA_PATH):
+    pool = pool or get_pool()
+    with open(schema_path, encoding="utf-8") as f:
+        schema = f.read()
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(schema)
+    logging.info(f"Applied {schema_path}")
+
+
+def rebuild_rollups(pool=None):
+    pool = pool or get_pool()
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT rebuild_tweet_rollups()")
+            cursor.execute("SELECT count(*) FROM tweet_rollups")
+            rows = cursor.fetchone()[0]
+    logging.info(f"Rebuilt tweet_rollups: {rows} rows")
+
+
+def load_account(account, config, pool=None, batch_size=5000):
+    """Sync an account's final CSV into the tweets table, batch by batch"""
+    from db_operations.insert_operations import sync_tweets, tweets_from_csv
+    totals = {"inserted": 0, "updated": 0}
+    batch = []
+    for tweet in tweets_from_csv(config['final'], account):
+        batch.append(tweet)
+        if len(batch) >= batch_size:
+            stats = sync_tweets(batch, pool)
+            totals = {key: totals[key] + stats[key] for key in totals}
+            batch = []
+    if batch:
+        stats = sync_tweets(batch, pool)
+        totals = {key: totals[key] + stats[key] for key in totals}
+    logging.info(f"{account}: {totals['inserted']} tweets inserted, {totals['updated']} updated")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("setup", help="Create the tables, indexes and triggers, then count existing tweets")
+    load = subparsers.add_parser("load", help="Sync final tweet CSVs into the tweets table")
+    load.add_argument("accounts", nargs="*", help="Account names or slugs (default: all)")
+    load.add_argument("--batch-size", type=int, default=5000, help="Tweets per transaction")
+    subparsers.add_parser("rebuild", help="Recount the rollups from the tweets table")
+    args = parser.parse_args()
+
+    pool = get_pool()
+    try:
+        if args.command == "setup":
+            apply_schema(pool)
+            rebuild_rollups(pool)
+        elif args.command == "load":
+            for account, config in resolve_accounts(args.accounts):
+                load_account(account, config, pool, args.batch_size)
+        else:
+            rebuild_rollups(pool)
+    finally:
+        pool.closeall()
+
+
+if __name__ == "__main__":
+    main()
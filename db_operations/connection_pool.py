@@ -0,0 +1,95 @@
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+
+from config.db_config import connect_to_db
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """Thread-safe pool of connections created with config.db_config.connect_to_db."""
+
+    def __init__(self, maxconn=4, factory=connect_to_db):
+        self.factory = factory
+        self.maxconn = maxconn
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def getconn(self, timeout=30):
+        """Return an idle connection, opening a new one while the pool is below maxconn."""
+        while True:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                conn = None
+                with self.lock:
+                    if self.created < self.maxconn:
+                        self.created += 1
+                        reserved = True
+                    else:
+                        reserved = False
+                if reserved:
+                    conn = self.factory()
+                    if conn is None:
+                        with self.lock:
+                            self.created -= 1
+                        raise ConnectionError("Database connection failed")
+                    return conn
+                try:
+                    conn = self.idle.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No database connection available after {timeout}s") from None
+
+            if not conn.closed:
+                return conn
+            # Drop connections the server has closed and try again
+            with self.lock:
+                self.created -= 1
+
+    def putconn(self, conn):
+        if conn.closed:
+            with self.lock:
+                self.created -= 1
+            return
+        self.idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Lend a connection for one transaction: commit on success, roll back on error."""
+        conn = self.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        while True:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self.lock:
+                self.created -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(maxconn=4):
+    """Return the process-wide shared connection pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(maxconn=maxconn)
+            logger.info("event=pool_created maxconn=%d", maxconn)
+        return _pool
@@ -1,41 +1,219 @@
+import argparse
+import codecs
+import glob
 import json
 import logging
-from config.db_config import connect_to_db
+import os
+import time
+
+from psycopg2.extras import execute_values
+
+from db_operations.connection_pool import get_pool
+from instrumentation import metrics
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def insert_conversation_into_db(tweet_id, author_name, author_handle, conversation):
-    """Insert tweet conversation into the database."""
-    conn = connect_to_db()
-    if conn is None:
-        logging.error("Database connection failed. Insert operation aborted.")
-        return
+DEFAULT_STATE_FILE = "conversations/.ingest_state.json"
+_WHITESPACE = " \t\r\n"
 
+
+def insert_conversation_into_db(tweet_id, author_name, author_handle, conversation, pool=None):
+    """Insert tweet conversation into the database."""
+    pool = pool or get_pool()
     try:
-        cur = conn.cursor()
-        
-        # Convert conversation into JSON format
-        conversation_json = json.dumps(conversation)
-
-        # Insert query
-        cur.execute("""
-            INSERT INTO cases (tweet_id, author_name, author_handle, conversation)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (tweet_id) DO NOTHING;
-        """, (tweet_id, author_name, author_handle, conversation_json))
-        
-        # Commit transaction
-        conn.commit()
+        with pool.connection() as conn:
+            with conn.cursor() as cur:
+                # Convert conversation into JSON format
+                conversation_json = json.dumps(conversation)
+
+                # Insert query
+                cur.execute("""
+                    INSERT INTO cases (tweet_id, author_name, author_handle, conversation)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (tweet_id) DO NOTHING;
+                """, (tweet_id, author_name, author_handle, conversation_json))
+
         logging.info(f"Inserted tweet {tweet_id} into the database.")
 
     except Exception as e:
         logging.error(f"Error inserting tweet {tweet_id} into the database: {e}")
-        if conn:
-            conn.rollback()
+
+
+def iter_json_array(path, start_offset=0, chunk_size=1 << 16):
+    """Yield (record, end_offset) for each element of a top-level JSON array, reading in chunks.
+
+    Memory use is bounded by the chunk size and the largest single record. end_offset is
+    the byte offset just after the record, so a later call can resume from it.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    with open(path, "rb") as f:
+        f.seek(start_offset)
+        buffer = ""
+        buffer_offset = start_offset  # Byte offset of buffer[0] in the file
+        eof = False
+        expect_open = start_offset == 0
+
+        def fill():
+            nonlocal buffer, eof
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer += utf8.decode(chunk, final=eof)
+
+        def consume(count):
+            nonlocal buffer, buffer_offset
+            buffer_offset += len(buffer[:count].encode("utf-8"))
+            buffer = buffer[count:]
+
+        while True:
+            # Skip whitespace and the array punctuation before the next record
+            stripped = buffer.lstrip(_WHITESPACE)
+            consume(len(buffer) - len(stripped))
+            if not buffer:
+                if eof:
+                    return
+                fill()
+                continue
+            if expect_open:
+                if buffer[0] == "\ufeff":
+                    consume(1)
+                    continue
+                if buffer[0] != "[":
+                    raise ValueError(f"{path} does not contain a JSON array")
+                expect_open = False
+                consume(1)
+                continue
+            if buffer[0] == ",":
+                consume(1)
+                continue
+            if buffer[0] == "]":
+                return
+
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The record continues past the end of the buffer
+                fill()
+                continue
+            if end == len(buffer) and not eof:
+                # A number at the end of the buffer may be cut short; read on to be sure
+                fill()
+                continue
+            consume(end)
+            yield record, buffer_offset
+
+
+def load_state(state_file):
+    if state_file and os.path.exists(state_file):
+        with open(state_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state_file, state):
+    tmp_path = state_file + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_file)
+
+
+def insert_cases(cursor, rows, page_size=1000):
+    execute_values(
+        cursor,
+        """
+        INSERT INTO cases (tweet_id, author_name, author_handle, conversation)
+        VALUES %s
+        ON CONFLICT (tweet_id) DO NOTHING
+        """,
+        rows,
+        page_size=page_size
+    )
+
+
+def ingest_conversation_file(path, pool=None, batch_size=1000, state=None, state_file=None):
+    """Stream one conversations JSON file into the cases table in batched transactions.
+
+    Progress (byte offset and record index) is stored in state after every committed
+    batch, so a failed import resumes after the last committed record.
+    """
+    pool = pool or get_pool()
+    state = state if state is not None else {}
+    stat = os.stat(path)
+    progress = state.get(path)
+    if not progress or progress.get("size") != stat.st_size or progress.get("mtime") != stat.st_mtime:
+        # New or rewritten file: offsets from an earlier version no longer apply
+        progress = {"offset": 0, "records": 0, "size": stat.st_size, "mtime": stat.st_mtime}
+    if progress.get("complete"):
+        logging.info(f"Skipping {path}: already ingested ({progress['records']} records)")
+        return 0
+
+    started = time.perf_counter()
+    inserted = 0
+    batch = []
+    last_offset = progress["offset"]
+
+    def flush():
+        nonlocal batch, inserted
+        with metrics.timer("db_write", event="insert_cases"), pool.connection() as conn:
+            with conn.cursor() as cursor:
+                insert_cases(cursor, batch, batch_size)
+                inserted += cursor.rowcount if cursor.rowcount > 0 else 0
+        metrics.inc("db_rows_written", len(batch), event="insert_cases")
+        progress["offset"] = last_offset
+        progress["records"] += len(batch)
+        state[path] = progress
+        if state_file:
+            save_state(state_file, state)
+        batch = []
+
+    for record, end_offset in iter_json_array(path, progress["offset"]):
+        batch.append((
+            record["tweet_id"],
+            record.get("author_name"),
+            record.get("author_handle"),
+            json.dumps(record.get("conversation", []), ensure_ascii=False)
+        ))
+        last_offset = end_offset
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    progress["complete"] = True
+    state[path] = progress
+    if state_file:
+        save_state(state_file, state)
+
+    elapsed = time.perf_counter() - started
+    rate = progress['records'] / elapsed if elapsed > 0 else float('inf')
+    logging.info(f"Ingested {progress['records']} conversations from {path} in {elapsed:.2f}s "
+                 f"({rate:.0f} rows/sec, {inserted} new)")
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream conversation dumps into the cases table.")
+    parser.add_argument("files", nargs="*", help="Conversation JSON files (default: conversations/*.json)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Conversations per transaction")
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE, help="Where import progress is recorded")
+    parser.add_argument("--restart", action="store_true", help="Ignore recorded progress and import from the start")
+    parser.add_argument("--metrics-file", help="Write DB write timings here (.prom for a Prometheus textfile, else JSON)")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob("conversations/*.json"))
+    state = {} if args.restart else load_state(args.state_file)
+    pool = get_pool(maxconn=1)
+    try:
+        for path in files:
+            ingest_conversation_file(path, pool, args.batch_size, state, args.state_file)
     finally:
-        # Close the cursor and connection in the finally block to ensure they are closed even if an error occurs
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
+        pool.closeall()
+        if args.metrics_file:
+            metrics.write(args.metrics_file, labels={"job": "ingest_conversations"})
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,20 @@
-import psycopg2
+import argparse
+import csv
+import logging
+import time
+
+from psycopg2.extras import execute_values
+
+from db_operations.connection_pool import get_pool
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+# images stays last; _rows converts it to an array
+TWEET_COLUMNS = ("account", "author_name", "author_handle", "profile_img_url", "text", "tweet_url", "timestamp",
+                 "sentiment", "sentiment_score", "topics", "images")
+REPLY_COLUMNS = ("tweet_id", "author_name", "author_handle", "profile_img_url", "text", "timestamp", "images")
+
 
 def format_images(images):
     """Format a list of image URLs into a PostgreSQL array literal."""
@@ -6,17 +22,11 @@ def format_images(images):
         return '{' + ','.join(images) + '}'
     return '{}'
 
+
 def insert_tweet(author_name, author_handle, profile_img_url, text, tweet_url, timestamp, metrics, images, conn):
     """Insert a tweet into the database."""
-    formatted_images = format_images(images) 
-    print("Inserting tweet with parameters:")
-    print(f"Author Name: {author_name}")
-    print(f"Author Handle: {author_handle}")
-    print(f"Profile Image URL: {profile_img_url}")
-    print(f"Text: {text}")
-    print(f"Tweet URL: {tweet_url}")
-    print(f"Timestamp: {timestamp}")
-    print(f"Images: {formatted_images}") # Use the formatted images
+    formatted_images = format_images(images)
+    logger.debug("event=insert_tweet author_handle=%s tweet_url=%s timestamp=%s", author_handle, tweet_url, timestamp)
     try:
         with conn.cursor() as cursor:
             cursor.execute("""
@@ -27,10 +37,10 @@ def insert_tweet(author_name, author_handle, profile_img_url, text, tweet_url, t
 
             tweet_id = cursor.fetchone()[0]
             conn.commit()
-            print(f"Inserted tweet with ID: {tweet_id}")
+            logger.info("event=tweet_inserted tweet_id=%s", tweet_id)
             return tweet_id
     except Exception as e:
-        print(f"Error inserting tweet: {str(e)}")
+        logger.error("event=insert_tweet_failed tweet_url=%s error=%r", tweet_url, str(e))
         conn.rollback()
         return None
 
@@ -38,14 +48,7 @@ def insert_tweet(author_name, author_handle, profile_img_url, text, tweet_url, t
 def insert_reply(tweet_id, author_name, author_handle, profile_img_url, text, timestamp, metrics, images, conn):
     """Insert a reply into the database."""
     formatted_images = format_images(images)
-    print("Inserting tweet with parameters:")
-    print(f"Author Name: {author_name}")
-    print(f"Author Handle: {author_handle}")
-    print(f"Profile Image URL: {profile_img_url}")
-    print(f"Text: {text}")
-    print(f"Tweet URL: {tweet_url}")
-    print(f"Timestamp: {timestamp}")
-    print(f"Images: {formatted_images}")  # Use the formatted images
+    logger.debug("event=insert_reply tweet_id=%s author_handle=%s timestamp=%s", tweet_id, author_handle, timestamp)
     try:
         with conn.cursor() as cursor:
             cursor.execute("""
@@ -54,9 +57,184 @@ def insert_reply(tweet_id, author_name, author_handle, profile_img_url, text, ti
             """, (tweet_id, author_name, author_handle, profile_img_url, text, timestamp, formatted_images))  # Use formatted_images here
 
             conn.commit()
-            print(f"Inserted reply for tweet ID: {tweet_id}")
+            logger.info("event=reply_inserted tweet_id=%s", tweet_id)
     except Exception as e:
-        print(f"Error inserting reply: {str(e)}")
+        logger.error("event=insert_reply_failed tweet_id=%s error=%r", tweet_id, str(e))
         conn.rollback()
 
 
+def _rows(records, columns):
+    rows = []
+    for record in records:
+        row = [record.get(column) for column in columns]
+        # psycopg2 adapts Python lists to PostgreSQL arrays
+        row[-1] = list(record.get("images") or [])
+        rows.append(tuple(row))
+    return rows
+
+
+def _log_throughput(event, rows, started):
+    elapsed = time.perf_counter() - started
+    metrics.observe("db_write", elapsed, event=event)
+    metrics.inc("db_rows_written", rows, event=event)
+    rate = rows / elapsed if elapsed > 0 else float("inf")
+    logger.info("event=%s rows=%d seconds=%.3f rows_per_sec=%.0f", event, rows, elapsed, rate)
+    return {"rows": rows, "seconds": elapsed, "rows_per_sec": rate}
+
+
+def bulk_insert_tweets(tweets, cursor, page_size=1000):
+    """Insert tweet records with multi-row INSERTs and return their new tweet_ids in input order.
+
+    A tweet already stored for the same account and tweet_url, or earlier in the same batch,
+    is skipped and gets None instead of a tweet_id.
+    """
+    inserted = execute_values(
+        cursor,
+        f"""INSERT INTO tweets ({', '.join(TWEET_COLUMNS)}) VALUES %s
+            ON CONFLICT (account, tweet_url) DO NOTHING
+            RETURNING account, tweet_url, tweet_id""",
+        _rows(tweets, TWEET_COLUMNS),
+        page_size=page_size,
+        fetch=True
+    )
+    tweet_ids = {(account, tweet_url): tweet_id for account, tweet_url, tweet_id in inserted}
+    return [tweet_ids.pop((tweet.get("account"), tweet.get("tweet_url")), None) for tweet in tweets]
+
+
+def bulk_insert_replies(replies, cursor, page_size=1000):
+    """Insert reply records, each carrying the tweet_id of the tweet it answers, with multi-row INSERTs."""
+    execute_values(
+        cursor,
+        f"INSERT INTO replies ({', '.join(REPLY_COLUMNS)}) VALUES %s",
+        _rows(replies, REPLY_COLUMNS),
+        page_size=page_size
+    )
+
+
+def load_tweets(tweets, pool=None, page_size=1000):
+    """Write a batch of tweets and their replies in a single transaction.
+
+    Each tweet is a dict with the TWEET_COLUMNS keys (account, sentiment, sentiment_score and
+    topics may be missing, for tweets not scored yet) and an optional "replies" list of
+    dicts with the REPLY_COLUMNS keys other than tweet_id, which is filled in from the
+    inserted tweet. Tweets already stored for the same account and tweet_url are skipped with
+    their replies, so writing a batch twice stores it once. Returns the new tweet_ids (None
+    for skipped tweets) and rows/sec statistics.
+    """
+    pool = pool or get_pool()
+    tweets = list(tweets)
+    started = time.perf_counter()
+
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            tweet_ids = bulk_insert_tweets(tweets, cursor, page_size)
+            replies = [
+                dict(reply, tweet_id=tweet_id)
+                for tweet, tweet_id in zip(tweets, tweet_ids) if tweet_id is not None
+                for reply in tweet.get("replies") or []
+            ]
+            if replies:
+                bulk_insert_replies(replies, cursor, page_size)
+
+    stats = _log_throughput("bulk_load", len(tweets) + len(replies), started)
+    skipped = tweet_ids.count(None)
+    if skipped:
+        logger.info("event=bulk_load_skipped tweets=%d reason=already_stored", skipped)
+    stats.update(tweets=len(tweets), replies=len(replies), skipped=skipped, tweet_ids=tweet_ids)
+    return stats
+
+
+def load_replies(replies, pool=None, page_size=1000):
+    """Write a batch of reply records for existing tweets in a single transaction."""
+    pool = pool or get_pool()
+    replies = list(replies)
+    started = time.perf_counter()
+
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            bulk_insert_replies(replies, cursor, page_size)
+
+    return _log_throughput("bulk_load_replies", len(replies), started)
+
+
+def sync_tweets(tweets, pool=None, page_size=1000):
+    """Update the sentiment and topics of tweets already stored for the same account and tweet_url,
+    and insert the rest, in a single transaction.
+
+    Loading an account's final CSV this way fills in the topics of tweets that were streamed
+    in unscored or without a topic, instead of storing them twice. The upsert relies on the
+    unique (account, tweet_url) index, so concurrent loads cannot insert the same tweet twice.
+    """
+    pool = pool or get_pool()
+    # A batch may hold a tweet more than once; an upsert can only touch each row once per statement
+    tweets = list({(tweet.get("account"), tweet.get("tweet_url")): tweet for tweet in tweets}.values())
+    started = time.perf_counter()
+
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            # xmax is 0 for a row this statement inserted; unchanged rows are not returned
+            written = execute_values(
+                cursor,
+                f"""INSERT INTO tweets ({', '.join(TWEET_COLUMNS)}) VALUES %s
+                    ON CONFLICT (account, tweet_url) DO UPDATE
+                    SET sentiment = EXCLUDED.sentiment, sentiment_score = EXCLUDED.sentiment_score,
+                        topics = EXCLUDED.topics
+                    WHERE (tweets.sentiment, tweets.sentiment_score, tweets.topics)
+                          IS DISTINCT FROM (EXCLUDED.sentiment, EXCLUDED.sentiment_score, EXCLUDED.topics)
+                    RETURNING xmax = 0""",
+                _rows(tweets, TWEET_COLUMNS),
+                page_size=page_size,
+                fetch=True
+            )
+    inserted = sum(1 for (is_new,) in written if is_new)
+
+    stats = _log_throughput("sync", len(tweets), started)
+    stats.update(updated=len(written) - inserted, inserted=inserted)
+    return stats
+
+
+def _float(value):
+    return float(value) if value not in (None, "") else None
+
+
+def tweets_from_csv(csv_path, account=None):
+    """Read a scraped or final tweets CSV into tweet records for load_tweets, tagged with account."""
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            images = row.get("image_urls") or ""
+            yield {
+                "account": account,
+                "author_name": row.get("author_name"),
+                "author_handle": row.get("author_handle"),
+                "profile_img_url": None,
+                "text": row.get("text"),
+                "tweet_url": row.get("tweet_link"),
+                "timestamp": row.get("timestamp") or None,
+                "sentiment": row.get("sentiment") or None,
+                "sentiment_score": _float(row.get("sentiment_score")),
+                "topics": row.get("topics") or None,
+                "images": [url.strip() for url in images.replace("|", ",").split(",") if url.strip()],
+            }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Bulk load scraped tweet CSVs into the tweets table.")
+    parser.add_argument("csv_files", nargs="+")
+    parser.add_argument("--account", help="Dashboard account the tweets belong to")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Tweets per transaction")
+    parser.add_argument("--metrics-file", help="Write DB write timings here (.prom for a Prometheus textfile, else JSON)")
+    args = parser.parse_args()
+
+    for csv_path in args.csv_files:
+        batch = []
+        for tweet in tweets_from_csv(csv_path, args.account):
+            batch.append(tweet)
+            if len(batch) >= args.batch_size:
+                load_tweets(batch)
+                batch = []
+        if batch:
+            load_tweets(batch)
+    get_pool().closeall()
+    if args.metrics_file:
+        metrics.write(args.metrics_file, labels={"job": "load_tweets"})
@@ -0,0 +1,137 @@
+-- Tables written by db_operations. Apply with: psql -d twitter_scraper -f db_operations/schema.sql
+
+CREATE TABLE IF NOT EXISTS tweets (
+    tweet_id SERIAL PRIMARY KEY,
+    author_name TEXT,
+    author_handle TEXT,
+    profile_img_url TEXT,
+    text TEXT,
+    tweet_url TEXT,
+    timestamp TIMESTAMPTZ,
+    images TEXT[] DEFAULT '{}'
+);
+
+-- Filled in when tweets are loaded already scored, as by stream_ingest.py
+ALTER TABLE tweets ADD COLUMN IF NOT EXISTS sentiment TEXT;
+ALTER TABLE tweets ADD COLUMN IF NOT EXISTS sentiment_score REAL;
+
+-- The dashboard account a tweet belongs to, and its topic once topic modelling has run
+ALTER TABLE tweets ADD COLUMN IF NOT EXISTS account TEXT;
+ALTER TABLE tweets ADD COLUMN IF NOT EXISTS topics TEXT;
+
+CREATE INDEX IF NOT EXISTS tweets_account_timestamp ON tweets (account, timestamp);
+CREATE INDEX IF NOT EXISTS tweets_account_topics ON tweets (account, topics, timestamp);
+CREATE INDEX IF NOT EXISTS tweets_tweet_url ON tweets (tweet_url);
+
+-- Tweet counts per account, month, sentiment and topic, kept current by the triggers below.
+-- Tweets without a timestamp count under month '-infinity'; a missing sentiment or topic is ''.
+CREATE TABLE IF NOT EXISTS tweet_rollups (
+    account TEXT NOT NULL,
+    month DATE NOT NULL,
+    sentiment TEXT NOT NULL,
+    topics TEXT NOT NULL,
+    tweets BIGINT NOT NULL,
+    scored BIGINT NOT NULL,
+    score_sum DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (account, month, sentiment, topics)
+);
+
+-- Dashboard score of a sentiment label, as tweet_aggregates.SENTIMENT_SCORES
+CREATE OR REPLACE FUNCTION sentiment_points(sentiment TEXT) RETURNS DOUBLE PRECISION
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE sentiment WHEN 'positive' THEN 5 WHEN 'neutral' THEN 2.5 WHEN 'negative' THEN 0 END
+$$;
+
+-- Fold the rows a statement inserted, updated or deleted into tweet_rollups: old rows are
+-- subtracted and new rows added, one upsert per statement rather than per row.
+CREATE OR REPLACE FUNCTION apply_tweet_rollups() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    changed TEXT := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT *, 1 AS sign FROM new_rows'
+        WHEN 'DELETE' THEN 'SELECT *, -1 AS sign FROM old_rows'
+        ELSE 'SELECT *, -1 AS sign FROM old_rows UNION ALL SELECT *, 1 AS sign FROM new_rows'
+    END;
+BEGIN
+    -- Each trigger only sees its own transition tables, so the source is spliced in
+    EXECUTE format($sql$
+        INSERT INTO tweet_rollups AS r (account, month, sentiment, topics, tweets, scored, score_sum)
+        SELECT account,
+               coalesce(date_trunc('month', timestamp AT TIME ZONE 'UTC')::date, '-infinity'::date),
+               coalesce(sentiment, ''), coalesce(topics, ''), sum(sign),
+               sum(sign * (sentiment_points(sentiment) IS NOT NULL)::int),
+               coalesce(sum(sign * sentiment_points(sentiment)), 0)
+        FROM (%s) changed
+        WHERE account IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT (account, month, sentiment, topics) DO UPDATE
+            SET tweets = r.tweets + EXCLUDED.tweets,
+                scored = r.scored + EXCLUDED.scored,
+                score_sum = r.score_sum + EXCLUDED.score_sum
+    $sql$, changed);
+    DELETE FROM tweet_rollups WHERE tweets = 0;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS tweets_rollups_insert ON tweets;
+CREATE TRIGGER tweets_rollups_insert AFTER INSERT ON tweets
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_tweet_rollups();
+DROP TRIGGER IF EXISTS tweets_rollups_update ON tweets;
+CREATE TRIGGER tweets_rollups_update AFTER UPDATE ON tweets
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_tweet_rollups();
+DROP TRIGGER IF EXISTS tweets_rollups_delete ON tweets;
+CREATE TRIGGER tweets_rollups_delete AFTER DELETE ON tweets
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_tweet_rollups();
+
+-- Recount tweet_rollups from scratch, for tweets loaded before the triggers existed
+CREATE OR REPLACE FUNCTION rebuild_tweet_rollups() RETURNS void
+LANGUAGE sql AS $$
+    LOCK TABLE tweets IN SHARE MODE;
+    DELETE FROM tweet_rollups;
+    INSERT INTO tweet_rollups (account, month, sentiment, topics, tweets, scored, score_sum)
+    SELECT account,
+           coalesce(date_trunc('month', timestamp AT TIME ZONE 'UTC')::date, '-infinity'::date),
+           coalesce(sentiment, ''), coalesce(topics, ''), count(*),
+           count(sentiment_points(sentiment)), coalesce(sum(sentiment_points(sentiment)), 0)
+    FROM tweets
+    WHERE account IS NOT NULL
+    GROUP BY 1, 2, 3, 4;
+$$;
+
+-- Mean sentiment score of each account, for the dashboard's ranking
+CREATE OR REPLACE VIEW account_scores AS
+SELECT account, sum(tweets) AS tweets, sum(score_sum) / nullif(sum(scored), 0) AS score
+FROM tweet_rollups
+GROUP BY account;
+
+CREATE TABLE IF NOT EXISTS replies (
+    reply_id SERIAL PRIMARY KEY,
+    tweet_id INTEGER REFERENCES tweets (tweet_id),
+    author_name TEXT,
+    author_handle TEXT,
+    profile_img_url TEXT,
+    text TEXT,
+    timestamp TIMESTAMPTZ,
+    images TEXT[] DEFAULT '{}'
+);
+
+-- A tweet is stored once per account, so a batch written again after a crash or retry is a
+-- no-op. Copies stored before this index existed are folded into the first one, replies included.
+UPDATE replies r SET tweet_id = d.first_id
+FROM (SELECT tweet_id, min(tweet_id) OVER (PARTITION BY account, tweet_url) AS first_id FROM tweets) d
+WHERE r.tweet_id = d.tweet_id AND d.tweet_id <> d.first_id;
+DELETE FROM tweets t
+USING (SELECT tweet_id, min(tweet_id) OVER (PARTITION BY account, tweet_url) AS first_id FROM tweets) d
+WHERE t.tweet_id = d.tweet_id AND d.tweet_id <> d.first_id;
+CREATE UNIQUE INDEX IF NOT EXISTS tweets_account_tweet_url ON tweets (account, tweet_url) NULLS NOT DISTINCT;
+
+CREATE TABLE IF NOT EXISTS cases (
+    tweet_id TEXT PRIMARY KEY,
+    author_name TEXT,
+    author_handle TEXT,
+    conversation JSONB
+);
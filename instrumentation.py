@@ -0,0 +1,195 @@
+"""Timers, counters and profiling hooks for the scraper and scoring jobs.
+
+    from instrumentation import metrics
+
+    with metrics.timer("parse"):
+        articles = extractor.parse_articles(html)
+    metrics.inc("tweets_added")
+    metrics.write("metrics/scraper.prom", labels={"account": "FibeIndia"})
+
+write() produces a Prometheus textfile (for node_exporter's textfile collector) when the
+path ends in .prom, and a JSON summary otherwise.
+"""
+import cProfile
+import json
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILERS = ("cprofile", "py-spy")
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in sorted(labels.items())) + "}"
+
+
+class Metrics:
+    """Thread-safe counters and timers, each keyed by a name and optional labels.
+
+    A timer keeps the number of observations, their total and the slowest one, which is
+    enough to see where a run spent its time without storing every sample.
+    """
+
+    def __init__(self, prefix="tweets"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.timers = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            timer = self.timers.get(key)
+            if timer is None:
+                self.timers[key] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                timer[2] = max(timer[2], seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+
+    def summary(self):
+        """Return the counters and timers as plain dicts, slowest timers first."""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            timers = [{"name": name, "labels": dict(labels), "count": count, "seconds": total,
+                       "mean_seconds": total / count, "max_seconds": slowest}
+                      for (name, labels), (count, total, slowest) in self.timers.items()]
+        timers.sort(key=lambda timer: timer["seconds"], reverse=True)
+        return {"counters": counters, "timers": timers}
+
+    def to_prometheus(self, labels=None):
+        """Render the metrics in the Prometheus text exposition format."""
+        labels = labels or {}
+        summary = self.summary()
+        lines = []
+        declared = set()
+
+        def declare(metric, kind):
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} {kind}")
+
+        for counter in summary["counters"]:
+            metric = f"{self.prefix}_{counter['name']}_total"
+            declare(metric, "counter")
+            lines.append(f"{metric}{_format_labels({**labels, **counter['labels']})} {counter['value']}")
+        timers = sorted(summary["timers"], key=lambda timer: timer["name"])
+        for name in dict.fromkeys(timer["name"] for timer in timers):
+            # Each family's samples must be contiguous, so the _max gauges follow the whole summary
+            family = [timer for timer in timers if timer["name"] == name]
+            metric = f"{self.prefix}_{name}_seconds"
+            declare(metric, "summary")
+            for timer in family:
+                timer_labels = _format_labels({**labels, **timer["labels"]})
+                lines.append(f"{metric}_sum{timer_labels} {timer['seconds']:.6f}")
+                lines.append(f"{metric}_count{timer_labels} {timer['count']}")
+            declare(f"{metric}_max", "gauge")
+            for timer in family:
+                lines.append(f"{metric}_max{_format_labels({**labels, **timer['labels']})} {timer['max_seconds']:.6f}")
+        declare(f"{self.prefix}_metrics_written_timestamp_seconds", "gauge")
+        lines.append(f"{self.prefix}_metrics_written_timestamp_seconds{_format_labels(labels)} {time.time():.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, labels=None):
+        """Write the metrics to path atomically, as a Prometheus textfile for .prom and JSON otherwise."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if path.endswith(".prom"):
+                f.write(self.to_prometheus(labels))
+            else:
+                json.dump({"labels": labels or {}, "written": time.time(), **self.summary()}, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def log_summary(self, top=10):
+        """Log where the time went: the timers with the largest totals."""
+        for timer in self.summary()["timers"][:top]:
+            name = " ".join([timer["name"]] + [f"{key}={value}" for key, value in timer["labels"].items()])
+            logging.info(f"{name:>24}: {timer['seconds']:.2f}s total over {timer['count']} calls "
+                         f"(mean {timer['mean_seconds'] * 1000:.1f} ms, max {timer['max_seconds'] * 1000:.1f} ms)")
+
+
+# Registry shared by everything running in this process
+metrics = Metrics()
+
+
+@contextmanager
+def profiling(output=None, profiler="cprofile"):
+    """Profile the enclosed block into output, or do nothing when output is None.
+
+    cprofile writes a pstats file (python -m pstats, snakeviz). py-spy samples this
+    process from outside, without slowing it down, and writes a speedscope JSON file;
+    it must be installed and allowed to attach to the process.
+    """
+    if not output:
+        yield
+        return
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+
+    if profiler == "cprofile":
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(output)
+            logging.info(f"Wrote cProfile stats to {output}")
+        return
+
+    if profiler != "py-spy":
+        raise ValueError(f"Unknown profiler {profiler!r}; expected one of {', '.join(PROFILERS)}")
+    executable = shutil.which("py-spy")
+    if executable is None:
+        logging.warning("py-spy is not installed; running without profiling")
+        yield
+        return
+    process = subprocess.Popen([executable, "record", "--pid", str(os.getpid()), "--output", output,
+                                "--format", "speedscope", "--nonblocking"])
+    try:
+        yield
+    finally:
+        # py-spy writes its output when interrupted
+        process.send_signal(signal.CTRL_C_EVENT if sys.platform == "win32" else signal.SIGINT)
+        try:
+            process.wait(timeout=60)
+            logging.info(f"Wrote py-spy profile to {output}")
+        except subprocess.TimeoutExpired:
+            process.kill()
+            logging.warning(f"py-spy did not stop in time; {output} may be incomplete")
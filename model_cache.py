@@ -0,0 +1,227 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import unicodedata
+
+DEFAULT_CACHE_PATH = ".cache/model_outputs.sqlite"
+
+# SQLite caps the number of bound parameters per statement
+_QUERY_CHUNK = 500
+
+
+def normalize_text(text):
+    """Normalize text so that trivially different copies of a tweet share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(task, model_id, model_version, text):
+    payload = "\x1f".join((task, model_id, model_version, normalize_text(text)))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ModelCache:
+    """Persistent cache of model outputs keyed by a hash of the normalized text and the model.
+
+    Each task (sentiment, language, topic, ...) is bound to a model id and version. Binding a
+    task to a different model drops its old entries, and the cache is trimmed back to
+    max_bytes by evicting the least recently used entries.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=256 * 1024 * 1024):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.models = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                task TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+            CREATE INDEX IF NOT EXISTS entries_task ON entries (task);
+            CREATE TABLE IF NOT EXISTS models (
+                task TEXT PRIMARY KEY,
+                model_id TEXT NOT NULL,
+                model_version TEXT NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def bind(self, task, model_id, model_version):
+        """Associate a task with a model, invalidating entries written by any other model."""
+        model_version = str(model_version)
+        row = self.conn.execute(
+            "SELECT model_id, model_version FROM models WHERE task = ?", (task,)
+        ).fetchone()
+        if row is not None and row != (model_id, model_version):
+            deleted = self.conn.execute("DELETE FROM entries WHERE task = ?", (task,)).rowcount
+            logging.info(f"Model for '{task}' changed from {row[0]}@{row[1]} to "
+                         f"{model_id}@{model_version}; invalidated {deleted} cached outputs")
+        self.conn.execute(
+            "INSERT OR REPLACE INTO models (task, model_id, model_version) VALUES (?, ?, ?)",
+            (task, model_id, model_version)
+        )
+        self.conn.commit()
+        self.models[task] = (model_id, model_version)
+
+    def make_key(self, task, text):
+        return cache_key(task, *self.models[task], text)
+
+    def get_many(self, task, texts):
+        """Return a dict mapping each cached text to its stored output."""
+        texts = list(dict.fromkeys(texts))
+        keys = {}
+        for text in texts:
+            keys.setdefault(self.make_key(task, text), []).append(text)
+
+        found = {}
+        key_list = list(keys)
+        now = time.time()
+        for start in range(0, len(key_list), _QUERY_CHUNK):
+            chunk = key_list[start:start + _QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT key, value FROM entries WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            for key, value in rows:
+                for text in keys[key]:
+                    found[text] = json.loads(value)
+            self.conn.execute(
+                f"UPDATE entries SET accessed = ? WHERE key IN ({placeholders})", [now, *chunk]
+            )
+        self.conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(texts) - len(found)
+        return found
+
+    def put_many(self, task, items):
+        """Store (text, output) pairs and evict old entries if the cache grew too large."""
+        now = time.time()
+        rows = []
+        for text, value in items:
+            encoded = json.dumps(value, ensure_ascii=False)
+            rows.append((self.make_key(task, text), task, encoded, len(encoded.encode("utf-8")), now))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO entries (key, task, value, size, accessed) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        self.conn.commit()
+        self.evict()
+
+    def apply(self, pending):
+        """Store the outputs a DeferredCache collected, binding their tasks to its models first."""
+        for task, (model_id, model_version) in pending["models"].items():
+            if self.models.get(task) != (model_id, model_version):
+                self.bind(task, model_id, model_version)
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO entries (key, task, value, size, accessed) VALUES (?, ?, ?, ?, ?)",
+            [(key, task, encoded, len(encoded.encode("utf-8")), now) for key, (task, encoded) in pending["entries"].items()]
+        )
+        self.conn.commit()
+        return self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the stored outputs fit in max_bytes."""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        deleted = self.conn.execute("""
+            DELETE FROM entries WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY accessed DESC, key) AS running
+                    FROM entries
+                ) WHERE running > ?
+            )
+        """, (self.max_bytes,)).rowcount
+        self.conn.commit()
+        self.evictions += deleted
+        return deleted
+
+    def stats(self):
+        count, size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": count,
+            "bytes": size,
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+class DeferredCache:
+    """ModelCache stand-in for worker processes: reads the cache file but keeps new outputs in memory.
+
+    Only the process that owns the ModelCache writes to it, so parallel workers never contend
+    for the SQLite write lock. The owner stores what a worker collected with
+    ModelCache.apply(deferred.pending()).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.models = {}
+        self.entries = {}  # key -> (task, encoded output)
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path) if os.path.exists(path) else None
+
+    def bind(self, task, model_id, model_version):
+        # Keys include the model, so entries another model wrote are never returned
+        self.models[task] = (model_id, str(model_version))
+
+    def make_key(self, task, text):
+        return cache_key(task, *self.models[task], text)
+
+    def get_many(self, task, texts):
+        """Return a dict mapping each cached text to its stored output, without touching the file."""
+        texts = list(dict.fromkeys(texts))
+        keys = {}
+        for text in texts:
+            keys.setdefault(self.make_key(task, text), []).append(text)
+
+        values = {key: self.entries[key][1] for key in keys if key in self.entries}
+        missing = [key for key in keys if key not in values]
+        if self.conn is not None:
+            for start in range(0, len(missing), _QUERY_CHUNK):
+                chunk = missing[start:start + _QUERY_CHUNK]
+                values.update(self.conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall())
+
+        found = {text: json.loads(value) for key, value in values.items() for text in keys[key]}
+        self.hits += len(found)
+        self.misses += len(texts) - len(found)
+        return found
+
+    def put_many(self, task, items):
+        for text, value in items:
+            self.entries[self.make_key(task, text)] = (task, json.dumps(value, ensure_ascii=False))
+
+    def pending(self):
+        """The models bound and the outputs collected, for ModelCache.apply"""
+        return {"models": dict(self.models), "entries": dict(self.entries)}
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
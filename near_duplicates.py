@@ -0,0 +1,305 @@
+"""Near-duplicate tweet detection with MinHash signatures and a persisted LSH index.
+
+    python near_duplicates.py                   # index new tweets of every account, write clusters
+    python near_duplicates.py --threshold 0.9 --rebuild   # rebuild the index for a stricter threshold
+
+An index keeps the threshold and MinHash settings it was built with; running with different
+ones needs --rebuild.
+"""
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from config.accounts import resolve_accounts
+from text_cleaning import CLEAN_TEXT_PATTERN
+
+DEFAULT_INDEX_PATH = "cleaned_tweets/near_duplicates.sqlite"
+DEFAULT_OUTPUT_PATH = "cleaned_tweets/near_duplicates.csv"
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    tweet_id TEXT NOT NULL UNIQUE,
+    account TEXT,
+    signature BLOB,
+    signature_hash INTEGER
+);
+CREATE INDEX IF NOT EXISTS docs_signature_hash ON docs (signature_hash);
+CREATE TABLE IF NOT EXISTS buckets (band INTEGER NOT NULL, bucket INTEGER NOT NULL, doc INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS buckets_band_bucket ON buckets (band, bucket);
+CREATE TABLE IF NOT EXISTS pairs (
+    a INTEGER NOT NULL,
+    b INTEGER NOT NULL,
+    similarity REAL NOT NULL,
+    PRIMARY KEY (a, b)
+) WITHOUT ROWID;
+"""
+
+
+def normalize_text(text):
+    """Reduce a tweet to the words that identify it: no tags, emojis, punctuation or specific numbers."""
+    text = CLEAN_TEXT_PATTERN.sub(' ', str(text).lower())
+    # Customer and loan ids differ between otherwise identical complaints
+    text = re.sub(r'\d+', '0', text)
+    return ' '.join(re.findall(r'\w+', text))
+
+
+def optimal_bands(threshold, num_perm, fp_weight=0.5, fn_weight=0.5):
+    """Pick the (bands, rows) split that minimises weighted false positive and negative probability mass."""
+    s = np.linspace(0, 1, 1001)
+    best, best_error = None, float('inf')
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            candidate = 1 - (1 - s ** rows) ** bands
+            false_positive = np.trapezoid(np.where(s < threshold, candidate, 0), s)
+            false_negative = np.trapezoid(np.where(s >= threshold, 1 - candidate, 0), s)
+            error = fp_weight * false_positive + fn_weight * false_negative
+            if error < best_error:
+                best, best_error = (bands, rows), error
+    return best
+
+
+class MinHasher:
+    """Vectorised MinHash over character shingles, stable across processes and runs."""
+
+    def __init__(self, num_perm=128, shingle_size=5, seed=1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.powers = np.uint64(1099511628211) ** np.arange(shingle_size, dtype=np.uint64)
+
+    def shingle_hashes(self, texts):
+        """Return the 32-bit hashes of every shingle in texts and the start offset of each text's hashes."""
+        k = self.shingle_size
+        # Texts shorter than a shingle become a single padded shingle
+        codes = [np.frombuffer(text.ljust(k).encode('utf-32-le'), dtype=np.uint32) for text in texts]
+        counts = np.array([len(c) - k + 1 for c in codes])
+        starts = np.concatenate([[0], np.cumsum([len(c) for c in codes])[:-1]]).astype(np.int64)
+        joined = np.concatenate(codes).astype(np.uint64)
+
+        with np.errstate(over='ignore'):
+            windows = np.lib.stride_tricks.sliding_window_view(joined, k)
+            hashes = (windows * self.powers).sum(axis=1, dtype=np.uint64)
+        # Keep only windows that lie inside a single text
+        valid = np.concatenate([np.arange(start, start + count) for start, count in zip(starts, counts)])
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+        return (hashes[valid] >> np.uint64(32)), offsets
+
+    def signatures(self, texts, batch_size=256):
+        """Return a (len(texts), num_perm) uint32 array of MinHash signatures."""
+        result = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for start in range(0, len(texts), batch_size):
+            hashes, offsets = self.shingle_hashes(texts[start:start + batch_size])
+            with np.errstate(over='ignore'):
+                permuted = (np.outer(self.a, hashes) + self.b[:, None]) % MERSENNE_PRIME & MAX_HASH
+            result[start:start + len(offsets)] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        return result
+
+
+class NearDuplicateIndex:
+    """Persisted LSH index that finds near-duplicate pairs as tweets are added, without pairwise scans."""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, threshold=0.8, num_perm=128, shingle_size=5, seed=1, min_chars=20):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        bands, rows = optimal_bands(threshold, num_perm)
+        self.params = {
+            'threshold': threshold, 'num_perm': num_perm, 'shingle_size': shingle_size, 'seed': seed,
+            'min_chars': min_chars, 'bands': bands, 'rows': rows
+        }
+        stored = dict(self.conn.execute("SELECT key, value FROM meta"))
+        if stored and stored != {key: str(value) for key, value in self.params.items()}:
+            self.conn.close()
+            raise ValueError(f"{path} was built with {stored}; rebuild it to use {self.params}")
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+                                  [(key, str(value)) for key, value in self.params.items()])
+        self.threshold = threshold
+        self.min_chars = min_chars
+        self.bands, self.rows = bands, rows
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        self.band_coefficients = np.random.RandomState(seed + 1).randint(
+            1, 1 << 62, size=rows, dtype=np.uint64) | np.uint64(1)
+
+    def _band_hashes(self, signatures):
+        bands = signatures[:, :self.bands * self.rows].astype(np.uint64).reshape(len(signatures), self.bands, self.rows)
+        with np.errstate(over='ignore'):
+            return (bands * self.band_coefficients).sum(axis=2, dtype=np.uint64).view(np.int64)
+
+    def add(self, tweet_ids, texts, account=None):
+        """Index tweets not seen before and record their near-duplicate pairs; returns the number of new pairs."""
+        tweet_ids = [str(tweet_id) for tweet_id in tweet_ids]
+        known = set()
+        for start in range(0, len(tweet_ids), 500):
+            batch = tweet_ids[start:start + 500]
+            known.update(row[0] for row in self.conn.execute(
+                f"SELECT tweet_id FROM docs WHERE tweet_id IN ({','.join('?' * len(batch))})", batch))
+        new = {}
+        for tweet_id, text in zip(tweet_ids, texts):
+            if tweet_id not in known and tweet_id not in new:
+                new[tweet_id] = normalize_text(text) if isinstance(text, str) else ''
+        indexable = [(tweet_id, text) for tweet_id, text in new.items() if len(text) >= self.min_chars]
+        if not new:
+            return 0
+
+        signatures = self.hasher.signatures([text for _, text in indexable]) if indexable else None
+        new_pairs = 0
+        with self.conn:
+            # Replies such as "thanks" are too short to call copies; they are recorded but never matched
+            self.conn.executemany("INSERT INTO docs (tweet_id, account) VALUES (?, ?)",
+                                  [(tweet_id, account) for tweet_id, text in new.items()
+                                   if len(text) < self.min_chars])
+            if not indexable:
+                return 0
+
+            band_hashes = self._band_hashes(signatures)
+            with np.errstate(over='ignore'):
+                signature_hashes = band_hashes.sum(axis=1, dtype=np.int64)
+            doc_ids, bucket_rows, exact_pairs = [], [], []
+            canonical = {}
+            for (tweet_id, _), signature, signature_hash, doc_bands in zip(
+                    indexable, signatures, signature_hashes.tolist(), band_hashes.tolist()):
+                doc_id = self.conn.execute(
+                    "INSERT INTO docs (tweet_id, account, signature, signature_hash) VALUES (?, ?, ?, ?)",
+                    (tweet_id, account, signature.tobytes(), signature_hash)).lastrowid
+                doc_ids.append(doc_id)
+                # Exact signature repeats link to the first copy instead of filling its buckets,
+                # so mass-copied tweets stay linear rather than pairing with every other copy
+                if signature_hash not in canonical:
+                    row = self.conn.execute(
+                        "SELECT id, signature FROM docs WHERE signature_hash = ? AND id != ? ORDER BY id LIMIT 1",
+                        (signature_hash, doc_id)).fetchone()
+                    canonical[signature_hash] = (row[0] if row and row[1] == signature.tobytes() else None)
+                if canonical[signature_hash] is not None:
+                    exact_pairs.append((canonical[signature_hash], doc_id, 1.0))
+                    continue
+                canonical[signature_hash] = doc_id
+                bucket_rows.extend((band, bucket, doc_id) for band, bucket in enumerate(doc_bands))
+
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS new_buckets (band INTEGER, bucket INTEGER, doc INTEGER)")
+            self.conn.execute("DELETE FROM new_buckets")
+            self.conn.executemany("INSERT INTO new_buckets VALUES (?, ?, ?)", bucket_rows)
+            self.conn.executemany("INSERT INTO buckets VALUES (?, ?, ?)", bucket_rows)
+            candidates = self.conn.execute("""
+                SELECT DISTINCT min(n.doc, b.doc), max(n.doc, b.doc)
+                FROM new_buckets n JOIN buckets b ON b.band = n.band AND b.bucket = n.bucket
+                WHERE b.doc != n.doc
+            """).fetchall()
+
+            pairs = exact_pairs + self._verify(candidates, dict(zip(doc_ids, signatures)))
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO pairs (a, b, similarity) VALUES (?, ?, ?)", pairs)
+            new_pairs = self.conn.total_changes - before
+        return new_pairs
+
+    def _verify(self, candidates, signatures):
+        """Keep candidate pairs whose estimated Jaccard similarity reaches the threshold."""
+        missing = list({doc for pair in candidates for doc in pair} - signatures.keys())
+        for start in range(0, len(missing), 500):
+            batch = missing[start:start + 500]
+            for doc_id, blob in self.conn.execute(
+                    f"SELECT id, signature FROM docs WHERE id IN ({','.join('?' * len(batch))})", batch):
+                signatures[doc_id] = np.frombuffer(blob, dtype=np.uint32)
+        pairs = []
+        for a, b in candidates:
+            similarity = float(np.mean(signatures[a] == signatures[b]))
+            if similarity >= self.threshold:
+                pairs.append((a, b, similarity))
+        return pairs
+
+    def clusters(self, min_similarity=None):
+        """Return tweet_id, account, cluster_id and cluster_size for every tweet that has a near duplicate.
+
+        cluster_id is the tweet_id of the earliest indexed tweet in the cluster.
+        """
+        parent = {}
+
+        def find(doc):
+            parent.setdefault(doc, doc)
+            root = doc
+            while parent[root] != root:
+                root = parent[root]
+            while parent[doc] != root:
+                parent[doc], doc = root, parent[doc]
+            return root
+
+        for a, b in self.conn.execute("SELECT a, b FROM pairs WHERE similarity >= ?",
+                                      (min_similarity or self.threshold,)):
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        if not parent:
+            return pd.DataFrame(columns=['tweet_id', 'account', 'cluster_id', 'cluster_size'])
+        members = pd.DataFrame({'doc': list(parent)})
+        members['root'] = [find(doc) for doc in members['doc']]
+
+        docs = pd.read_sql_query("SELECT id AS doc, tweet_id, account FROM docs WHERE signature IS NOT NULL", self.conn)
+        members = members.merge(docs, on='doc')
+        members['cluster_id'] = members['root'].map(members.set_index('doc')['tweet_id'])
+        members['cluster_size'] = members.groupby('root')['doc'].transform('size')
+        return members.sort_values(['root', 'doc'])[['tweet_id', 'account', 'cluster_id', 'cluster_size']]
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate tweets across accounts with MinHash LSH.")
+    parser.add_argument("accounts", nargs="*", help="Account names or slugs (default: all)")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Minimum estimated Jaccard similarity")
+    parser.add_argument("--num-perm", type=int, default=128, help="MinHash permutations per signature")
+    parser.add_argument("--shingle-size", type=int, default=5, help="Characters per shingle")
+    parser.add_argument("--min-chars", type=int, default=20, help="Shorter normalized texts are not matched")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Where the LSH index is persisted")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH, help="CSV of duplicate clusters")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the existing index first")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        for path in (args.index, args.index + "-wal", args.index + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+    try:
+        index = NearDuplicateIndex(args.index, args.threshold, args.num_perm, args.shingle_size,
+                                   min_chars=args.min_chars)
+    except ValueError as e:
+        raise SystemExit(f"{e}\nRun again with --rebuild to discard the existing index.")
+    texts = []
+    try:
+        for account, config in resolve_accounts(args.accounts):
+            path = config['cleaned'] if os.path.exists(config['cleaned']) else config['partial']
+            df = pd.read_csv(path, usecols=['tweet_id', 'author_handle', 'text'])
+            started = time.perf_counter()
+            new_pairs = index.add(df['tweet_id'], df['text'], account)
+            logging.info(f"Indexed {len(df)} tweets from {path} in {time.perf_counter() - started:.2f}s "
+                         f"({new_pairs} new near-duplicate pairs)")
+            texts.append(df.assign(tweet_id=df['tweet_id'].astype(str)))
+        clusters = index.clusters()
+    finally:
+        index.close()
+
+    clusters = clusters.merge(pd.concat(texts).drop_duplicates('tweet_id'), on='tweet_id', how='left')
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    clusters.to_csv(args.output, index=False)
+    logging.info(f"Wrote {clusters['cluster_id'].nunique()} clusters covering {len(clusters)} tweets to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
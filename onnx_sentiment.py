@@ -0,0 +1,292 @@
+"""ONNX Runtime backend for the sentiment model: export, int8 quantization and an accuracy check.
+
+    python onnx_sentiment.py export                      # once; needs torch, transformers and onnx
+    python onnx_sentiment.py evaluate --sample 2000      # label agreement and latency against PyTorch
+    python sentiment_analysis.py --backend onnx          # score with the quantized model
+
+Scoring with an exported model needs only onnxruntime and tokenizers, so the batch hosts
+never import torch or transformers. evaluate writes its report to <onnx-dir>/evaluation.json
+and exits non-zero when the quantized labels agree with PyTorch less than --min-agreement.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config.accounts import resolve_accounts
+from sentiment_analysis import DEFAULT_ONNX_DIR, MODEL_ID, load_sentiment_pipeline, resolve_model_version
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_FILE = "model.int8.onnx"
+META_FILE = "meta.json"
+EVALUATION_FILE = "evaluation.json"
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def load_meta(onnx_dir=DEFAULT_ONNX_DIR):
+    path = os.path.join(onnx_dir, META_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No exported sentiment model in {onnx_dir}; run python onnx_sentiment.py export")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def export_model(model_id=MODEL_ID, onnx_dir=DEFAULT_ONNX_DIR, opset=17):
+    """Export the Hugging Face model to ONNX, quantize its weights to int8 and save the tokenizer beside it."""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    os.makedirs(onnx_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModelForSequenceClassification.from_pretrained(model_id).eval()
+    # Two texts of different lengths, so the batch and sequence axes are traced as dynamic
+    sample = tokenizer(["short tweet", "a somewhat longer tweet to trace the model with"],
+                       padding=True, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask") if name in sample]
+
+    model_path = os.path.join(onnx_dir, MODEL_FILE)
+    started = time.perf_counter()
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in input_names), model_path,
+            input_names=input_names, output_names=["logits"],
+            dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in input_names}, "logits": {0: "batch"}},
+            opset_version=opset, dynamo=False
+        )
+    logging.info(f"Exported {model_id} to {model_path} in {time.perf_counter() - started:.1f}s")
+
+    # Weights become int8 ahead of time; activations are quantized per batch at run time
+    quantized_path = os.path.join(onnx_dir, QUANTIZED_FILE)
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    logging.info(f"Quantized to {quantized_path}: {os.path.getsize(model_path) / 1e6:.0f} MB -> "
+                 f"{os.path.getsize(quantized_path) / 1e6:.0f} MB")
+
+    tokenizer.save_pretrained(onnx_dir)
+    id2label = model.config.id2label
+    meta = {
+        "model_id": model_id,
+        "model_version": str(resolve_model_version(model_id)),
+        "labels": [id2label[i] for i in range(len(id2label))],
+        "pad_token_id": tokenizer.pad_token_id or 0,
+        # The pipeline truncates to the model's limit; some tokenizers report a huge placeholder
+        "max_length": min(tokenizer.model_max_length, model.config.max_position_embeddings),
+        "opset": opset,
+        "exported": datetime.now().isoformat(timespec="seconds"),
+    }
+    with open(os.path.join(onnx_dir, META_FILE + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(os.path.join(onnx_dir, META_FILE + ".tmp"), os.path.join(onnx_dir, META_FILE))
+    return meta
+
+
+class OnnxSentimentPipeline:
+    """Stand-in for the transformers text-classification pipeline, running the exported model on ONNX Runtime.
+
+    Callable like the pipeline and with a tokenizer that returns input_ids, so run_batches in
+    sentiment_analysis works with either. Each batch is padded only to its own longest text.
+    """
+
+    def __init__(self, onnx_dir=DEFAULT_ONNX_DIR, num_threads=None, quantized=True):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        meta = load_meta(onnx_dir)
+        self.model_id = meta["model_id"]
+        self.labels = meta["labels"]
+        self.pad_token_id = meta["pad_token_id"]
+        self._tokenizer = Tokenizer.from_file(os.path.join(onnx_dir, "tokenizer.json"))
+        self._tokenizer.enable_truncation(meta["max_length"])
+        self._tokenizer.no_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # One batch at a time, so all the threads go to the operators within it
+        options.intra_op_num_threads = num_threads or os.cpu_count() or 1
+        options.inter_op_num_threads = 1
+        self.model_path = os.path.join(onnx_dir, QUANTIZED_FILE if quantized else MODEL_FILE)
+        self.session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def tokenizer(self, texts, truncation=True):
+        """Token IDs of each text, truncated to the model's maximum length"""
+        return {"input_ids": [encoding.ids for encoding in self._tokenizer.encode_batch(list(texts))]}
+
+    def __call__(self, texts, batch_size=32, truncation=True):
+        texts = list(texts)
+        results = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self._tokenizer.encode_batch(texts[start:start + batch_size])
+            width = max(len(encoding.ids) for encoding in encodings)
+            input_ids = np.full((len(encodings), width), self.pad_token_id, dtype=np.int64)
+            attention_mask = np.zeros((len(encodings), width), dtype=np.int64)
+            for row, encoding in enumerate(encodings):
+                input_ids[row, :len(encoding.ids)] = encoding.ids
+                attention_mask[row, :len(encoding.ids)] = 1
+            feed = {"input_ids": input_ids, "attention_mask": attention_mask}
+            logits = self.session.run(None, {name: feed[name] for name in self.input_names})[0]
+
+            exponentials = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probabilities = exponentials / exponentials.sum(axis=1, keepdims=True)
+            for row in probabilities:
+                best = int(row.argmax())
+                results.append({"label": self.labels[best], "score": float(row[best])})
+        return results
+
+
+def load_texts(accounts=None, sample=None, seed=0):
+    """Tweet texts and their stored PyTorch labels from the final_tweets CSVs"""
+    frames = []
+    for _, config in resolve_accounts(accounts):
+        if os.path.exists(config['final']):
+            frames.append(pd.read_csv(config['final'], usecols=lambda column: column in ('text', 'sentiment')))
+    if not frames:
+        raise SystemExit("No final_tweets CSVs found; run sentiment_analysis.py first")
+    tweets = pd.concat(frames, ignore_index=True)
+    tweets = tweets[tweets['text'].apply(lambda text: isinstance(text, str))].drop_duplicates('text')
+    if sample and sample < len(tweets):
+        tweets = tweets.sample(sample, random_state=seed)
+    return tweets.reset_index(drop=True)
+
+
+def time_backend(name, load, texts, batch_size):
+    """Load a backend and classify texts batch by batch, shortest first, timing the load and every batch"""
+    started = time.perf_counter()
+    classifier = load()
+    load_seconds = time.perf_counter() - started
+
+    lengths = [len(ids) for ids in classifier.tokenizer(texts, truncation=True)['input_ids']]
+    order = sorted(range(len(texts)), key=lengths.__getitem__)
+    labels, scores = [None] * len(texts), [None] * len(texts)
+    latencies = []
+    started = time.perf_counter()
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        batch_started = time.perf_counter()
+        results = classifier([texts[i] for i in batch], batch_size=len(batch), truncation=True)
+        latencies.append(time.perf_counter() - batch_started)
+        for i, result in zip(batch, results):
+            labels[i], scores[i] = result['label'], result['score']
+    seconds = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    report = {
+        "backend": name,
+        "load_seconds": round(load_seconds, 3),
+        "seconds": round(seconds, 3),
+        "tweets_per_sec": round(len(texts) / seconds, 1),
+        "batch_ms_p50": round(float(np.percentile(latencies_ms, 50)), 2),
+        "batch_ms_p95": round(float(np.percentile(latencies_ms, 95)), 2),
+        "batch_ms_max": round(float(latencies_ms.max()), 2),
+    }
+    if hasattr(classifier, "model_path"):
+        report["model_mb"] = round(os.path.getsize(classifier.model_path) / 1e6, 1)
+    logging.info(f"{name}: loaded in {load_seconds:.1f}s, {report['tweets_per_sec']:.1f} tweets/s, "
+                 f"batch p50 {report['batch_ms_p50']:.1f} ms, p95 {report['batch_ms_p95']:.1f} ms")
+    return labels, scores, report
+
+
+def agreement(labels, scores, reference_labels, reference_scores):
+    """How closely one backend's outputs match the reference labels and scores"""
+    labels, reference_labels = np.array(labels), np.array(reference_labels)
+    same = labels == reference_labels
+    changed = Counter(f"{old}->{new}" for old, new in zip(reference_labels[~same], labels[~same]))
+    score_diff = np.abs(np.array(scores) - np.array(reference_scores))[same]
+    return {
+        "label_agreement": round(float(same.mean()), 4),
+        "changed_labels": dict(changed.most_common()),
+        "score_diff_mean": round(float(score_diff.mean()), 4) if len(score_diff) else None,
+        "score_diff_max": round(float(score_diff.max()), 4) if len(score_diff) else None,
+    }
+
+
+def evaluate(texts, stored_labels=None, model_id=MODEL_ID, onnx_dir=DEFAULT_ONNX_DIR, batch_size=32,
+             num_threads=None):
+    """Score texts with PyTorch and both ONNX models, and compare labels, scores and speed."""
+    num_threads = num_threads or os.cpu_count() or 1
+    # The ONNX backends run first, so their load times do not benefit from torch already being imported
+    backends = [
+        ("onnx-int8", lambda: OnnxSentimentPipeline(onnx_dir, num_threads, quantized=True)),
+        ("onnx-fp32", lambda: OnnxSentimentPipeline(onnx_dir, num_threads, quantized=False)),
+        ("pytorch", lambda: load_sentiment_pipeline(model_id, num_threads)),
+    ]
+    outputs, reports = {}, []
+    for name, load in backends:
+        labels, scores, report = time_backend(name, load, texts, batch_size)
+        outputs[name] = (labels, scores)
+        reports.append(report)
+
+    reference_labels, reference_scores = outputs["pytorch"]
+    for report in reports:
+        if report["backend"] != "pytorch":
+            report.update(agreement(*outputs[report["backend"]], reference_labels, reference_scores))
+            report["speedup"] = round(report["tweets_per_sec"] / reports[-1]["tweets_per_sec"], 2)
+    result = {
+        "model_id": model_id,
+        "tweets": len(texts),
+        "batch_size": batch_size,
+        "threads": num_threads,
+        "evaluated": datetime.now().isoformat(timespec="seconds"),
+        "backends": reports,
+    }
+    if stored_labels is not None:
+        # final_tweets may have been scored by an earlier revision of the model
+        result["pytorch_vs_stored_agreement"] = round(float((np.array(reference_labels) == stored_labels).mean()), 4)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export", help="Export the model to ONNX and quantize it to int8")
+    export.add_argument("--model", default=MODEL_ID, help="Hugging Face model id")
+    export.add_argument("--onnx-dir", default=DEFAULT_ONNX_DIR)
+    export.add_argument("--opset", type=int, default=17)
+    check = subparsers.add_parser("evaluate", help="Compare the ONNX models with PyTorch on final_tweets")
+    check.add_argument("accounts", nargs="*", help="Account names or slugs (default: all)")
+    check.add_argument("--onnx-dir", default=DEFAULT_ONNX_DIR)
+    check.add_argument("--sample", type=int, default=None, help="Evaluate on this many random tweets")
+    check.add_argument("--batch-size", type=int, default=32)
+    check.add_argument("--threads", type=int, default=None, help="Intra-op threads for every backend")
+    check.add_argument("--min-agreement", type=float, default=0.97,
+                       help="Lowest acceptable share of int8 labels matching PyTorch")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_model(args.model, args.onnx_dir, args.opset)
+        return
+
+    meta = load_meta(args.onnx_dir)
+    tweets = load_texts(args.accounts, args.sample)
+    stored = tweets['sentiment'].to_numpy() if 'sentiment' in tweets else None
+    result = evaluate(tweets['text'].tolist(), stored, meta['model_id'], args.onnx_dir, args.batch_size,
+                      args.threads)
+    path = os.path.join(args.onnx_dir, EVALUATION_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+    print(f"{'backend':<10} {'load s':>7} {'tweets/s':>9} {'p50 ms':>7} {'p95 ms':>7} {'agree':>7} {'speedup':>8}")
+    for report in result["backends"]:
+        agree = f"{report['label_agreement']:>7.2%}" if "label_agreement" in report else f"{'-':>7}"
+        speedup = f"{report['speedup']:>7.2f}x" if "speedup" in report else f"{'-':>8}"
+        print(f"{report['backend']:<10} {report['load_seconds']:>7.2f} {report['tweets_per_sec']:>9.1f} "
+              f"{report['batch_ms_p50']:>7.1f} {report['batch_ms_p95']:>7.1f} {agree} {speedup}")
+    print(f"Report written to {path}")
+
+    int8 = result["backends"][0]
+    if int8["label_agreement"] < args.min_agreement:
+        raise SystemExit(f"int8 labels agree with PyTorch on {int8['label_agreement']:.2%} of tweets, "
+                         f"below {args.min_agreement:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,487 @@
+"""Incremental pipeline from raw_tweets to the dashboard's data, run as a DAG of stages.
+
+    python pipeline.py                          # bring every account up to date
+    python pipeline.py Fibe --workers 1         # one account, in this process
+    python pipeline.py --force sentiment        # recompute a stage even if its inputs are unchanged
+    python pipeline.py --publish                # also update final_tweets/ and the dashboard's stores
+
+Each stage keeps one output file per account and month under pipeline_work/<stage>/<slug>/.
+A partition is recomputed only when the fingerprint of its input or of the stage's code and
+settings changes, so new tweets cost time in proportion to the months they land in.
+
+Everything is written under pipeline_work/ until a run is given --publish, which copies the
+assembled CSVs over partially_processed_tweets/ and final_tweets/. The topics stage keeps the
+curated categories of the published tweets (from Topic_modelling.ipynb) in the topics column
+and writes the LDA model's own labels to lda_topic.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from graphlib import TopologicalSorter
+
+import pandas as pd
+
+from config.accounts import resolve_accounts
+
+WORK_DIR = "pipeline_work"
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+
+
+def file_fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_fingerprint(files, settings):
+    """Fingerprint the source files a stage runs and the settings that change its output."""
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    for path in files:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class StageContext:
+    """Models and caches shared by the stages of one worker process, loaded on first use.
+
+    With the defer_cache option the model cache only reads the cache file, and the months the
+    publish stage changed are left in published: the parent process writes both, so parallel
+    workers never write to the same SQLite file.
+    """
+
+    def __init__(self, options, config=None):
+        self.options = options
+        self.config = config
+        self._cache = None
+        self._detector = None
+        self._translator = None
+        self._topic_model = None
+        self._curated_topics = None
+        self._scorer = None
+        self.published = None
+
+    @property
+    def cache(self):
+        if self._cache is None and not self.options['no_cache']:
+            from model_cache import DEFAULT_CACHE_PATH, DeferredCache, ModelCache
+            path = self.options.get('cache') or DEFAULT_CACHE_PATH
+            self._cache = DeferredCache(path) if self.options.get('defer_cache') else ModelCache(path)
+        return self._cache
+
+    @property
+    def detector(self):
+        if self._detector is None:
+            from translate_tweets import DETECTORS, LangdetectDetector
+            # Accounts already run in parallel, so langdetect stays in this process
+            detector_cls = DETECTORS[self.options['detector']]
+            self._detector = LangdetectDetector(workers=1) if detector_cls is LangdetectDetector else detector_cls()
+            if self.cache is not None:
+                self.cache.bind('language', self._detector.model_id, self._detector.version)
+        return self._detector
+
+    @property
+    def translator(self):
+        if self._translator is None:
+            from translate_tweets import TRANSLATORS
+            self._translator = TRANSLATORS[self.options['translator']]()
+            if self.cache is not None and self._translator.cache_outputs:
+                self.cache.bind('translation', self._translator.model_id, self._translator.version)
+        return self._translator
+
+    @property
+    def topic_model(self):
+        if self._topic_model is None:
+            from topic_model import TopicModel
+            model_dir = self.options['topic_model_dir']
+            if not os.path.exists(os.path.join(model_dir, 'meta.json')):
+                raise RuntimeError(f"No topic model in {model_dir}; train one with python topic_model.py train")
+            self._topic_model = TopicModel.load(model_dir)
+        return self._topic_model
+
+    @property
+    def curated_topics(self):
+        """The published category of each tweet, and the category each LDA topic stands for.
+
+        An LDA topic stands for the category most common among the published tweets the model
+        puts in it, so new tweets are filed under the same categories as the curated ones.
+        """
+        if self._curated_topics is None:
+            by_tweet, by_topic = {}, {}
+            path = self.config['final'] if self.config else None
+            if path and os.path.exists(path):
+                from topic_model import tokenize
+                published = pd.read_csv(path, usecols=['tweet_id', 'text', 'tweets_transl', 'topics'],
+                                        dtype={'tweet_id': str})
+                published = published[published['topics'].notna()]
+                by_tweet = dict(zip(published['tweet_id'], published['topics']))
+                if len(published):
+                    lda_topics, _ = self.topic_model.assign(tokenize(published['tweets_transl'].fillna(published['text'])))
+                    by_topic = (pd.Series(published['topics'].to_numpy()).groupby(lda_topics)
+                                .agg(lambda labels: labels.value_counts().index[0]).to_dict())
+            self._curated_topics = by_tweet, by_topic
+        return self._curated_topics
+
+    @property
+    def scorer(self):
+        if self._scorer is None:
+            from sentiment_analysis import MODEL_ID, SentimentScorer
+            self._scorer = SentimentScorer(self.options['model'] or MODEL_ID, self.options['batch_size'],
+                                           cache=self.cache, backend=self.options['sentiment_backend'])
+        return self._scorer
+
+    def close(self):
+        if self._scorer is not None:
+            self._scorer.close()
+        if self._cache is not None:
+            self._cache.close()
+
+
+def split_by_month(df, out_dir):
+    """Write df as one CSV per month, leaving unchanged files untouched; returns the months written."""
+    os.makedirs(out_dir, exist_ok=True)
+    months = pd.to_datetime(df['timestamp'], utc=True, format='mixed').dt.strftime('%Y-%m')
+    current = set()
+    for month, part in df.groupby(months, sort=True):
+        path = os.path.join(out_dir, f"{month}.csv")
+        current.add(month)
+        content = part.to_csv(index=False).encode('utf-8')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                if f.read() == content:
+                    continue
+        with open(path, 'wb') as f:
+            f.write(content)
+    for name in os.listdir(out_dir):
+        if name.endswith('.csv') and name[:-4] not in current:
+            os.remove(os.path.join(out_dir, name))
+    return sorted(current)
+
+
+def run_clean(ctx, config, out_dir):
+    from text_cleaning import clean_file
+    cleaned_path = os.path.join(WORK_DIR, 'cleaned', f"{config['slug']}.csv")
+    stats = clean_file(config['raw'], cleaned_path)
+    # Read every field as written so the month files reproduce the cleaned text exactly
+    split_by_month(pd.read_csv(cleaned_path, dtype=str, keep_default_na=False), out_dir)
+    return stats['rows_in']
+
+
+def run_translate(ctx, input_path, output_path):
+    from translate_tweets import translate_file
+    return len(translate_file(input_path, output_path, ctx.detector, ctx.translator, ctx.cache,
+                              ctx.options['concurrency']))
+
+
+def run_topics(ctx, input_path, output_path):
+    from topic_model import tokenize
+    df = pd.read_csv(input_path, dtype={'tweet_id': str})
+    topics, _ = ctx.topic_model.assign(tokenize(df['tweets_transl'].fillna(df['text'])))
+    labels = ctx.topic_model.topic_labels()
+    by_tweet, by_topic = ctx.curated_topics
+    df['year_month'] = pd.to_datetime(df['timestamp'], utc=True, format='mixed').dt.strftime('%Y-%m')
+    df['lda_topic'] = [labels[topic] for topic in topics]
+    if by_topic:
+        df['topics'] = [by_tweet.get(tweet_id) or by_topic.get(topic) for tweet_id, topic in zip(df['tweet_id'], topics)]
+    else:
+        # An account with no published categories yet is labelled by the LDA topics
+        df['topics'] = df['lda_topic']
+    df.to_csv(output_path, index=False)
+    return len(df)
+
+
+def run_sentiment(ctx, input_path, output_path):
+    from sentiment_analysis import score_file
+    count, _ = score_file(ctx.scorer, input_path, output_path)
+    return count
+
+
+def concat_partitions(part_dir, output_path):
+    paths = [os.path.join(part_dir, name) for name in sorted(os.listdir(part_dir)) if name.endswith('.csv')]
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path + '.tmp', 'wb') as out:
+        for i, path in enumerate(paths):
+            with open(path, 'rb') as f:
+                if i > 0:
+                    f.readline()  # Every part repeats the header
+                out.write(f.read())
+    os.replace(output_path + '.tmp', output_path)
+
+
+def copy_file(source, destination):
+    shutil.copyfile(source, destination + '.tmp')
+    os.replace(destination + '.tmp', destination)
+
+
+def run_publish(ctx, account, config, changed_months):
+    """Assemble the account's partial and final CSVs under pipeline_work/publish/; with --publish,
+    copy them over the tracked CSVs and refresh the dashboard's stores.
+
+    The search index is shared by every account, so the months to reindex are left in
+    ctx.published for the parent process (see update_search_index).
+    """
+    from tweet_aggregates import publish_aggregates
+    from tweet_store import publish_account
+    out_dir = os.path.join(WORK_DIR, 'publish', config['slug'])
+    partial_path = os.path.join(out_dir, 'partial.csv')
+    final_path = os.path.join(out_dir, 'final.csv')
+    concat_partitions(os.path.join(WORK_DIR, 'topics', config['slug']), partial_path)
+    concat_partitions(os.path.join(WORK_DIR, 'sentiment', config['slug']), final_path)
+    if not ctx.options['publish']:
+        logging.info(f"Assembled {account} in {out_dir}; run with --publish to update {config['final']}")
+        return 0
+    copy_file(partial_path, config['partial'])
+    copy_file(final_path, config['final'])
+    rows = publish_account(config['final'], config['slug'], months=changed_months)
+    publish_aggregates(config)
+    ctx.published = {'months': changed_months}
+    return rows
+
+
+class Stage:
+    def __init__(self, name, deps, run, files, settings=(), per_partition=True):
+        self.name = name
+        self.deps = deps
+        self.run = run
+        self.files = files
+        self.settings = settings
+        self.per_partition = per_partition
+
+
+STAGES = {
+    'clean': Stage('clean', [], run_clean, ['text_cleaning.py'], per_partition=False),
+    'translate': Stage('translate', ['clean'], run_translate, ['translate_tweets.py'], ('detector', 'translator')),
+    'topics': Stage('topics', ['translate'], run_topics, ['topic_model.py'], ('topic_model_dir',)),
+    'sentiment': Stage('sentiment', ['topics'], run_sentiment, ['sentiment_analysis.py', 'onnx_sentiment.py'],
+                       ('model', 'sentiment_backend')),
+    'publish': Stage('publish', ['sentiment'], run_publish,
+                     ['tweet_store.py', 'tweet_aggregates.py', 'tweet_search.py'], ('publish',), per_partition=False),
+}
+
+
+class AccountRun:
+    """Run the DAG for one account, recording fingerprints so later runs skip unchanged partitions."""
+
+    def __init__(self, account, config, ctx, force=()):
+        self.account = account
+        self.config = config
+        self.ctx = ctx
+        self.force = set(force)
+        self.state_path = os.path.join(WORK_DIR, 'state', f"{config['slug']}.json")
+        self.state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+        self.timings = []
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def stage_dir(self, name):
+        return os.path.join(WORK_DIR, name, self.config['slug'])
+
+    def code(self, stage):
+        settings = {key: self.ctx.options[key] for key in stage.settings}
+        if stage.name == 'topics':
+            # A retrained or updated topic model relabels every month
+            meta = os.path.join(self.ctx.options['topic_model_dir'], 'meta.json')
+            settings['model'] = file_fingerprint(meta) if os.path.exists(meta) else None
+        elif stage.name == 'sentiment' and self.ctx.options['sentiment_backend'] == 'onnx':
+            # Re-exporting the ONNX model rescores every month
+            from sentiment_analysis import DEFAULT_ONNX_DIR
+            meta = os.path.join(DEFAULT_ONNX_DIR, 'meta.json')
+            settings['onnx_model'] = file_fingerprint(meta) if os.path.exists(meta) else None
+        return code_fingerprint(stage.files, settings)
+
+    def run(self):
+        order = TopologicalSorter({name: stage.deps for name, stage in STAGES.items()}).static_order()
+        for name in order:
+            stage = STAGES[name]
+            started = time.perf_counter()
+            if name == 'clean':
+                ran, skipped, rows = self.run_source(stage)
+            elif stage.per_partition:
+                ran, skipped, rows = self.run_partitions(stage)
+            else:
+                ran, skipped, rows = self.run_sink(stage)
+            self.timings.append({'account': self.account, 'stage': name, 'ran': ran, 'skipped': skipped,
+                                 'rows': rows, 'seconds': time.perf_counter() - started})
+        return self.timings
+
+    def run_source(self, stage):
+        record = {'input': file_fingerprint(self.config['raw']), 'code': self.code(stage)}
+        out_dir = self.stage_dir(stage.name)
+        if self.state.get(stage.name) == record and stage.name not in self.force and os.path.isdir(out_dir):
+            return 0, 1, 0
+        rows = stage.run(self.ctx, self.config, out_dir)
+        self.state[stage.name] = record
+        self.save_state()
+        return 1, 0, rows
+
+    def run_partitions(self, stage):
+        in_dir = self.stage_dir(stage.deps[0])
+        out_dir = self.stage_dir(stage.name)
+        os.makedirs(out_dir, exist_ok=True)
+        code = self.code(stage)
+        done = self.state.setdefault(stage.name, {})
+        months = sorted(name[:-4] for name in os.listdir(in_dir) if name.endswith('.csv'))
+        ran = skipped = rows = 0
+        for month in months:
+            input_path = os.path.join(in_dir, f"{month}.csv")
+            output_path = os.path.join(out_dir, f"{month}.csv")
+            record = {'input': file_fingerprint(input_path), 'code': code}
+            if done.get(month) == record and stage.name not in self.force and os.path.exists(output_path):
+                skipped += 1
+                continue
+            rows += stage.run(self.ctx, input_path, output_path)
+            done[month] = record
+            self.save_state()
+            ran += 1
+        # Months that disappeared upstream disappear here too
+        for month in set(done) - set(months):
+            del done[month]
+            if os.path.exists(os.path.join(out_dir, f"{month}.csv")):
+                os.remove(os.path.join(out_dir, f"{month}.csv"))
+        self.save_state()
+        return ran, skipped, rows
+
+    def run_sink(self, stage):
+        in_dir = self.stage_dir(stage.deps[0])
+        inputs = {name[:-4]: file_fingerprint(os.path.join(in_dir, name))
+                  for name in sorted(os.listdir(in_dir)) if name.endswith('.csv')}
+        code = self.code(stage)
+        previous = self.state.get(stage.name, {})
+        if previous.get('code') == code and stage.name not in self.force:
+            # Months that disappeared upstream count as changed, so their published rows are removed
+            done = previous.get('months', {})
+            changed = sorted(month for month in set(inputs) | set(done) if done.get(month) != inputs.get(month))
+            if not changed:
+                return 0, 1, 0
+        else:
+            changed = None  # Republish every month
+        rows = stage.run(self.ctx, self.account, self.config, changed)
+        self.state[stage.name] = {'code': code, 'months': inputs}
+        self.save_state()
+        return 1, 0, rows
+
+
+def run_account(account, config, options):
+    """Bring one account up to date.
+
+    Returns its per-stage timings, what its publish stage published ({'months': None} for every
+    month, None if it published nothing) and, with defer_cache, the new model outputs.
+    """
+    result = {'timings': [], 'published': None, 'cache': None}
+    if not os.path.exists(config['raw']):
+        logging.warning(f"Skipping {account}: {config['raw']} not found")
+        return result
+    ctx = StageContext(options, config)
+    try:
+        result['timings'] = AccountRun(account, config, ctx, options['force']).run()
+        result['published'] = ctx.published
+        if options.get('defer_cache') and ctx._cache is not None:
+            result['cache'] = ctx._cache.pending()
+    finally:
+        ctx.close()
+    return result
+
+
+def update_search_index(published):
+    """Reindex the months each account published, one account after another, then merge the index once."""
+    if not published:
+        return
+    from tweet_search import index_accounts
+    index_accounts(list(published), months={account: entry['months'] for account, entry in published.items()})
+
+
+def print_summary(timings, elapsed):
+    lines = [f"{'stage':<10} {'ran':>5} {'skipped':>8} {'rows':>9} {'seconds':>9}"]
+    for name in STAGES:
+        records = [record for record in timings if record['stage'] == name]
+        lines.append(f"{name:<10} {sum(r['ran'] for r in records):>5} {sum(r['skipped'] for r in records):>8} "
+                     f"{sum(r['rows'] for r in records):>9} {sum(r['seconds'] for r in records):>9.2f}")
+    lines.append(f"{'total':<10} {'':>5} {'':>8} {'':>9} {elapsed:>9.2f}")
+    print("\n".join(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the tweet pipeline incrementally for one or more accounts.")
+    parser.add_argument("accounts", nargs="*", help="Account names or slugs (default: all)")
+    parser.add_argument("--workers", type=int, default=2, help="Accounts processed concurrently")
+    parser.add_argument("--force", nargs="*", default=[], choices=list(STAGES), help="Stages to recompute")
+    parser.add_argument("--detector", default="langdetect", help="Language detector (see translate_tweets.py)")
+    parser.add_argument("--translator", default="marian", help="Translation backend (see translate_tweets.py)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Translation batches in flight")
+    parser.add_argument("--topic-model-dir", default="models/topics")
+    parser.add_argument("--model", help="Sentiment model id (default: sentiment_analysis.MODEL_ID)")
+    parser.add_argument("--batch-size", type=int, default=32, help="Tweets per sentiment batch")
+    parser.add_argument("--sentiment-backend", choices=["pytorch", "onnx"], default="pytorch",
+                        help="Run the sentiment model in PyTorch or as its int8 ONNX export")
+    parser.add_argument("--cache", help="Path of the model output cache")
+    parser.add_argument("--no-cache", action="store_true", help="Run every model without the output cache")
+    parser.add_argument("--publish", action="store_true",
+                        help="Copy the results over final_tweets/ and partially_processed_tweets/ and refresh the "
+                             "dashboard's stores (default: leave them in pipeline_work/)")
+    args = parser.parse_args()
+
+    options = {
+        'force': args.force, 'detector': args.detector, 'translator': args.translator,
+        'concurrency': args.concurrency, 'topic_model_dir': args.topic_model_dir, 'model': args.model,
+        'batch_size': args.batch_size, 'sentiment_backend': args.sentiment_backend, 'cache': args.cache,
+        'no_cache': args.no_cache, 'publish': args.publish,
+    }
+    accounts = resolve_accounts(args.accounts)
+    started = time.perf_counter()
+    timings, failed, published = [], [], {}
+    cache = None
+
+    def collect(account, result):
+        timings.extend(result['timings'])
+        if result['published'] is not None:
+            published[account] = result['published']
+        if result['cache'] is not None:
+            cache.apply(result['cache'])
+
+    if args.workers <= 1:
+        for account, config in accounts:
+            collect(account, run_account(account, config, options))
+    else:
+        # Workers read the model cache and hand their new outputs back; only this process writes it
+        from model_cache import DEFAULT_CACHE_PATH, ModelCache
+        cache = None if args.no_cache else ModelCache(args.cache or DEFAULT_CACHE_PATH)
+        options['defer_cache'] = cache is not None
+        try:
+            with ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                futures = {account: executor.submit(run_account, account, config, options)
+                           for account, config in accounts}
+                for account, future in futures.items():
+                    try:
+                        collect(account, future.result())
+                    except Exception as e:
+                        logging.error(f"Pipeline failed for {account}: {e}")
+                        failed.append(account)
+        finally:
+            if cache is not None:
+                cache.close()
+    update_search_index(published)
+
+    print_summary(timings, time.perf_counter() - started)
+    if failed:
+        raise SystemExit(f"Failed accounts: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
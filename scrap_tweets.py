@@ -1,8 +1,7 @@
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.common.exceptions import NoSuchElementException, SessionNotCreatedException, TimeoutException
 import time
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -15,26 +14,136 @@ import os
 import json
 import signal
 import sys
+import tempfile
+from checkpoint_journal import CheckpointJournal
+from instrumentation import metrics
+from timeline_responses import ResponseCapture, parse_response
+from tweet_extractors import extract_tweet_id, get_extractor, tweet_id_range
 
 # Set up logging with timestamp
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s',
     handlers=[
         logging.FileHandler('scraper.log'),
         logging.StreamHandler()
     ]
 )
 
+# Returns the outerHTML of tweet articles rendered since the previous call. Articles are
+# keyed by their status link and only handed over once their timestamp has rendered.
+HARVEST_SCRIPT = """
+const seen = window.__harvestedTweets || (window.__harvestedTweets = new Set());
+const fresh = [];
+for (const article of document.querySelectorAll("article[data-testid='tweet']")) {
+    const link = article.querySelector("a[href*='/status/']");
+    if (!link || !article.querySelector("time")) continue;
+    const key = link.getAttribute("href");
+    if (seen.has(key)) continue;
+    seen.add(key);
+    fresh.push(article.outerHTML);
+}
+return fresh;
+"""
+
+# Scrolls one viewport and resolves once a new tweet article is added to the page, or with
+# whether the page grew at all when the timeout passes first
+ADAPTIVE_SCROLL_SCRIPT = """
+const timeoutMs = arguments[0];
+const done = arguments[arguments.length - 1];
+const startHeight = document.documentElement.scrollHeight;
+let finished = false;
+let timer = null;
+const observer = new MutationObserver((mutations) => {
+    for (const mutation of mutations) {
+        for (const node of mutation.addedNodes) {
+            if (node.nodeType === 1 && (node.matches("article[data-testid='tweet']")
+                    || node.querySelector("article[data-testid='tweet']"))) {
+                finish(true);
+                return;
+            }
+        }
+    }
+});
+function finish(grew) {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearTimeout(timer);
+    done(grew);
+}
+observer.observe(document.body, {childList: true, subtree: true});
+timer = setTimeout(() => finish(document.documentElement.scrollHeight > startHeight), timeoutMs);
+window.scrollBy(0, window.innerHeight);
+"""
+
+DRIVER_CACHE_FILE = os.path.join(".cache", "chromedriver.json")
+CHROME_PROFILES_DIR = "chrome_profiles"
+COOKIES_FILE = os.path.join(CHROME_PROFILES_DIR, "x_cookies.json")
+
+
+def cached_driver_path(cache_file=DRIVER_CACHE_FILE, refresh=False):
+    """Return the chromedriver path saved by an earlier run, downloading it only when missing"""
+    if not refresh and os.path.exists(cache_file):
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            path = json.load(f).get("path")
+        if path and os.path.exists(path):
+            return path
+    path = ChromeDriverManager().install()
+    os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+    with open(cache_file + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({"path": path, "installed": datetime.now().isoformat(timespec='seconds')}, f)
+    os.replace(cache_file + '.tmp', cache_file)
+    return path
+
+class TweetConsumerError(RuntimeError):
+    """The on_tweet consumer failed; this ends the run rather than skipping one tweet"""
+
 class TwitterScraper:
-    def __init__(self):
-        self.account_url = "https://x.com/FibeIndia/with_replies"
-        self.start_date = "2024-08-01"
-        self.end_date = "2024-10-24"
-        self.company_handle = "FibeIndia"
-        self.tweet_data = []
-        self.checkpoint_file = "fibe_india_tweet_checkpoint2.json"
-        self.processed_tweets = set()  # Track processed tweet IDs
+    def __init__(self, account_url="https://x.com/FibeIndia/with_replies", company_handle="FibeIndia",
+                 start_date="2024-08-01", end_date="2024-10-24",
+                 checkpoint_file="fibe_india_tweet_checkpoint2.jsonl", harvest_mode="incremental",
+                 extractor="lxml", headless=False, login_wait=120, min_iteration_interval=0,
+                 progress_callback=None, metrics_file=None, scroll_mode="adaptive", scroll_timeout=5,
+                 max_idle_scrolls=3, chrome_profile_dir=None, cookies_file=None,
+                 driver_cache_file=DRIVER_CACHE_FILE, max_below_window_scrolls=3, capture_mode="dom",
+                 record_dir=None, on_tweet=None):
+        self.account_url = account_url
+        self.start_date = start_date
+        self.end_date = end_date
+        # The date window as a [min, max) tweet ID range, so articles are classified by integer comparison
+        self.min_tweet_id, self.max_tweet_id = tweet_id_range(start_date, end_date)
+        # Iterations in a row whose tweets were all older than start_date before the scrape stops
+        self.max_below_window_scrolls = max_below_window_scrolls
+        self.window_positions = {"below": 0, "within": 0, "above": 0}  # Articles seen this iteration
+        self.company_handle = company_handle
+        self.tweet_data = []  # Tweets scraped since the last checkpoint
+        self.tweet_count = 0  # Tweets scraped in total, including those already in the journal
+        self.checkpoint_file = checkpoint_file
+        self.legacy_checkpoint_file = os.path.splitext(checkpoint_file)[0] + ".json"
+        checkpoint_dir = os.path.dirname(checkpoint_file)
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+        self.journal = CheckpointJournal(self.checkpoint_file)
+        self.headless = headless
+        self.login_wait = login_wait  # Longest wait for a manual login when no saved session is found
+        self.scroll_mode = scroll_mode  # "adaptive" waits for new articles, "fixed" scrolls on a timer
+        self.scroll_timeout = scroll_timeout  # Seconds an adaptive scroll waits for new articles
+        self.max_idle_scrolls = max_idle_scrolls  # Scrolls without new content before the timeline counts as ended
+        self.chrome_profile_dir = chrome_profile_dir  # Chrome user data dir kept between runs
+        self.cookies_file = cookies_file  # X session cookies kept between runs, shareable between workers
+        self.driver_cache_file = driver_cache_file
+        self.min_iteration_interval = min_iteration_interval  # Rate limit: minimum seconds per scroll iteration
+        self.progress_callback = progress_callback  # Called with a stats dict at every checkpoint
+        self.on_tweet = on_tweet  # Called with every new tweet record as soon as it is scraped
+        self.metrics_file = metrics_file  # Prometheus textfile (.prom) or JSON summary written at every checkpoint
+        self.processed_tweets = set()  # Track processed tweet IDs, as ints
+        self.harvest_mode = harvest_mode  # "incremental" or "full" page re-parse
+        self.parse_times = []  # Seconds spent fetching and parsing per scroll iteration
+        self.extractor = get_extractor(extractor)  # "lxml" or "soup" HTML extraction backend
+        self.capture_mode = capture_mode  # "dom" parses rendered articles, "network" the timeline API responses
+        self.record_dir = record_dir  # In network mode, keep every timeline response here for replay
+        self.capture = None
         self.setup_driver()
         self.setup_signal_handlers()
 
@@ -44,10 +153,31 @@ class TwitterScraper:
         chrome_options.add_argument("--disable-gpu")
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
-        self.driver = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()),
-            options=chrome_options
-        )
+        if self.headless:
+            chrome_options.add_argument("--headless=new")
+            chrome_options.add_argument("--window-size=1920,1080")
+        if self.chrome_profile_dir:
+            # Chrome keeps cookies and local storage here, so a login survives restarts
+            chrome_options.add_argument(f"--user-data-dir={os.path.abspath(self.chrome_profile_dir)}")
+        if self.capture_mode == "network":
+            # Network events go to the performance log, where ResponseCapture reads them
+            chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+            chrome_options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+        try:
+            self.driver = webdriver.Chrome(
+                service=Service(cached_driver_path(self.driver_cache_file)),
+                options=chrome_options
+            )
+        except SessionNotCreatedException:
+            # Chrome was updated past the cached driver's version
+            logging.info("Cached chromedriver rejected by Chrome; downloading a matching one")
+            self.driver = webdriver.Chrome(
+                service=Service(cached_driver_path(self.driver_cache_file, refresh=True)),
+                options=chrome_options
+            )
+        self.driver.set_script_timeout(self.scroll_timeout + 10)
+        if self.capture_mode == "network":
+            self.capture = ResponseCapture(self.driver, self.record_dir)
 
     def setup_signal_handlers(self):
         signal.signal(signal.SIGINT, self.signal_handler)
@@ -57,146 +187,83 @@ class TwitterScraper:
         logging.info("Received shutdown signal. Saving checkpoint and cleaning up...")
         self.save_checkpoint()
         self.cleanup()
-        sys.exit(0)
+        # Exit like the signal would have, so a scheduler does not count the run as finished
+        sys.exit(128 + signum)
 
     def load_checkpoint(self):
         try:
+            if not os.path.exists(self.checkpoint_file) and os.path.exists(self.legacy_checkpoint_file):
+                self.migrate_legacy_checkpoint()
+
             if os.path.exists(self.checkpoint_file):
-                with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
-                    checkpoint_data = json.load(f)
-                    self.tweet_data = checkpoint_data['tweet_data']
-                    self.processed_tweets = set(checkpoint_data['processed_tweets'])
-                logging.info(f"Loaded {len(self.tweet_data)} tweets from checkpoint")
+                self.journal.repair()
+                records = 0
+                for record in self.journal.iter_records():
+                    self.processed_tweets.add(int(record['tweet_id']))
+                    records += 1
+                if records > len(self.processed_tweets):
+                    self.journal.compact()
+                self.tweet_count = len(self.processed_tweets)
+                logging.info(f"Loaded {self.tweet_count} tweets from checkpoint")
                 return True
         except Exception as e:
             logging.error(f"Error loading checkpoint: {str(e)}")
         return False
 
+    def migrate_legacy_checkpoint(self):
+        """Copy tweets from an old full-JSON checkpoint into the journal"""
+        with open(self.legacy_checkpoint_file, 'r', encoding='utf-8') as f:
+            checkpoint_data = json.load(f)
+        self.journal.append(checkpoint_data['tweet_data'])
+        self.journal.sync()
+        logging.info(f"Migrated {len(checkpoint_data['tweet_data'])} tweets from {self.legacy_checkpoint_file}")
+
     def save_checkpoint(self):
         try:
-            checkpoint_data = {
-                'tweet_data': self.tweet_data,
-                'processed_tweets': list(self.processed_tweets),
-                'timestamp': datetime.now().isoformat()
-            }
-            with open(self.checkpoint_file, 'w', encoding='utf-8') as f:
-                json.dump(checkpoint_data, f, ensure_ascii=False, indent=2)
-            logging.info(f"Saved checkpoint with {len(self.tweet_data)} tweets")
+            new_tweets = len(self.tweet_data)
+            with metrics.timer("checkpoint"):
+                self.journal.append(self.tweet_data)
+                self.journal.sync()
+            # Journaled tweets no longer need to be held in memory
+            self.tweet_data = []
+            logging.info(f"Saved checkpoint with {new_tweets} new tweets ({self.tweet_count} total)")
         except Exception as e:
             logging.error(f"Error saving checkpoint: {str(e)}")
+        self.write_metrics()
+
+    def write_metrics(self):
+        if not self.metrics_file:
+            return
+        try:
+            metrics.write(self.metrics_file, labels={"account": self.company_handle})
+        except Exception as e:
+            logging.error(f"Error writing metrics: {str(e)}")
 
     def extract_tweet_id(self, tweet_link):
         """Extract tweet ID from tweet link"""
-        try:
-            return tweet_link.split('/')[-1]
-        except Exception:
-            return None
+        return extract_tweet_id(tweet_link)
 
     def extract_count_by_testid(self, tweet, testid):
         """Extract engagement metrics from tweet"""
-        try:
-            button = tweet.find('button', {'data-testid': testid})
-            if button:
-                span = button.find('span', class_='css-1jxf684')
-                if span:
-                    count_text = span.get_text().strip()
-                    # Handle K (thousands) and M (millions) suffixes
-                    if 'K' in count_text:
-                        return int(float(count_text.replace('K', '')) * 1000)
-                    elif 'M' in count_text:
-                        return int(float(count_text.replace('M', '')) * 1000000)
-                    elif count_text.isdigit():
-                        return int(count_text)
-        except Exception as e:
-            logging.error(f"Error extracting {testid} count: {str(e)}")
-        return 0
+        return self.extractor.extract_count_by_testid(tweet, testid)
 
     def extract_tweet_data(self, tweet):
         """Extract all data from a tweet element"""
-        try:
-            tweet_data = {
-                "tweet_link": None,
-                "tweet_id": None,
-                "author_name": None,
-                "author_handle": None,
-                "text": None,
-                "timestamp": None,
-                "likes": 0,
-                "retweets": 0,
-                "replies": 0,
-                "image_urls": [],
-                "is_reply": False,
-                "reply_to": None,
-                "conversation_id": None
-            }
-
-            # Extract tweet link and ID
-            link_element = tweet.find("a", href=lambda href: href and "/status/" in href)
-            if link_element:
-                tweet_data["tweet_link"] = "https://x.com" + link_element['href']
-                tweet_data["tweet_id"] = self.extract_tweet_id(tweet_data["tweet_link"])
-
-            # Extract author information
-            author_element = tweet.find("div", {"data-testid": "User-Name"})
-            if author_element:
-                # Extract author name
-                name_spans = author_element.find_all("span", recursive=True)
-                for span in name_spans:
-                    text = span.get_text().strip()
-                    if text and not text.startswith("@"):
-                        tweet_data["author_name"] = text
-                        break
+        return self.extractor.extract_tweet_data(tweet)
 
-                # Extract author handle
-                handle_span = author_element.find("span", string=lambda text: text and text.startswith("@"))
-                if handle_span:
-                    tweet_data["author_handle"] = handle_span.text.strip()
-
-            # Extract tweet text
-            text_element = tweet.find("div", {"data-testid": "tweetText"})
-            if text_element:
-                tweet_data["text"] = text_element.get_text(separator=' ').strip()
-
-            # Extract timestamp
-            time_element = tweet.find("time")
-            if time_element:
-                tweet_data["timestamp"] = time_element.get("datetime")
-
-            # Extract engagement metrics
-            tweet_data["likes"] = self.extract_count_by_testid(tweet, "like")
-            tweet_data["retweets"] = self.extract_count_by_testid(tweet, "retweet")
-            tweet_data["replies"] = self.extract_count_by_testid(tweet, "reply")
-
-            # Extract images
-            images = tweet.find_all("img", {"alt": "Image"})
-            tweet_data["image_urls"] = [img.get("src") for img in images if img.get("src")]
-
-            # Check if it's a reply
-            reply_element = tweet.find("div", string=lambda text: text and "Replying to" in str(text))
-            if reply_element:
-                tweet_data["is_reply"] = True
-                reply_to_element = reply_element.find("a")
-                if reply_to_element:
-                    tweet_data["reply_to"] = reply_to_element.get_text().strip()
-
-            return tweet_data
-
-        except Exception as e:
-            logging.error(f"Error extracting tweet data: {str(e)}")
-            return None
-
-    def is_within_date_range(self, tweet_date):
-        try:
-            tweet_date_obj = datetime.strptime(tweet_date.split('T')[0], "%Y-%m-%d")
-            start_date_obj = datetime.strptime(self.start_date, "%Y-%m-%d")
-            end_date_obj = datetime.strptime(self.end_date, "%Y-%m-%d")
-            return start_date_obj <= tweet_date_obj <= end_date_obj
-        except Exception as e:
-            logging.error(f"Error parsing date {tweet_date}: {str(e)}")
-            return False
+    def window_position(self, tweet_id):
+        """Place a tweet ID below, within or above the date window"""
+        if tweet_id < self.min_tweet_id:
+            return "below"
+        if tweet_id >= self.max_tweet_id:
+            return "above"
+        return "within"
 
     
+    @metrics.timer("scroll")
     def scroll_page(self):
+        if self.scroll_mode == "adaptive":
+            return self.scroll_until_loaded()
         try:
             last_height = self.driver.execute_script("return document.documentElement.scrollHeight")
             
@@ -212,78 +279,263 @@ class TwitterScraper:
         except Exception as e:
             logging.error(f"Error scrolling page: {str(e)}")
 
+    def scroll_until_loaded(self):
+        """Scroll one viewport and return as soon as new articles render, or False after scroll_timeout"""
+        try:
+            grew = self.driver.execute_async_script(ADAPTIVE_SCROLL_SCRIPT, int(self.scroll_timeout * 1000))
+            if not grew:
+                metrics.inc("scroll_timeouts")
+            return bool(grew)
+        except Exception as e:
+            logging.error(f"Error scrolling page: {str(e)}")
+            return False
+
+    def restore_session(self):
+        """Load saved X cookies into the browser before the timeline is opened"""
+        if not self.cookies_file or not os.path.exists(self.cookies_file):
+            return
+        with open(self.cookies_file, 'r', encoding='utf-8') as f:
+            cookies = json.load(f)
+        # Cookies can only be set for the domain currently loaded
+        self.driver.get("https://x.com/")
+        for cookie in cookies:
+            try:
+                self.driver.add_cookie(cookie)
+            except Exception as e:
+                logging.warning(f"Could not restore cookie {cookie.get('name')}: {str(e)}")
+        logging.info(f"Restored {len(cookies)} cookies from {self.cookies_file}")
+
+    def save_session(self):
+        if not self.cookies_file or not self.driver.get_cookie("auth_token"):
+            return
+        cookies_dir = os.path.dirname(self.cookies_file)
+        if cookies_dir:
+            os.makedirs(cookies_dir, exist_ok=True)
+        # Scheduler workers share the cookies file, so each writes through its own temporary file
+        fd, tmp_path = tempfile.mkstemp(dir=cookies_dir or '.', prefix=os.path.basename(self.cookies_file) + '.',
+                                        suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.driver.get_cookies(), f)
+            os.replace(tmp_path, self.cookies_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def open_timeline(self):
+        """Open the account timeline, waiting for a manual login only when no saved session is logged in"""
+        self.restore_session()
+        self.driver.get(self.account_url)
+        if self.login_wait and not self.driver.get_cookie("auth_token"):
+            logging.info(f"Waiting up to {self.login_wait}s for manual login...")
+            # X sets auth_token once the login completes, usually long before login_wait
+            WebDriverWait(self.driver, self.login_wait, poll_frequency=1).until(
+                lambda driver: driver.get_cookie("auth_token")
+            )
+            self.save_session()
+            self.driver.get(self.account_url)
+        WebDriverWait(self.driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "article[data-testid='tweet']"))
+        )
+
+    def harvest_articles(self):
+        """Return the tweet articles to process on this iteration"""
+        if self.harvest_mode == "full":
+            with metrics.timer("page_fetch", mode="full"):
+                html = self.driver.page_source
+            with metrics.timer("parse", mode="full"):
+                articles = self.extractor.parse_articles(html)
+            metrics.inc("articles_harvested", len(articles))
+            return articles
+
+        # Only articles that appeared since the last iteration are serialized and parsed,
+        # so the cost per iteration no longer grows with scroll depth
+        with metrics.timer("page_fetch", mode="incremental"):
+            fragments = self.driver.execute_script(HARVEST_SCRIPT) or []
+        articles = []
+        with metrics.timer("parse", mode="incremental"):
+            for fragment in fragments:
+                articles.extend(self.extractor.parse_articles(fragment))
+        metrics.inc("articles_harvested", len(articles))
+        return articles
+
+    def harvest_responses(self):
+        """Return the tweet records in the timeline responses received since the last iteration"""
+        with metrics.timer("page_fetch", mode="network"):
+            responses = self.capture.drain()
+        records = []
+        with metrics.timer("parse", mode="network"):
+            for _, body in responses:
+                try:
+                    records.extend(parse_response(body))
+                except ValueError as e:
+                    logging.error(f"Error decoding timeline response: {str(e)}")
+                    metrics.inc("errors", kind="response_parse")
+        metrics.inc("articles_harvested", len(records))
+        return records
+
+    def admit_tweet_id(self, tweet_id):
+        """Return a tweet ID as an int if the tweet is new and inside the date window, else None"""
+        if not tweet_id or not tweet_id.isdigit():
+            metrics.inc("tweets_skipped", reason="unparsed")
+            return None
+        tweet_id = int(tweet_id)
+
+        position = self.window_position(tweet_id)
+        self.window_positions[position] += 1
+        if position != "within":
+            metrics.inc("tweets_skipped", reason="out_of_range")
+            return None
+
+        if tweet_id in self.processed_tweets:
+            metrics.inc("tweets_skipped", reason="duplicate")
+            return None
+        return tweet_id
+
+    def process_tweet(self, tweet):
+        """Add a tweet article to the dataset, returning True if it was new"""
+        # Promoted tweets render without a timestamp
+        if not self.extractor.get_timestamp(tweet):
+            return False
+
+        # Duplicates and out-of-window tweets are rejected before paying for a full extraction
+        tweet_id = self.admit_tweet_id(self.extractor.get_tweet_id(tweet))
+        if tweet_id is None:
+            return False
+
+        # Extract tweet data
+        with metrics.timer("extract"):
+            tweet_data = self.extract_tweet_data(tweet)
+        if not tweet_data or not tweet_data["tweet_id"]:
+            metrics.inc("tweets_skipped", reason="unparsed")
+            return False
+        return self.add_tweet(tweet_id, tweet_data)
+
+    def process_record(self, tweet_data):
+        """Add a tweet record parsed from a timeline response, returning True if it was new"""
+        tweet_id = self.admit_tweet_id(tweet_data["tweet_id"])
+        if tweet_id is None:
+            return False
+        return self.add_tweet(tweet_id, tweet_data)
+
+    def add_tweet(self, tweet_id, tweet_data):
+        # Skip company tweets
+        if tweet_data["author_handle"] == f"@{self.company_handle}":
+            metrics.inc("tweets_skipped", reason="company")
+            return False
+
+        if self.on_tweet is not None:
+            # Streaming consumers get the tweet now rather than after the run; this may block for backpressure.
+            # It runs before the tweet is checkpointed, so a tweet the consumer could not take is scraped again.
+            try:
+                self.on_tweet(tweet_data)
+            except Exception as e:
+                raise TweetConsumerError(f"Tweet consumer failed: {str(e)}") from e
+
+        # Add to dataset
+        self.tweet_data.append(tweet_data)
+        self.processed_tweets.add(tweet_id)
+        self.tweet_count += 1
+        metrics.inc("tweets_added")
+
+        # One line per tweet is only worth its cost when debugging; checkpoints log the totals
+        logging.debug(f"Added new tweet: {tweet_data['tweet_link']}")
+        return True
+
+    def log_parse_times(self, window):
+        """Log recent per-iteration parse times so growth with scroll depth is visible"""
+        recent = self.parse_times[-window:]
+        mode = "network" if self.capture_mode == "network" else self.harvest_mode
+        if recent:
+            logging.info(
+                f"Parse time ({mode}): last {recent[-1] * 1000:.1f} ms, "
+                f"mean of last {len(recent)} {sum(recent) / len(recent) * 1000:.1f} ms"
+            )
+
     def collect_tweets(self):
         """Collect tweets directly from timeline"""
         total_scrolls = 0
         max_scrolls = 2500
         checkpoint_frequency = 20
-        
+        max_consecutive_errors = 5  # Give up so a scheduler can restart the browser
+        consecutive_errors = 0
+        idle_scrolls = 0
+        below_window_scrolls = 0
+
         try:
-            self.driver.get(self.account_url)
-            logging.info("Waiting for manual login...")
-            time.sleep(120)
-            
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "article[data-testid='tweet']"))
-            )
-            
+            self.open_timeline()
+
             # Load existing progress
             self.load_checkpoint()
             
             while total_scrolls < max_scrolls:
                 try:
-                    soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-                    tweets = soup.find_all("article", {"data-testid": "tweet"})
-                    
+                    iteration_start = time.monotonic()
+                    parse_start = time.perf_counter()
                     new_tweets_found = False
+                    self.window_positions = dict.fromkeys(self.window_positions, 0)
+                    if self.capture_mode == "network":
+                        tweets, process = self.harvest_responses(), self.process_record
+                    else:
+                        tweets, process = self.harvest_articles(), self.process_tweet
                     for tweet in tweets:
                         try:
-                            time_element = tweet.find("time")
-                            if not time_element:
-                                continue
-                                
-                            tweet_date = time_element.get("datetime")
-                            if not self.is_within_date_range(tweet_date):
-                                continue
-
-                            # Extract tweet data
-                            tweet_data = self.extract_tweet_data(tweet)
-                            if not tweet_data or not tweet_data["tweet_id"]:
-                                continue
-
-                            # Skip if already processed
-                            if tweet_data["tweet_id"] in self.processed_tweets:
-                                continue
-
-                            # Skip company tweets
-                            if tweet_data["author_handle"] == f"@{self.company_handle}":
-                                continue
-
-                            # Add to dataset
-                            self.tweet_data.append(tweet_data)
-                            self.processed_tweets.add(tweet_data["tweet_id"])
-                            new_tweets_found = True
-                            
-                            logging.info(f"Added new tweet: {tweet_data['tweet_link']}")
-
+                            if process(tweet):
+                                new_tweets_found = True
+                        except TweetConsumerError:
+                            raise
                         except Exception as e:
                             logging.error(f"Error processing individual tweet: {str(e)}")
+                            metrics.inc("errors", kind="tweet")
                             continue
+                    self.parse_times.append(time.perf_counter() - parse_start)
+                    metrics.observe("harvest", self.parse_times[-1])
+
+                    # The timeline runs newest first; once several iterations in a row hold only tweets
+                    # older than start_date, nothing further down can fall inside the window. A single
+                    # such iteration is not enough, as replies are shown under their older parent tweets.
+                    if self.window_positions["below"] and not (self.window_positions["within"]
+                                                               or self.window_positions["above"]):
+                        below_window_scrolls += 1
+                    elif any(self.window_positions.values()):
+                        below_window_scrolls = 0
+                    if below_window_scrolls >= self.max_below_window_scrolls:
+                        logging.info(f"Scrolled past {self.start_date}; stopping early")
+                        break
 
                     if total_scrolls % checkpoint_frequency == 0:
                         self.save_checkpoint()
-                        logging.info(f"Checkpoint saved. Total tweets: {len(self.tweet_data)}")
+                        logging.info(f"Checkpoint saved. Total tweets: {self.tweet_count}")
+                        self.log_parse_times(checkpoint_frequency)
+                        self.report_progress(total_scrolls, "running")
 
-                    # Scroll and check if we've reached the end
+                    # Scroll and check if we've reached the end; a slow response alone does not end the run
                     if not self.scroll_page() and not new_tweets_found:
-                        logging.info("Reached end of timeline or no new tweets found")
-                        break
+                        idle_scrolls += 1
+                        if idle_scrolls >= self.max_idle_scrolls:
+                            logging.info("Reached end of timeline or no new tweets found")
+                            break
+                    else:
+                        idle_scrolls = 0
 
                     total_scrolls += 1
+                    metrics.inc("scroll_iterations")
+                    consecutive_errors = 0
 
+                    remaining = self.min_iteration_interval - (time.monotonic() - iteration_start)
+                    if remaining > 0:
+                        time.sleep(remaining)
+
+                except TweetConsumerError:
+                    raise
                 except Exception as e:
                     logging.error(f"Error during scrolling iteration: {str(e)}")
+                    metrics.inc("errors", kind="iteration")
                     self.save_checkpoint()
+                    consecutive_errors += 1
+                    if consecutive_errors >= max_consecutive_errors:
+                        raise RuntimeError(f"{consecutive_errors} consecutive scrolling errors") from e
                     time.sleep(10)
                     continue
 
@@ -292,42 +544,69 @@ class TwitterScraper:
             raise
         finally:
             self.save_checkpoint()
+            metrics.log_summary()
 
-        return self.tweet_data
+        self.report_progress(total_scrolls, "collected")
+        return self.tweet_count
 
-    def save_tweets_to_csv(self, filename):
-        """Save tweets to CSV with all fields"""
+    def report_progress(self, scrolls, status):
+        if self.progress_callback is None:
+            return
         try:
-            if not os.path.exists('tweets'):
-                os.makedirs('tweets')
+            self.progress_callback({
+                "account": self.company_handle,
+                "status": status,
+                "scrolls": scrolls,
+                "tweets": self.tweet_count,
+                "timestamp": time.time()
+            })
+        except Exception as e:
+            logging.error(f"Error reporting progress: {str(e)}")
 
-            csv_path = os.path.join('tweets', filename)
+    @metrics.timer("save_csv")
+    def save_tweets_to_csv(self, filename, output_dir='tweets'):
+        """Save tweets to CSV with all fields, streaming them from the checkpoint journal"""
+        try:
+            self.save_checkpoint()
+            if not os.path.exists(output_dir):
+                os.makedirs(output_dir)
+
+            csv_path = os.path.join(output_dir, filename)
             
             fieldnames = [
                 "tweet_id", "tweet_link", "author_name", "author_handle", 
                 "text", "timestamp", "likes", "retweets", "replies",
-                "image_urls", "is_reply", "reply_to", "conversation_id"
+                "image_urls", "is_reply", "reply_to", "reply_to_id", "conversation_id"
             ]
 
+            saved = 0
             with open(csv_path, mode='w', newline='', encoding='utf-8') as file:
                 writer = csv.DictWriter(file, fieldnames=fieldnames)
                 writer.writeheader()
-                for tweet in self.tweet_data:
+                for tweet in self.journal.iter_records():
                     # Convert image_urls list to string for CSV
-                    tweet = tweet.copy()
                     tweet["image_urls"] = "|".join(tweet["image_urls"]) if tweet["image_urls"] else ""
                     writer.writerow(tweet)
+                    saved += 1
 
-            logging.info(f"Saved {len(self.tweet_data)} tweets to {csv_path}")
+            logging.info(f"Saved {saved} tweets to {csv_path}")
         except Exception as e:
             logging.error(f"Error saving to CSV: {str(e)}")
             self.save_checkpoint()
 
     def cleanup(self):
+        self.write_metrics()
+        self.journal.close()
         try:
-            self.driver.quit()
+            # X rotates session cookies while scrolling; keep the latest ones
+            self.save_session()
         except Exception as e:
-            logging.error(f"Error during cleanup: {str(e)}")
+            logging.error(f"Error saving the session: {str(e)}")
+        finally:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                logging.error(f"Error during cleanup: {str(e)}")
 
     def run(self):
         try:
@@ -339,5 +618,6 @@ class TwitterScraper:
             self.cleanup()
 
 if __name__ == "__main__":
-    scraper = TwitterScraper()
+    scraper = TwitterScraper(chrome_profile_dir=os.path.join(CHROME_PROFILES_DIR, "FibeIndia"),
+                             cookies_file=COOKIES_FILE)
     scraper.run()
\ No newline at end of file
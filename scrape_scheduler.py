@@ -0,0 +1,266 @@
+"""Scrape several accounts in parallel, one headless Chrome worker process per account.
+
+    python scrape_scheduler.py --workers 4 --start-date 2024-08-01 --end-date 2024-10-24
+    python scrape_scheduler.py --config scrape_jobs.json
+    python scrape_scheduler.py --metrics-dir /var/lib/node_exporter/textfile --profile-dir profiles
+    python scrape_scheduler.py --accounts Fibe --show-browser --login-wait 300   # log in once; later runs reuse it
+    python scrape_scheduler.py --capture-mode network --record-dir recordings   # replay with timeline_responses.py
+
+A job config is a JSON list of objects with an "account" name or slug plus any job
+fields to override, e.g. [{"account": "Kreditbee", "start_date": "2024-04-01"}].
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from collections import deque
+
+from config.accounts import ACCOUNTS, resolve_accounts
+from instrumentation import LOG_LEVELS, PROFILERS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+
+
+def build_jobs(names, defaults, overrides=None):
+    """Build one scrape job per account from config/accounts.py, shared defaults and per-account overrides"""
+    overrides = {entry['account'].lower(): entry for entry in overrides or []}
+    jobs = []
+    for account, config in resolve_accounts(names):
+        job = {
+            "account": account,
+            "handle": config['handle'],
+            "account_url": f"https://x.com/{config['handle']}/with_replies",
+            "checkpoint_file": os.path.join("checkpoints", f"{config['slug']}_tweet_checkpoint.jsonl"),
+            # Each run writes its own file, so the committed raw CSVs are never overwritten
+            "output_dir": "tweets",
+            "output_file": None,
+            "min_iteration_interval": 0,
+            "headless": True,
+            "login_wait": 0,
+            "scroll_mode": "adaptive",
+            "scroll_timeout": 5,
+            "capture_mode": "dom",
+            "record_dir": None,
+            # Chrome locks its profile directory, so every worker gets its own
+            "chrome_profile_dir": os.path.join("chrome_profiles", config['slug']),
+            "cookies_file": os.path.join("chrome_profiles", "x_cookies.json"),
+            "log_level": "INFO",
+            "metrics_file": None,
+            "profile_file": None,
+            "profiler": "cprofile",
+        }
+        job.update(defaults)
+        override = overrides.get(account.lower()) or overrides.get(config['slug'].lower())
+        if override:
+            job.update({key: value for key, value in override.items() if key != 'account'})
+        if not job['output_file']:
+            job['output_file'] = f"{config['slug']}_{job['start_date']}_{job['end_date']}.csv"
+        jobs.append(job)
+    return jobs
+
+
+def scrape_worker(job, progress_queue):
+    """Scrape one account; an exception or crash gives a non-zero exit code"""
+    # Imported here so the scheduler process itself never loads Selenium
+    from instrumentation import profiling
+    from scrap_tweets import TwitterScraper
+
+    logging.getLogger().setLevel(job['log_level'])
+
+    scraper = TwitterScraper(
+        account_url=job['account_url'],
+        company_handle=job['handle'],
+        start_date=job['start_date'],
+        end_date=job['end_date'],
+        checkpoint_file=job['checkpoint_file'],
+        headless=job['headless'],
+        login_wait=job['login_wait'],
+        min_iteration_interval=job['min_iteration_interval'],
+        progress_callback=progress_queue.put,
+        metrics_file=job['metrics_file'],
+        scroll_mode=job['scroll_mode'],
+        scroll_timeout=job['scroll_timeout'],
+        chrome_profile_dir=job['chrome_profile_dir'],
+        cookies_file=job['cookies_file'],
+        capture_mode=job['capture_mode'],
+        record_dir=job['record_dir']
+    )
+    try:
+        with profiling(job['profile_file'], job['profiler']):
+            scraper.collect_tweets()
+            scraper.save_tweets_to_csv(job['output_file'], job['output_dir'])
+    finally:
+        scraper.cleanup()
+
+
+class ScrapeScheduler:
+    """Run scrape jobs on a fixed number of worker processes, restarting crashed workers with backoff"""
+
+    def __init__(self, jobs, workers=4, max_retries=3, backoff=30, report_interval=30):
+        self.jobs = jobs
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.report_interval = report_interval
+        self.context = multiprocessing.get_context('spawn')
+        self.progress_queue = self.context.Queue()
+        self.progress = {job['handle']: {"status": "pending", "tweets": 0, "scrolls": 0, "attempts": 0}
+                         for job in jobs}
+
+    def start(self, job):
+        state = self.progress[job['handle']]
+        state["attempts"] += 1
+        state["status"] = "starting"
+        process = self.context.Process(
+            target=scrape_worker, args=(job, self.progress_queue), name=job['handle']
+        )
+        process.start()
+        logging.info(f"Started worker for {job['account']} (attempt {state['attempts']})")
+        return process
+
+    def drain_progress(self):
+        while True:
+            try:
+                update = self.progress_queue.get_nowait()
+            except queue.Empty:
+                return
+            state = self.progress.get(update['account'])
+            if state is not None:
+                state.update(status=update['status'], tweets=update['tweets'], scrolls=update['scrolls'])
+
+    def report(self):
+        lines = [f"{'account':<16} {'status':<10} {'attempts':>8} {'scrolls':>8} {'tweets':>8}"]
+        for handle, state in self.progress.items():
+            lines.append(f"{handle:<16} {state['status']:<10} {state['attempts']:>8} "
+                         f"{state['scrolls']:>8} {state['tweets']:>8}")
+        logging.info("Scrape progress:\n" + "\n".join(lines))
+
+    def run(self):
+        """Run every job to completion or until it exhausts its retries; return the failed handles"""
+        pending = deque(self.jobs)
+        not_before = {}
+        running = {}
+        failed = []
+        last_report = time.monotonic()
+
+        try:
+            while pending or running:
+                now = time.monotonic()
+                for _ in range(len(pending)):
+                    if len(running) >= self.workers:
+                        break
+                    job = pending.popleft()
+                    if not_before.get(job['handle'], 0) > now:
+                        pending.append(job)
+                        continue
+                    running[job['handle']] = (job, self.start(job))
+
+                self.drain_progress()
+
+                for handle, (job, process) in list(running.items()):
+                    if process.is_alive():
+                        continue
+                    process.join()
+                    del running[handle]
+                    state = self.progress[handle]
+                    if process.exitcode == 0:
+                        state["status"] = "done"
+                        logging.info(f"Worker for {job['account']} finished with {state['tweets']} tweets")
+                    elif state["attempts"] <= self.max_retries:
+                        delay = self.backoff * 2 ** (state["attempts"] - 1)
+                        state["status"] = "retrying"
+                        not_before[handle] = time.monotonic() + delay
+                        pending.append(job)
+                        logging.warning(f"Worker for {job['account']} exited with code {process.exitcode}; "
+                                        f"retrying in {delay}s from its checkpoint")
+                    else:
+                        state["status"] = "failed"
+                        failed.append(handle)
+                        logging.error(f"Worker for {job['account']} failed after {state['attempts']} attempts")
+
+                if time.monotonic() - last_report >= self.report_interval:
+                    self.report()
+                    last_report = time.monotonic()
+                time.sleep(1)
+        except KeyboardInterrupt:
+            # Workers receive the same SIGINT and save their own checkpoints
+            logging.info("Interrupted; waiting for workers to save their checkpoints...")
+            for job, process in running.values():
+                process.join()
+            raise
+        finally:
+            self.drain_progress()
+            self.report()
+
+        return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", nargs="*", help="Account names or slugs to scrape (default: all)")
+    parser.add_argument("--config", help="JSON file with per-account job overrides")
+    parser.add_argument("--start-date", default="2024-08-01")
+    parser.add_argument("--end-date", default="2024-10-24")
+    parser.add_argument("--workers", type=int, default=len(ACCOUNTS), help="Concurrent Chrome workers")
+    parser.add_argument("--min-interval", type=float, default=0,
+                        help="Per-worker rate limit: minimum seconds per scroll iteration")
+    parser.add_argument("--max-retries", type=int, default=3, help="Restarts allowed per crashed worker")
+    parser.add_argument("--backoff", type=float, default=30, help="Initial retry delay in seconds, doubled per retry")
+    parser.add_argument("--show-browser", action="store_true", help="Run Chrome with a visible window")
+    parser.add_argument("--login-wait", type=float, default=0,
+                        help="Longest wait for a manual login when no saved session exists (needs --show-browser)")
+    parser.add_argument("--scroll-mode", choices=["adaptive", "fixed"], default="adaptive",
+                        help="Wait for new articles after each scroll, or scroll on a fixed timer")
+    parser.add_argument("--scroll-timeout", type=float, default=5,
+                        help="Seconds an adaptive scroll waits for new articles")
+    parser.add_argument("--capture-mode", choices=["dom", "network"], default="dom",
+                        help="Parse tweets from the rendered page, or from the timeline API responses")
+    parser.add_argument("--record-dir", help="With --capture-mode network, keep each account's responses here")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="INFO",
+                        help="Worker log level; DEBUG adds a line per scraped tweet")
+    parser.add_argument("--metrics-dir", help="Write each worker's metrics here as a Prometheus textfile")
+    parser.add_argument("--metrics-format", choices=["prom", "json"], default="prom")
+    parser.add_argument("--profile-dir", help="Profile each worker and write the profile here")
+    parser.add_argument("--profiler", choices=PROFILERS, default="cprofile")
+    args = parser.parse_args()
+
+    overrides = []
+    if args.config:
+        with open(args.config, encoding='utf-8') as f:
+            overrides = json.load(f)
+
+    defaults = {
+        "start_date": args.start_date,
+        "end_date": args.end_date,
+        "min_iteration_interval": args.min_interval,
+        "headless": not args.show_browser,
+        "login_wait": args.login_wait,
+        "scroll_mode": args.scroll_mode,
+        "scroll_timeout": args.scroll_timeout,
+        "capture_mode": args.capture_mode,
+        "log_level": args.log_level,
+        "profiler": args.profiler,
+    }
+    jobs = build_jobs(args.accounts, defaults, overrides)
+    for job in jobs:
+        if args.record_dir:
+            job["record_dir"] = os.path.join(args.record_dir, job['handle'])
+        if args.metrics_dir:
+            job["metrics_file"] = os.path.join(args.metrics_dir, f"scraper_{job['handle']}.{args.metrics_format}")
+        if args.profile_dir:
+            extension = "prof" if args.profiler == "cprofile" else "speedscope.json"
+            job["profile_file"] = os.path.join(args.profile_dir, f"{job['handle']}.{extension}")
+
+    scheduler = ScrapeScheduler(jobs, args.workers, args.max_retries, args.backoff)
+    started = time.monotonic()
+    failed = scheduler.run()
+    logging.info(f"Scraped {len(jobs) - len(failed)}/{len(jobs)} accounts in {time.monotonic() - started:.0f}s")
+    if failed:
+        raise SystemExit(f"Failed accounts: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
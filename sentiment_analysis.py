@@ -1,24 +1,229 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
-from transformers import pipeline
 
-# Load the dataset
-file_path = "partially_processed_tweets/filtered_df_casheApp.csv"  
-tweet_data = pd.read_csv(file_path)
+from config.accounts import resolve_accounts
+from instrumentation import LOG_LEVELS, PROFILERS, metrics, profiling
+from model_cache import DEFAULT_CACHE_PATH, ModelCache
+from tweet_aggregates import publish_aggregates
+from tweet_search import index_accounts
+from tweet_store import publish_account
+
+MODEL_ID = "lxyuan/distilbert-base-multilingual-cased-sentiments-student"
+BACKENDS = ("pytorch", "onnx")
+DEFAULT_ONNX_DIR = "models/sentiment-onnx"
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Pipeline owned by each worker process, created once by _init_worker
+_worker_pipeline = None
+
+
+def load_sentiment_pipeline(model_id=MODEL_ID, num_threads=None, backend="pytorch", onnx_dir=DEFAULT_ONNX_DIR):
+    """Initialize the multilingual sentiment analysis pipeline."""
+    if backend == "onnx":
+        # Int8-quantized export of the model; imports neither torch nor transformers
+        from onnx_sentiment import OnnxSentimentPipeline
+        onnx_pipeline = OnnxSentimentPipeline(onnx_dir, num_threads)
+        if onnx_pipeline.model_id != model_id:
+            raise ValueError(f"{onnx_dir} holds an export of {onnx_pipeline.model_id}, not {model_id}")
+        return onnx_pipeline
+    from transformers import pipeline
+    if num_threads:
+        import torch
+        torch.set_num_threads(num_threads)
+    return pipeline("text-classification", model=model_id)
+
+
+def resolve_model_version(model_id):
+    """Return the revision of the model that the pipeline will load, used to invalidate cached scores."""
+    from transformers import AutoConfig
+    config = AutoConfig.from_pretrained(model_id)
+    return getattr(config, '_commit_hash', None) or config.transformers_version
+
+
+def run_batches(sentiment_pipeline, texts, batch_size):
+    """Classify texts in batches sorted by token length and return (label, score) pairs in input order."""
+    lengths = [len(ids) for ids in sentiment_pipeline.tokenizer(texts, truncation=True)['input_ids']]
+    order = sorted(range(len(texts)), key=lengths.__getitem__)
+
+    # Similar-length batches keep padding, and so wasted compute, to a minimum
+    results = sentiment_pipeline([texts[i] for i in order], batch_size=batch_size, truncation=True)
+
+    scored = [None] * len(texts)
+    for i, result in zip(order, results):
+        scored[i] = (result['label'], result['score'])
+    return scored
+
+
+def _init_worker(model_id, num_threads, backend, onnx_dir):
+    global _worker_pipeline
+    _worker_pipeline = load_sentiment_pipeline(model_id, num_threads, backend, onnx_dir)
+
+
+def _score_chunk(args):
+    texts, batch_size = args
+    return run_batches(_worker_pipeline, texts, batch_size)
+
+
+class SentimentScorer:
+    """Run the sentiment model once per tweet, in batches, optionally across worker processes."""
+
+    def __init__(self, model_id=MODEL_ID, batch_size=32, workers=1, num_threads=None, cache=None,
+                 backend="pytorch", onnx_dir=DEFAULT_ONNX_DIR):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown sentiment backend: {backend}")
+        self.model_id = model_id
+        self.backend = backend  # "pytorch" runs the Hugging Face model, "onnx" its int8 ONNX export
+        self.onnx_dir = onnx_dir
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        # Split the cores between workers so they don't oversubscribe the CPU
+        self.num_threads = num_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.chunk_size = batch_size * 8
+        self.pipeline = None
+        self.executor = None
+        self.cache = cache
+        # Quantized scores differ slightly, so they are cached under their own task; binding one
+        # task to the other backend's model would drop that backend's entries on every switch
+        self.cache_task = 'sentiment-onnx' if backend == "onnx" else 'sentiment'
+        if cache is not None:
+            if backend == "onnx":
+                from onnx_sentiment import load_meta
+                cache.bind(self.cache_task, model_id, f"{load_meta(onnx_dir)['model_version']}+onnx-int8")
+            else:
+                cache.bind(self.cache_task, model_id, resolve_model_version(model_id))
+
+    def _start(self):
+        if self.workers == 1:
+            if self.pipeline is None:
+                self.pipeline = load_sentiment_pipeline(self.model_id, self.num_threads, self.backend, self.onnx_dir)
+        elif self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.model_id, self.num_threads, self.backend, self.onnx_dir)
+            )
+
+    def score(self, texts):
+        """Return a (label, score) pair for every text; non-string values are NEUTRAL with score 0."""
+        texts = list(texts)
+        scored = [("NEUTRAL", 0)] * len(texts)
+        valid = [i for i, text in enumerate(texts) if isinstance(text, str)]
+        if not valid:
+            return scored
+
+        unique_texts = list(dict.fromkeys(texts[i] for i in valid))
+        known = self.cache.get_many(self.cache_task, unique_texts) if self.cache is not None else {}
+        pending = [text for text in unique_texts if text not in known]
+        metrics.inc("sentiment_cache_hits", len(unique_texts) - len(pending))
+        if pending:
+            results = self._run_model(pending)
+            known.update(zip(pending, results))
+            if self.cache is not None:
+                self.cache.put_many(self.cache_task, zip(pending, results))
+
+        for i in valid:
+            label, score = known[texts[i]]
+            scored[i] = (label, score)
+        return scored
+
+    def _run_model(self, texts):
+        with metrics.timer("model_load"):
+            self._start()
+        metrics.inc("texts_scored", len(texts))
+        with metrics.timer("inference", workers=self.workers):
+            if self.executor is None:
+                return run_batches(self.pipeline, texts, self.batch_size)
+            chunks = [
+                (texts[start:start + self.chunk_size], self.batch_size)
+                for start in range(0, len(texts), self.chunk_size)
+            ]
+            return [pair for chunk in self.executor.map(_score_chunk, chunks) for pair in chunk]
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def score_file(scorer, input_path, output_path):
+    """Add sentiment and sentiment_score columns to a tweets CSV and save the result."""
+    with metrics.timer("read_csv"):
+        tweet_data = pd.read_csv(input_path)
+
+    start = time.perf_counter()
+    scored = scorer.score(tweet_data['text'])
+    elapsed = time.perf_counter() - start
+
+    tweet_data['sentiment'] = [label for label, _ in scored]
+    tweet_data['sentiment_score'] = [score for _, score in scored]
+    with metrics.timer("write_csv"):
+        tweet_data.to_csv(output_path, index=False)
+
+    rate = len(tweet_data) / elapsed if elapsed > 0 else float('inf')
+    logging.info(f"Scored {len(tweet_data)} tweets from {input_path} in {elapsed:.1f}s ({rate:.1f} tweets/sec)")
+    return len(tweet_data), elapsed
+
 
-# Initializing multilingual sentiment analysis pipeline
-sentiment_pipeline = pipeline("text-classification", model="lxyuan/distilbert-base-multilingual-cased-sentiments-student")
+def main():
+    parser = argparse.ArgumentParser(description="Score tweet sentiment for one or more accounts.")
+    parser.add_argument("--accounts", nargs="*", help="Account names or slugs to score (default: all)")
+    parser.add_argument("--model", default=MODEL_ID, help="Hugging Face model id")
+    parser.add_argument("--batch-size", type=int, default=32, help="Tweets per inference batch")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--threads", type=int, default=None, help="Torch or ONNX Runtime threads per worker")
+    parser.add_argument("--backend", choices=BACKENDS, default="pytorch",
+                        help="Run the model in PyTorch, or its int8 ONNX export (see onnx_sentiment.py)")
+    parser.add_argument("--onnx-dir", default=DEFAULT_ONNX_DIR, help="Where onnx_sentiment.py exported the model")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Path of the model output cache")
+    parser.add_argument("--cache-max-mb", type=int, default=256, help="Evict cached outputs beyond this size")
+    parser.add_argument("--no-cache", action="store_true", help="Rescore every tweet from scratch")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="INFO")
+    parser.add_argument("--metrics-file", help="Write timings and counters here (.prom for a Prometheus textfile, else JSON)")
+    parser.add_argument("--profile", help="Profile the run and write the profile to this file")
+    parser.add_argument("--profiler", choices=PROFILERS, default="cprofile")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(args.log_level)
 
-# Function to classify sentiment using the pre-trained model
-def get_sentiment(text):
-    result = sentiment_pipeline(text)[0]
-    return result['label'], result['score']
+    cache = None if args.no_cache else ModelCache(args.cache, args.cache_max_mb * 1024 * 1024)
+    scorer = SentimentScorer(args.model, args.batch_size, args.workers, args.threads, cache, args.backend,
+                             args.onnx_dir)
+    total_tweets, total_time = 0, 0.0
+    try:
+        with profiling(args.profile, args.profiler):
+            for account, config in resolve_accounts(args.accounts):
+                count, elapsed = score_file(scorer, config['partial'], config['final'])
+                total_tweets += count
+                total_time += elapsed
+                print(f"Sentiment analysis for {account} completed and saved to {config['final']}")
+                with metrics.timer("publish", account=config['slug']):
+                    publish_account(config['final'], config['slug'])
+                    publish_aggregates(config)
+            with metrics.timer("search_index"):
+                index_accounts(args.accounts)
+        if cache is not None:
+            stats = cache.stats()
+            print(f"Cache: {stats['hits']} hits, {stats['misses']} misses "
+                  f"({stats['hit_rate']:.0%} hit rate), {stats['evictions']} evictions")
+    finally:
+        scorer.close()
+        if cache is not None:
+            cache.close()
+        metrics.log_summary()
+        if args.metrics_file:
+            metrics.write(args.metrics_file, labels={"job": "sentiment"})
 
-# Apply sentiment analysis to the text column
-tweet_data['sentiment'] = tweet_data['text'].apply(lambda x: get_sentiment(x)[0] if isinstance(x, str) else "NEUTRAL")
-tweet_data['sentiment_score'] = tweet_data['text'].apply(lambda x: get_sentiment(x)[1] if isinstance(x, str) else 0)
+    if total_time > 0:
+        print(f"Scored {total_tweets} tweets at {total_tweets / total_time:.1f} tweets/sec "
+              f"(batch size {args.batch_size}, {args.workers} worker(s), {args.backend})")
 
-# Save the modified dataset to a new CSV
-output_path = "final_tweets/CasheApp.csv"  
-tweet_data.to_csv(output_path, index=False)
 
-print(f"Sentiment analysis completed and saved to {output_path}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,531 @@
+"""Stream tweets from the scraper through the sentiment model into Postgres while the scrape runs.
+
+    python stream_ingest.py scrape Fibe --start-date 2024-10-01 --end-date 2024-10-24 --spool .cache/fibe_spool.jsonl
+    python stream_ingest.py replay raw_tweets/fibe.csv --rate 50 --sink jsonl --sink-path stored.jsonl
+    python stream_ingest.py replay checkpoints/fibe_tweet_checkpoint.jsonl --spool .cache/stream_spool.jsonl
+
+The scraper publishes each new tweet to a bounded queue. A scoring thread takes micro-batches
+from it through SentimentScorer, and a writer thread bulk-inserts the scored tweets with
+db_operations.insert_operations.load_tweets. When the model or the database falls behind, the
+queues fill up and the scraper blocks until there is room, so memory stays bounded by the
+queue and batch sizes rather than by the length of the timeline.
+
+replay feeds a scraped CSV or checkpoint journal through the same path without a browser.
+--spool swaps the in-memory queue for a FileQueue, which keeps tweets that were not stored
+yet on disk and picks them up again after a restart. replay also records next to the spool
+how many tweets of its source it has spooled, and resumes after them, so a source that was
+replayed in full is not published again. The scraper's checkpoint marks a tweet as seen once
+it is published, so a scrape that can be interrupted should always be given --spool. Rows
+are inserted with ON CONFLICT DO NOTHING on (account, tweet_url), so a batch that is stored
+again after a restart is not duplicated.
+"""
+import argparse
+import csv
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from instrumentation import LOG_LEVELS, metrics
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Ends the scored queue once the scoring thread has drained the inbox
+_DONE = object()
+
+
+class LatencyWindow:
+    """Percentiles over the most recent latency samples; the metrics registry only keeps mean and max."""
+
+    def __init__(self, size=10000):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentiles(self):
+        with self.lock:
+            samples = np.array(self.samples)
+        if not len(samples):
+            return {}
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "max": float(samples.max())}
+
+
+class FileQueue:
+    """Bounded FIFO queue spooled to a JSON Lines file, with the queue.Queue put/get interface.
+
+    Items stay in the file until commit() is given the offset of the last one that was fully
+    handled, so a restart resumes with every tweet that had not been stored. maxsize bounds the
+    items put but not yet committed, covering those still being scored or written as well.
+    """
+
+    def __init__(self, path, maxsize=1000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.offset_path = path + ".offset"
+        self.maxsize = maxsize
+        self.cond = threading.Condition()
+        committed = 0
+        if os.path.exists(self.offset_path):
+            with open(self.offset_path, "r", encoding="utf-8") as f:
+                committed = int(f.read().strip() or 0)
+        self.writer = open(path, "a", encoding="utf-8")
+        self.reader = open(path, "r", encoding="utf-8")
+        self.reader.seek(committed)
+        self.committed = committed
+        self.unread = sum(1 for _ in self.reader)  # Items left over from an earlier run
+        self.reader.seek(committed)
+        self.in_flight = deque()  # End offsets of items handed out but not committed
+
+    def qsize(self):
+        with self.cond:
+            return self.unread
+
+    def put(self, item, block=True, timeout=None):
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.unread + len(self.in_flight) < self.maxsize,
+                                      timeout if block else 0):
+                raise queue.Full
+            self.writer.write(json.dumps(item, ensure_ascii=False) + "\n")
+            self.writer.flush()
+            self.unread += 1
+            self.cond.notify_all()
+
+    def get(self, block=True, timeout=None):
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.unread > 0, timeout if block else 0):
+                raise queue.Empty
+            line = self.reader.readline()
+            self.unread -= 1
+            offset = self.reader.tell()
+            self.in_flight.append(offset)
+        item = json.loads(line)
+        item["_offset"] = offset
+        return item
+
+    def commit(self, offset):
+        """Mark every item up to and including the one ending at offset as handled"""
+        with self.cond:
+            while self.in_flight and self.in_flight[0] <= offset:
+                self.in_flight.popleft()
+            self.committed = max(self.committed, offset)
+            with open(self.offset_path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(str(self.committed))
+            os.replace(self.offset_path + ".tmp", self.offset_path)
+            if not self.unread and not self.in_flight:
+                # Everything is stored; start the spool over instead of letting it grow
+                self.writer.truncate(0)
+                self.reader.seek(0)
+                self.committed = 0
+                os.remove(self.offset_path)
+            self.cond.notify_all()
+
+    def close(self):
+        self.writer.close()
+        self.reader.close()
+
+
+class ReplayPosition:
+    """How many tweets of a replay source are in the spool, kept next to it so a restart resumes after them.
+
+    The count is saved after each tweet is spooled, so a crash between the two spools that
+    tweet again, and the idempotent insert stores it once.
+    """
+
+    def __init__(self, spool_path, source):
+        self.path = spool_path + ".source"
+        self.source = os.path.abspath(source)
+        self.published = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("source") == self.source:
+                self.published = state["published"]
+
+    def advance(self):
+        self.published += 1
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"source": self.source, "published": self.published}, f)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def db_record(tweet):
+    """Convert a scraped, scored tweet record to a tweets table row for load_tweets"""
+    return {
+        "account": tweet.get("account"),
+        "author_name": tweet.get("author_name"),
+        "author_handle": tweet.get("author_handle"),
+        "profile_img_url": None,
+        "text": tweet.get("text"),
+        "tweet_url": tweet.get("tweet_link"),
+        "timestamp": tweet.get("timestamp") or None,
+        "sentiment": tweet.get("sentiment"),
+        "sentiment_score": tweet.get("sentiment_score"),
+        "topics": tweet.get("topics"),
+        "images": tweet.get("image_urls") or [],
+    }
+
+
+class PostgresSink:
+    """Bulk-insert scored tweets through the shared connection pool, one transaction per batch."""
+
+    def __init__(self, pool=None, page_size=1000):
+        from db_operations.connection_pool import get_pool
+        self.pool = pool or get_pool()
+        self.page_size = page_size
+
+    def write(self, tweets):
+        from db_operations.insert_operations import load_tweets
+        load_tweets([db_record(tweet) for tweet in tweets], self.pool, self.page_size)
+
+    def close(self):
+        self.pool.closeall()
+
+
+class JsonlSink:
+    """Append stored rows to a JSON Lines file, for runs without a database."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, tweets):
+        for tweet in tweets:
+            self.file.write(json.dumps(db_record(tweet), ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class StreamIngest:
+    """Score and store published tweets on two background threads, with bounded queues between them.
+
+    At most queue_size tweets wait for the model, about as many again wait for the writer,
+    plus one scoring batch and one write batch in progress.
+
+    Instead of a scorer, make_scorer can be given to build one on the scoring thread and close
+    it there when the stream ends. The SQLite model cache can only be used on the thread that
+    opened it, so a cached scorer must be built this way.
+    """
+
+    def __init__(self, scorer, sink, queue_size=1000, batch_size=64, max_wait=1.0, write_batch=500,
+                 flush_interval=2.0, inbox=None, max_retries=3, backoff=1.0, report_interval=30, make_scorer=None):
+        self.scorer = scorer
+        self.make_scorer = make_scorer
+        self.sink = sink
+        self.batch_size = batch_size
+        self.max_wait = max_wait  # Longest a tweet waits for its scoring batch to fill
+        self.write_batch = write_batch
+        self.flush_interval = flush_interval  # Longest a scored tweet waits for its write batch to fill
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.report_interval = report_interval
+        self.inbox = inbox if inbox is not None else queue.Queue(maxsize=queue_size)
+        self.scored = queue.Queue(maxsize=max(1, queue_size // batch_size))
+        self.producer_done = threading.Event()
+        self.failed = threading.Event()
+        self.error = None
+        self.latency = LatencyWindow()
+        self.published = 0
+        self.stored = 0
+        self.threads = []
+        self.last_report = time.monotonic()
+
+    def start(self):
+        self.threads = [threading.Thread(target=self._run, args=(self._score_loop,), name="stream-score", daemon=True),
+                        threading.Thread(target=self._run, args=(self._write_loop,), name="stream-write", daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def publish(self, tweet):
+        """Queue a scraped tweet for scoring and storage, blocking while the queue is full"""
+        record = dict(tweet, scraped_at=time.time())
+        started = time.perf_counter()
+        if self.failed.is_set():
+            raise RuntimeError("Streaming ingestion has stopped") from self.error
+        try:
+            self.inbox.put(record, block=False)
+        except queue.Full:
+            # The consumers are behind; hold the scraper here until there is room
+            metrics.inc("stream_backpressure_waits")
+            while True:
+                if self.failed.is_set():
+                    raise RuntimeError("Streaming ingestion has stopped") from self.error
+                try:
+                    self.inbox.put(record, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+        metrics.observe("stream_publish_wait", time.perf_counter() - started)
+        metrics.inc("stream_published")
+        self.published += 1
+
+    def close(self):
+        """Wait for every published tweet to be stored, then return the run's statistics"""
+        self.producer_done.set()
+        for thread in self.threads:
+            thread.join()
+        self.report()
+        if self.error is not None:
+            raise RuntimeError("Streaming ingestion failed") from self.error
+        return self.stats()
+
+    def stats(self):
+        return {"published": self.published, "stored": self.stored, "inbox": self.inbox.qsize(),
+                "latency": self.latency.percentiles()}
+
+    def report(self):
+        stats = self.stats()
+        latency = stats["latency"]
+        summary = (f"p50 {latency['p50']:.2f}s, p95 {latency['p95']:.2f}s, max {latency['max']:.2f}s"
+                   if latency else "no tweets stored yet")
+        logging.info(f"Stream: {stats['published']} published, {stats['stored']} stored, {stats['inbox']} waiting "
+                     f"to be scored; scrape-to-store latency {summary}")
+
+    def _run(self, loop):
+        try:
+            loop()
+        except Exception as e:
+            logging.error(f"Streaming ingestion stopped: {str(e)}")
+            metrics.inc("errors", kind="stream")
+            self.error = e
+            self.failed.set()
+
+    def _next_batch(self):
+        """Wait for one tweet, then for up to max_wait more seconds to fill the batch; None once drained"""
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size and not self.failed.is_set():
+            timeout = 0.2 if deadline is None else deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.inbox.get(timeout=min(timeout, 0.2)))
+            except queue.Empty:
+                if not batch and self.producer_done.is_set() and self.inbox.qsize() == 0:
+                    return None
+                continue
+            if deadline is None:
+                deadline = time.monotonic() + self.max_wait
+        return batch or None
+
+    def _score_loop(self):
+        if self.make_scorer is None:
+            self._score_batches()
+            return
+        self.scorer = self.make_scorer()
+        try:
+            self._score_batches()
+        finally:
+            self.scorer.close()
+
+    def _score_batches(self):
+        while not self.failed.is_set():
+            batch = self._next_batch()
+            if batch is None:
+                break
+            with metrics.timer("stream_score_batch"):
+                scored = self.scorer.score([tweet.get("text") for tweet in batch])
+            scored_at = time.time()
+            for tweet, (label, score) in zip(batch, scored):
+                tweet["sentiment"], tweet["sentiment_score"] = label, score
+                metrics.observe("stream_latency", scored_at - tweet["scraped_at"], stage="scored")
+            self._hand_over(batch)
+        self._hand_over(_DONE)
+
+    def _hand_over(self, item):
+        while not self.failed.is_set():
+            try:
+                self.scored.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _write_loop(self):
+        pending = []
+        flush_at = None
+        while not self.failed.is_set():
+            timeout = 0.5 if flush_at is None else max(0, flush_at - time.monotonic())
+            try:
+                item = self.scored.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _DONE:
+                self._flush(pending)
+                return
+            if item is not None:
+                pending.extend(item)
+                flush_at = flush_at or time.monotonic() + self.flush_interval
+            if pending and (len(pending) >= self.write_batch or time.monotonic() >= flush_at):
+                self._flush(pending)
+                pending, flush_at = [], None
+            if time.monotonic() - self.last_report >= self.report_interval:
+                self.report()
+                self.last_report = time.monotonic()
+
+    def _flush(self, tweets):
+        if not tweets:
+            return
+        for attempt in range(self.max_retries + 1):
+            try:
+                with metrics.timer("stream_write_batch"):
+                    self.sink.write(tweets)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logging.warning(f"Storing {len(tweets)} tweets failed ({str(e)}); retrying in {delay:.0f}s")
+                metrics.inc("errors", kind="stream_write")
+                time.sleep(delay)
+
+        stored_at = time.time()
+        for tweet in tweets:
+            latency = stored_at - tweet["scraped_at"]
+            metrics.observe("stream_latency", latency, stage="stored")
+            self.latency.add(latency)
+        metrics.inc("stream_stored", len(tweets))
+        self.stored += len(tweets)
+        if "_offset" in tweets[-1]:
+            self.inbox.commit(tweets[-1]["_offset"])
+
+
+def iter_source_tweets(path):
+    """Read tweet records from a scraped CSV or a checkpoint journal"""
+    if path.endswith(".csv"):
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                row["image_urls"] = [url for url in (row.get("image_urls") or "").split("|") if url]
+                yield row
+        return
+    from checkpoint_journal import CheckpointJournal
+    journal = CheckpointJournal(path)
+    try:
+        yield from journal.iter_records()
+    finally:
+        journal.close()
+
+
+class CachedScorer:
+    """A SentimentScorer that owns its model cache and closes both together."""
+
+    def __init__(self, args):
+        from model_cache import ModelCache
+        from sentiment_analysis import SentimentScorer
+        self.cache = None if args.no_cache else ModelCache()
+        self.scorer = SentimentScorer(args.model, args.batch_size, cache=self.cache, backend=args.backend)
+
+    def score(self, texts):
+        return self.scorer.score(texts)
+
+    def close(self):
+        self.scorer.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    scrape = subparsers.add_parser("scrape", help="Scrape one account and stream its tweets into the store")
+    scrape.add_argument("account", help="Account name or slug")
+    scrape.add_argument("--start-date", default="2024-08-01")
+    scrape.add_argument("--end-date", default="2024-10-24")
+    scrape.add_argument("--show-browser", action="store_true", help="Run Chrome with a visible window")
+    scrape.add_argument("--capture-mode", choices=["dom", "network"], default="dom")
+    replay = subparsers.add_parser("replay", help="Stream tweets from a scraped CSV or checkpoint journal")
+    replay.add_argument("source", help="Scraped tweets CSV or checkpoint journal (.jsonl)")
+    replay.add_argument("--rate", type=float, default=0, help="Tweets published per second (0: as fast as possible)")
+    replay.add_argument("--account", help="Dashboard account to store the tweets under")
+    for command in (scrape, replay):
+        command.add_argument("--spool", help="Queue tweets in this file instead of in memory, to survive a restart")
+        command.add_argument("--model", default=None, help="Sentiment model id (default: sentiment_analysis.MODEL_ID)")
+        command.add_argument("--backend", choices=["pytorch", "onnx"], default="pytorch")
+        command.add_argument("--no-cache", action="store_true", help="Score every tweet without the output cache")
+        command.add_argument("--queue-size", type=int, default=1000, help="Tweets waiting for the model at most")
+        command.add_argument("--batch-size", type=int, default=64, help="Tweets per scoring micro-batch")
+        command.add_argument("--max-wait", type=float, default=1.0, help="Seconds a scoring batch waits to fill")
+        command.add_argument("--write-batch", type=int, default=500, help="Tweets per database transaction")
+        command.add_argument("--flush-interval", type=float, default=2.0, help="Seconds a write batch waits to fill")
+        command.add_argument("--sink", choices=["postgres", "jsonl"], default="postgres")
+        command.add_argument("--sink-path", default="stream_output.jsonl", help="Output file for --sink jsonl")
+        command.add_argument("--metrics-file", help="Write timings and counters here (.prom or JSON)")
+        command.add_argument("--log-level", choices=LOG_LEVELS, default="INFO")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(args.log_level)
+    if args.model is None:
+        from sentiment_analysis import MODEL_ID
+        args.model = MODEL_ID
+
+    sink = PostgresSink() if args.sink == "postgres" else JsonlSink(args.sink_path)
+    inbox = FileQueue(args.spool, args.queue_size) if args.spool else None
+    # Built on the scoring thread, which is the only one to use its SQLite cache
+    stream = StreamIngest(None, sink, args.queue_size, args.batch_size, args.max_wait, args.write_batch,
+                          args.flush_interval, inbox, make_scorer=lambda: CachedScorer(args)).start()
+    failure = None
+    try:
+        if args.command == "replay":
+            interval = 1 / args.rate if args.rate > 0 else 0
+            position = ReplayPosition(args.spool, args.source) if args.spool else None
+            if position is not None and position.published:
+                logging.info(f"Resuming {args.source} after the {position.published} tweets already in the spool")
+            for tweet in itertools.islice(iter_source_tweets(args.source), position.published if position else 0, None):
+                stream.publish(dict(tweet, account=args.account) if args.account else tweet)
+                if position is not None:
+                    position.advance()
+                if interval:
+                    time.sleep(interval)
+        else:
+            from scrap_tweets import TwitterScraper
+            from scrape_scheduler import build_jobs
+            job = build_jobs([args.account], {"start_date": args.start_date, "end_date": args.end_date})[0]
+            scraper = TwitterScraper(
+                account_url=job['account_url'], company_handle=job['handle'], start_date=job['start_date'],
+                end_date=job['end_date'], checkpoint_file=job['checkpoint_file'], headless=not args.show_browser,
+                login_wait=0, chrome_profile_dir=job['chrome_profile_dir'], cookies_file=job['cookies_file'],
+                capture_mode=args.capture_mode,
+                on_tweet=lambda tweet: stream.publish(dict(tweet, account=job['account']))
+            )
+            try:
+                scraper.collect_tweets()
+                scraper.save_tweets_to_csv(job['output_file'], job['output_dir'])
+            finally:
+                scraper.cleanup()
+    except BaseException as e:
+        failure = e
+        raise
+    finally:
+        try:
+            stats = stream.close()
+        except Exception:
+            if failure is None:
+                raise
+            # Report the run's own error; the stream's was logged when it stopped
+            logging.error("Streaming ingestion also failed while shutting down", exc_info=True)
+        finally:
+            sink.close()
+            if inbox is not None:
+                inbox.close()
+            metrics.log_summary()
+            if args.metrics_file:
+                metrics.write(args.metrics_file, labels={"job": "stream_ingest"})
+    print(f"Stored {stats['stored']} of {stats['published']} published tweets")
+
+
+if __name__ == "__main__":
+    main()
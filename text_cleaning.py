@@ -0,0 +1,165 @@
+"""Cleaning stage for scraped timeline CSVs, ported from Data_cleaning.ipynb.
+
+    python text_cleaning.py                    # clean every account's raw tweets
+    python text_cleaning.py Fibe --workers 4   # clean one account on four cores
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from config.accounts import resolve_accounts
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Company and bank accounts whose tweets are not customer feedback
+AUTHOR_HANDLES_TO_REMOVE = ['@HDFCBank_Cares', '@ClerkDev', '@kreditbee', '@RBI', '@KotakCares', '@HomeCredit_In',
+                            '@Zoho', '@premium']
+DEDUP_COLUMNS = ['author_name', 'text']
+DROP_COLUMNS = ['reply_to', 'reply_to_id', 'conversation_id']
+
+TAGS_PATTERN = r'@\w+|#\w+'
+EMOJI_PATTERN = (
+    "["
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs
+    "\U0001F680-\U0001F6FF"  # transport & map symbols
+    "\U0001F700-\U0001F77F"  # alchemical symbols
+    "\U0001F780-\U0001F7FF"  # Geometric Shapes Extended
+    "\U0001F800-\U0001F8FF"  # Supplemental Arrows-C
+    "\U0001F900-\U0001F9FF"  # Supplemental Symbols and Pictographs
+    "\U0001FA00-\U0001FA6F"  # Chess Symbols
+    "\U0001FA70-\U0001FAFF"  # Symbols and Pictographs Extended-A
+    "\U00002702-\U000027B0"  # Dingbats
+    "\U000024C2-\U0001F251"
+    "]+"
+)
+# Tags are tried before emojis at each position, which gives the same result as the
+# notebook's separate tag and emoji passes in one scan of the text
+CLEAN_TEXT_PATTERN = re.compile(f"{TAGS_PATTERN}|{EMOJI_PATTERN}")
+
+STEPS = ['filter_handles', 'strip', 'year_month', 'remove_tags_emojis', 'lowercase', 'dedupe', 'write']
+
+
+def clean_chunk(df):
+    """Apply the row-level cleaning steps to one chunk of raw tweets.
+
+    Returns the cleaned chunk, a hash of each row's (author_name, stripped text) for
+    de-duplication across chunks, and the seconds spent in each step.
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    df = df[~df['author_handle'].isin(AUTHOR_HANDLES_TO_REMOVE)].convert_dtypes()
+    timings['filter_handles'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for column in df.select_dtypes(include=['object', 'string']):
+        df[column] = df[column].str.strip()
+    # Duplicates are judged on the stripped text, before tags and emojis are removed
+    keys = pd.util.hash_pandas_object(df[DEDUP_COLUMNS], index=False)
+    timings['strip'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    # Written as 2024-10-24 09:51:35+00:00, as the notebook's to_datetime column is
+    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True, format='mixed')
+    df['year_month'] = df['timestamp'].dt.strftime('%Y-%m')
+    timings['year_month'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    df['text'] = df['text'].str.replace(CLEAN_TEXT_PATTERN, '', regex=True)
+    timings['remove_tags_emojis'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    df['text'] = df['text'].str.lower()
+    timings['lowercase'] = time.perf_counter() - started
+
+    return df.drop(columns=DROP_COLUMNS, errors='ignore'), keys, timings
+
+
+def _cleaned_chunks(reader, executor, window):
+    """Yield (raw rows, clean_chunk result) in input order with at most window chunks in flight."""
+    pending = deque()
+    for chunk in reader:
+        if executor is None:
+            yield len(chunk), clean_chunk(chunk)
+            continue
+        pending.append((len(chunk), executor.submit(clean_chunk, chunk)))
+        if len(pending) >= window:
+            rows, future = pending.popleft()
+            yield rows, future.result()
+    while pending:
+        rows, future = pending.popleft()
+        yield rows, future.result()
+
+
+def clean_file(input_path, output_path, chunk_size=50000, executor=None, window=4):
+    """Clean a raw tweets CSV chunk by chunk and write the result, returning per-step statistics.
+
+    Memory is bounded by chunk_size times the number of chunks in flight, plus an 8-byte
+    hash per distinct (author_name, text) pair kept for de-duplication.
+    """
+    seen = set()
+    totals = dict.fromkeys(STEPS, 0.0)
+    rows_in = rows_out = 0
+    started = time.perf_counter()
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    tmp_path = output_path + '.tmp'
+    with pd.read_csv(input_path, chunksize=chunk_size) as reader:
+        for rows, (chunk, keys, timings) in _cleaned_chunks(reader, executor, window):
+            for step, seconds in timings.items():
+                totals[step] += seconds
+
+            step_started = time.perf_counter()
+            keep = ~keys.duplicated() & ~keys.isin(seen)
+            seen.update(keys[keep])
+            chunk = chunk[keep.to_numpy()]
+            totals['dedupe'] += time.perf_counter() - step_started
+
+            step_started = time.perf_counter()
+            chunk.to_csv(tmp_path, mode='w' if rows_in == 0 else 'a', header=rows_in == 0, index=False)
+            totals['write'] += time.perf_counter() - step_started
+
+            rows_in += rows
+            rows_out += len(chunk)
+    os.replace(tmp_path, output_path)
+
+    elapsed = time.perf_counter() - started
+    for step in STEPS:
+        rate = rows_in / totals[step] if totals[step] > 0 else float('inf')
+        logging.info(f"{step:>18}: {totals[step]:.3f}s ({rate:,.0f} rows/sec)")
+    logging.info(f"Cleaned {input_path} -> {output_path}: {rows_in} rows in, {rows_out} rows out, "
+                 f"{elapsed:.2f}s ({rows_in / elapsed if elapsed > 0 else 0:,.0f} rows/sec)")
+    return {'rows_in': rows_in, 'rows_out': rows_out, 'seconds': elapsed, 'steps': totals}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean raw scraped tweets for the language and topic stages.")
+    parser.add_argument("accounts", nargs="*", help="Account names or slugs (default: all)")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Rows read and cleaned at a time")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes cleaning chunks")
+    args = parser.parse_args()
+
+    executor = None
+    if args.workers > 1:
+        executor = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        for account, config in resolve_accounts(args.accounts):
+            if not os.path.exists(config['raw']):
+                logging.warning(f"Skipping {account}: {config['raw']} not found")
+                continue
+            clean_file(config['raw'], config['cleaned'], args.chunk_size, executor, window=2 * args.workers)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""Index of support threads: which tweets belong together, who posted them and when.
+
+    python thread_index.py add-cases                                  # conversations/*.json
+    python thread_index.py add-recording recordings/FibeIndia --company-handle FibeIndia
+    python thread_index.py report                                     # response times per account
+    python thread_index.py thread 1846172998388130244                 # the thread a tweet belongs to
+
+A thread links a customer's tweets, the company's replies and the customer's follow-ups.
+Tweets captured from the timeline API are linked by conversation_id and reply target;
+the messages of a scraped case by the case they were found in. Each tweet is stored once
+as a few integers keyed by its tweet ID (SQLite's rowid), so finding a tweet's thread is a
+single key lookup and the whole index can be read into memory for the response-time
+metrics. Files already indexed are skipped, so re-running an add command only reads new
+recordings and changed case files.
+
+Case messages carry no tweet IDs other than the case's own. They are given one built from
+their timestamp and author, which stays the same when a message appears in several cases.
+"""
+import argparse
+import glob
+import logging
+import os
+import sqlite3
+import zlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import metrics
+from tweet_extractors import tweet_created_at, tweet_id_at
+
+INDEX_PATH = "final_tweets/threads.sqlite"
+
+CUSTOMER, COMPANY = 0, 1
+ROLES = {"customer_tweet": CUSTOMER, "company_response": COMPANY}
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    account INTEGER PRIMARY KEY,
+    handle TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS tweets (
+    tweet_id INTEGER PRIMARY KEY,
+    thread_id INTEGER NOT NULL,
+    parent_id INTEGER,
+    account INTEGER NOT NULL,
+    role INTEGER NOT NULL,
+    created INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tweets_thread ON tweets (thread_id, created);
+
+-- Files already indexed, so unchanged ones are not read again
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+"""
+
+
+def connect(path=INDEX_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def message_id(timestamp, author_handle):
+    """A stable tweet ID for a case message: its creation time, with the author in the low bits"""
+    return tweet_id_at(timestamp) | (zlib.crc32(author_handle.encode("utf-8")) & 0x3FFFFF)
+
+
+def _epoch(timestamp):
+    return int(datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp())
+
+
+def account_code(conn, handle):
+    handle = handle.lstrip("@").lower()
+    conn.execute("INSERT OR IGNORE INTO accounts (handle) VALUES (?)", (handle,))
+    return conn.execute("SELECT account FROM accounts WHERE handle = ?", (handle,)).fetchone()[0]
+
+
+def thread_of(conn, tweet_id):
+    """Return the thread a tweet belongs to, or None if it was never indexed"""
+    row = conn.execute("SELECT thread_id FROM tweets WHERE tweet_id = ?", (int(tweet_id),)).fetchone()
+    return row[0] if row else None
+
+
+def merge_threads(conn, target, others):
+    """Move every tweet of the other threads into target"""
+    conn.executemany("UPDATE tweets SET thread_id = ? WHERE thread_id = ?",
+                     [(target, other) for other in set(others) if other != target])
+
+
+def add_tweets(conn, rows):
+    """Insert (tweet_id, thread_id, parent_id, account, role, created) rows, each into the given thread
+    unless it was indexed already.
+
+    A thread is named after its root tweet. Tweets that named a thread after one of these
+    tweets before its own thread was known are moved into that thread.
+    """
+    before = conn.total_changes
+    conn.executemany("INSERT OR IGNORE INTO tweets VALUES (?, ?, ?, ?, ?, ?)", rows)
+    added = conn.total_changes - before
+    # Threads that were named after a tweet now known to sit further down another thread
+    moved = [(row[1], row[0]) for row in rows if row[1] != row[0]]
+    if moved:
+        conn.executemany("UPDATE tweets SET thread_id = ? WHERE thread_id = ?", moved)
+    metrics.inc("thread_index_tweets", added)
+    return added
+
+
+def add_records(conn, records, company_handle):
+    """Index tweet records parsed from timeline API responses (timeline_responses.tweet_record)"""
+    account = account_code(conn, company_handle)
+    company = f"@{company_handle.lstrip('@')}".lower()
+    rows = []
+    for record in records:
+        tweet_id = int(record["tweet_id"])
+        parent_id = int(record["reply_to_id"]) if record.get("reply_to_id") else None
+        thread_id = int(record["conversation_id"]) if record.get("conversation_id") else None
+        if thread_id is None:
+            # Without a conversation_id, join the parent's thread or start one at the parent
+            thread_id = (thread_of(conn, parent_id) or parent_id) if parent_id else tweet_id
+        role = COMPANY if (record.get("author_handle") or "").lower() == company else CUSTOMER
+        created = _epoch(record["timestamp"]) if record.get("timestamp") else int(tweet_created_at(tweet_id).timestamp())
+        rows.append((tweet_id, thread_id, parent_id, account, role, created))
+    return add_tweets(conn, rows)
+
+
+def add_case(conn, case, company_handle=None):
+    """Index one scraped case: a tweet and the conversation shown around it, as one thread"""
+    messages = []
+    for message in case.get("conversation", []):
+        # Promoted tweets in the page carry no timestamp
+        if not message.get("timestamp") or message.get("type") not in ROLES:
+            continue
+        created = datetime.fromisoformat(message["timestamp"].replace("Z", "+00:00"))
+        messages.append((created, message))
+    if not messages:
+        return 0
+    handles = [message["author_handle"] for _, message in messages if message["type"] == "company_response"]
+    handle = handles[0] if handles else company_handle
+    if not handle:
+        return 0
+    account = account_code(conn, handle)
+
+    root_id = int(case["tweet_id"])
+    ids = []
+    for position, (created, message) in enumerate(messages):
+        # The first message is the case's own tweet
+        if position == 0 and message["author_handle"] == case.get("author_handle"):
+            ids.append(root_id)
+        else:
+            ids.append(message_id(created, message["author_handle"]))
+
+    # Join any thread these messages were already indexed in
+    placeholders = ",".join("?" * len(ids))
+    known = [row[0] for row in conn.execute(
+        f"SELECT DISTINCT thread_id FROM tweets WHERE tweet_id IN ({placeholders})", ids)]
+    root_thread = thread_of(conn, root_id)
+    thread_id = root_thread or (min(known) if known else root_id)
+    merge_threads(conn, thread_id, known)
+
+    rows = []
+    parent_id = None
+    for tweet_id, (created, message) in sorted(zip(ids, messages), key=lambda pair: pair[1][0]):
+        rows.append((tweet_id, thread_id, parent_id, account, ROLES[message["type"]], int(created.timestamp())))
+        parent_id = tweet_id
+    return add_tweets(conn, rows)
+
+
+def _unchanged(conn, path):
+    stat = os.stat(path)
+    row = conn.execute("SELECT size, mtime FROM sources WHERE path = ?", (path,)).fetchone()
+    return row == (stat.st_size, stat.st_mtime)
+
+
+def _mark_indexed(conn, path):
+    stat = os.stat(path)
+    conn.execute("INSERT OR REPLACE INTO sources (path, size, mtime) VALUES (?, ?, ?)",
+                 (path, stat.st_size, stat.st_mtime))
+
+
+def add_case_file(conn, path, company_handle=None):
+    """Index every case in a conversations JSON file, unless the file is unchanged since it was indexed"""
+    if _unchanged(conn, path):
+        logging.info(f"Skipping {path}: already indexed")
+        return 0
+    from db_operations.insert_inbound import iter_json_array
+    added = 0
+    with conn:
+        for case, _ in iter_json_array(path):
+            added += add_case(conn, case, company_handle)
+        _mark_indexed(conn, path)
+    logging.info(f"Indexed {added} new tweets from {path}")
+    return added
+
+
+def add_recording(conn, record_dir, company_handle):
+    """Index the responses recorded by the scraper in record_dir that were not indexed yet"""
+    from timeline_responses import parse_response
+    added = 0
+    for path in sorted(glob.glob(os.path.join(record_dir, "*.json"))):
+        if _unchanged(conn, path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            records = parse_response(f.read())
+        with conn:
+            added += add_records(conn, records, company_handle)
+            _mark_indexed(conn, path)
+    logging.info(f"Indexed {added} new tweets from {record_dir}")
+    return added
+
+
+def read_index(conn):
+    """Every indexed tweet as columns, sorted by thread and time"""
+    # Sorting and naming accounts in pandas is faster than ORDER BY and a join for the whole table
+    df = pd.DataFrame(conn.execute("SELECT thread_id, account, role, created FROM tweets").fetchall(),
+                      columns=['thread_id', 'account', 'role', 'created'])
+    df = df.astype({'thread_id': 'int64', 'role': 'int8', 'created': 'int64'})
+    df = df.sort_values(['thread_id', 'created', 'role'], kind='stable', ignore_index=True)
+    df['account'] = df['account'].map(dict(conn.execute("SELECT account, handle FROM accounts").fetchall()))
+    return df
+
+
+def thread_times(df):
+    """Per-thread response times, in seconds, computed over every thread at once.
+
+    A thread opens with its first customer tweet. first_response is the time to the
+    company's first reply after it. A thread counts as resolved when the company had the
+    last word, with resolution the time from opening to that last reply; a customer
+    follow-up after the company's last reply leaves it open. Threads without a customer
+    tweet are left out.
+    """
+    customer = df['role'].to_numpy() == CUSTOMER
+    opened = df['created'].where(customer).groupby(df['thread_id']).min()
+    opened = opened.dropna()
+    rows = df[df['thread_id'].isin(opened.index)]
+    row_opened = rows['thread_id'].map(opened)
+
+    is_reply = (rows['role'] == COMPANY) & (rows['created'] >= row_opened)
+    first_reply = rows['created'].where(is_reply).groupby(rows['thread_id']).min()
+    # Rows are sorted by thread and time, so the last row of each thread is its last message
+    last = rows.groupby('thread_id').tail(1).set_index('thread_id')
+
+    threads = pd.DataFrame({
+        'account': last['account'],
+        'opened': opened,
+        'messages': rows.groupby('thread_id').size(),
+    })
+    threads['first_response'] = first_reply - opened
+    resolved = (last['role'] == COMPANY) & (last['created'] >= opened)
+    threads['resolution'] = (last['created'] - opened).where(resolved)
+    return threads
+
+
+def response_summary(threads):
+    """Per-account thread counts, response and resolution rates, and median and 90th percentile times in hours"""
+    hours = threads.assign(first_response=threads['first_response'] / 3600, resolution=threads['resolution'] / 3600)
+    grouped = hours.groupby('account')
+    summary = pd.DataFrame({
+        'threads': grouped.size(),
+        'response_rate': grouped['first_response'].count() / grouped.size(),
+        'median_first_response_hours': grouped['first_response'].median(),
+        'p90_first_response_hours': grouped['first_response'].quantile(0.9),
+        'resolution_rate': grouped['resolution'].count() / grouped.size(),
+        'median_resolution_hours': grouped['resolution'].median(),
+    })
+    return summary.reset_index()
+
+
+def thread_tweets(conn, tweet_id):
+    """The tweets in the same thread as tweet_id, oldest first"""
+    thread_id = thread_of(conn, tweet_id)
+    if thread_id is None:
+        return pd.DataFrame(columns=['tweet_id', 'parent_id', 'account', 'role', 'created'])
+    df = pd.read_sql_query("""
+        SELECT t.tweet_id, t.parent_id, a.handle AS account, t.role, t.created
+        FROM tweets t JOIN accounts a ON a.account = t.account
+        WHERE t.thread_id = ?
+        ORDER BY t.created
+    """, conn, params=(thread_id,))
+    df['parent_id'] = df['parent_id'].astype('Int64')
+    df['role'] = np.where(df['role'] == COMPANY, 'company', 'customer')
+    df['created'] = pd.to_datetime(df['created'], unit='s', utc=True)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", default=INDEX_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    cases = subparsers.add_parser("add-cases", help="Index scraped conversation files")
+    cases.add_argument("files", nargs="*", help="Conversation JSON files (default: conversations/*.json)")
+    cases.add_argument("--company-handle", help="Company for cases without a company reply")
+    recording = subparsers.add_parser("add-recording", help="Index timeline responses recorded by the scraper")
+    recording.add_argument("record_dir")
+    recording.add_argument("--company-handle", required=True, help="The account whose timeline was recorded")
+    subparsers.add_parser("report", help="Print response times per account")
+    thread = subparsers.add_parser("thread", help="Print the thread a tweet belongs to")
+    thread.add_argument("tweet_id")
+    args = parser.parse_args()
+
+    conn = connect(args.index)
+    try:
+        if args.command == "add-cases":
+            for path in args.files or sorted(glob.glob("conversations/*.json")):
+                add_case_file(conn, path, args.company_handle)
+        elif args.command == "add-recording":
+            add_recording(conn, args.record_dir, args.company_handle)
+        elif args.command == "report":
+            with pd.option_context('display.width', 200, 'display.max_columns', None):
+                print(response_summary(thread_times(read_index(conn))))
+        else:
+            print(thread_tweets(conn, args.tweet_id))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Parse X's timeline API responses into tweet records, live from Chrome or replayed from recorded files.
+
+The timeline reaches the browser as GraphQL JSON before it is rendered. Read from there, a
+tweet comes with exact engagement counts, its conversation_id and the id of the tweet it replies to,
+none of which depend on the page's CSS class names.
+
+    python timeline_responses.py replay recordings/FibeIndia --output tweets/fibe_replayed.csv
+    python timeline_responses.py replay recordings/FibeIndia --repeat 20     # parsing throughput only
+
+Recordings are written by the scraper with capture_mode="network" and a record_dir, one
+response body per file, named in the order they arrived.
+"""
+import argparse
+import base64
+import csv
+import glob
+import html
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime
+
+from instrumentation import metrics
+from tweet_extractors import empty_tweet_data, tweet_id_range
+
+# GraphQL operations whose responses hold timeline tweets
+TIMELINE_OPERATIONS = ("UserTweets", "UserTweetsAndReplies", "UserMedia", "TweetDetail", "SearchTimeline")
+OPERATION_PATTERN = re.compile(r'/i/api/graphql/[^/]+/(\w+)')
+CREATED_AT_FORMAT = "%a %b %d %H:%M:%S %z %Y"  # "Thu Oct 24 09:51:35 +0000 2024"
+
+CSV_FIELDNAMES = [
+    "tweet_id", "tweet_link", "author_name", "author_handle",
+    "text", "timestamp", "likes", "retweets", "replies",
+    "image_urls", "is_reply", "reply_to", "reply_to_id", "conversation_id"
+]
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def operation_name(url):
+    """Return the GraphQL operation a request URL calls, such as 'UserTweetsAndReplies'"""
+    match = OPERATION_PATTERN.search(url)
+    return match.group(1) if match else None
+
+
+def iter_tweet_results(payload):
+    """Yield every timeline tweet result in a response, in the order the timeline shows them.
+
+    Timeline entries, conversation modules and thread replies all wrap their tweets in a
+    tweet_results object, so the payload is walked generically rather than by instruction
+    type. Promoted entries are skipped, as the scraper skips ads in the page.
+    """
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if "tweet_results" in node:
+                if "promotedMetadata" not in node:
+                    result = node["tweet_results"].get("result")
+                    if result:
+                        yield result
+                continue
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+
+def _unwrap(result):
+    """Return the Tweet object behind a result, or None for tombstones and withheld tweets"""
+    if result.get("__typename") == "TweetWithVisibilityResults":
+        result = result.get("tweet") or {}
+    if result.get("__typename", "Tweet") != "Tweet" or "legacy" not in result:
+        return None
+    # A retweet shows the original tweet, as its article does in the page
+    retweeted = result["legacy"].get("retweeted_status_result", {}).get("result")
+    return _unwrap(retweeted) if retweeted else result
+
+
+def _user(result):
+    user = result.get("core", {}).get("user_results", {}).get("result", {})
+    # Newer responses move the name and handle from legacy to core
+    core = user.get("core") or {}
+    legacy = user.get("legacy") or {}
+    return core.get("name") or legacy.get("name"), core.get("screen_name") or legacy.get("screen_name")
+
+
+def _display_text(legacy, note):
+    """The tweet text as the page shows it, without leading reply mentions and trailing media links"""
+    if note:
+        text, urls = note.get("text", ""), note.get("entity_set", {}).get("urls", [])
+    else:
+        text, urls = legacy.get("full_text", ""), legacy.get("entities", {}).get("urls", [])
+        display_range = legacy.get("display_text_range")
+        if display_range:
+            text = text[display_range[0]:display_range[1]]
+    for url in urls:
+        if url.get("url") and url.get("display_url"):
+            text = text.replace(url["url"], url["display_url"])
+    return html.unescape(text).strip()
+
+
+def format_created_at(created_at):
+    """Convert the API's created_at to the ISO form of the page's <time datetime> attribute"""
+    return datetime.strptime(created_at, CREATED_AT_FORMAT).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def tweet_record(result):
+    """Convert one tweet result to the scraper's tweet record, or None if it holds no tweet"""
+    tweet = _unwrap(result)
+    if tweet is None:
+        return None
+    legacy = tweet["legacy"]
+    tweet_id = tweet.get("rest_id") or legacy.get("id_str")
+    author_name, screen_name = _user(tweet)
+    note = tweet.get("note_tweet", {}).get("note_tweet_results", {}).get("result")
+
+    tweet_data = empty_tweet_data()
+    tweet_data["tweet_id"] = tweet_id
+    tweet_data["tweet_link"] = f"https://x.com/{screen_name}/status/{tweet_id}"
+    tweet_data["author_name"] = author_name
+    tweet_data["author_handle"] = f"@{screen_name}" if screen_name else None
+    tweet_data["text"] = _display_text(legacy, note)
+    tweet_data["timestamp"] = format_created_at(legacy["created_at"]) if legacy.get("created_at") else None
+    tweet_data["likes"] = legacy.get("favorite_count", 0)
+    tweet_data["retweets"] = legacy.get("retweet_count", 0)
+    tweet_data["replies"] = legacy.get("reply_count", 0)
+    media = legacy.get("extended_entities", {}).get("media", [])
+    tweet_data["image_urls"] = [item["media_url_https"] for item in media
+                                if item.get("type") == "photo" and item.get("media_url_https")]
+    if legacy.get("in_reply_to_status_id_str"):
+        tweet_data["is_reply"] = True
+        tweet_data["reply_to_id"] = legacy["in_reply_to_status_id_str"]
+        if legacy.get("in_reply_to_screen_name"):
+            tweet_data["reply_to"] = f"@{legacy['in_reply_to_screen_name']}"
+    tweet_data["conversation_id"] = legacy.get("conversation_id_str")
+    return tweet_data
+
+
+def parse_response(body):
+    """Return the tweet records in one response body (str, bytes or already decoded JSON)"""
+    payload = json.loads(body) if isinstance(body, (str, bytes)) else body
+    records = []
+    for result in iter_tweet_results(payload):
+        try:
+            record = tweet_record(result)
+        except Exception as e:
+            logging.error(f"Error parsing tweet result: {str(e)}")
+            metrics.inc("errors", kind="response_parse")
+            continue
+        if record is not None:
+            records.append(record)
+    return records
+
+
+class ResponseCapture:
+    """Collect timeline API responses from Chrome's performance log.
+
+    The driver must be started with the goog:loggingPrefs performance capability. Each
+    drain() reads the log entries logged since the previous call and fetches the bodies of
+    timeline responses that have finished loading; the rest are picked up on a later call.
+    """
+
+    def __init__(self, driver, record_dir=None, operations=TIMELINE_OPERATIONS):
+        self.driver = driver
+        self.record_dir = record_dir
+        self.operations = set(operations)
+        self.pending = {}  # requestId -> operation, for responses still loading
+        self.recorded = 0
+        if record_dir:
+            os.makedirs(record_dir, exist_ok=True)
+            # Continue the numbering of an earlier recording instead of overwriting it
+            self.recorded = len(glob.glob(os.path.join(record_dir, "*.json")))
+
+    def drain(self):
+        """Return the (operation, body) pairs of timeline responses completed since the last call"""
+        responses = []
+        for entry in self.driver.get_log("performance"):
+            raw = entry["message"]
+            # Most entries are unrelated network events; skip them before decoding
+            if "Network.responseReceived" not in raw and "Network.loadingF" not in raw:
+                continue
+            message = json.loads(raw)["message"]
+            method, params = message.get("method"), message.get("params", {})
+            if method == "Network.responseReceived":
+                operation = operation_name(params.get("response", {}).get("url", ""))
+                if operation in self.operations:
+                    self.pending[params["requestId"]] = operation
+            elif method == "Network.loadingFinished" and params.get("requestId") in self.pending:
+                operation = self.pending.pop(params["requestId"])
+                body = self.response_body(params["requestId"])
+                if body is not None:
+                    self.record(operation, body)
+                    responses.append((operation, body))
+            elif method == "Network.loadingFailed":
+                self.pending.pop(params.get("requestId"), None)
+        return responses
+
+    def response_body(self, request_id):
+        try:
+            response = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        except Exception as e:
+            # Chrome evicts bodies from its buffer under memory pressure
+            logging.warning(f"Could not read response body {request_id}: {str(e)}")
+            metrics.inc("errors", kind="response_body")
+            return None
+        body = response.get("body", "")
+        return base64.b64decode(body).decode("utf-8") if response.get("base64Encoded") else body
+
+    def record(self, operation, body):
+        if not self.record_dir:
+            return
+        path = os.path.join(self.record_dir, f"{self.recorded:06d}_{operation}.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(path + ".tmp", path)
+        self.recorded += 1
+
+
+def iter_recordings(record_dir):
+    """Yield (operation, body) for each recorded response in the order it arrived"""
+    for path in sorted(glob.glob(os.path.join(record_dir, "*.json"))):
+        operation = os.path.splitext(os.path.basename(path))[0].split("_", 1)[-1]
+        with open(path, "r", encoding="utf-8") as f:
+            yield operation, f.read()
+
+
+def filter_records(records, start_date=None, end_date=None, company_handle=None):
+    """Keep each tweet once, inside the date window and not posted by the company, as the scraper does"""
+    low, high = tweet_id_range(start_date, end_date) if start_date and end_date else (0, float("inf"))
+    seen = set()
+    for record in records:
+        tweet_id = int(record["tweet_id"])
+        if tweet_id in seen or not low <= tweet_id < high:
+            continue
+        if company_handle and record["author_handle"] == f"@{company_handle}":
+            continue
+        seen.add(tweet_id)
+        yield record
+
+
+def write_csv(records, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    saved = 0
+    with open(path, mode='w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=CSV_FIELDNAMES)
+        writer.writeheader()
+        for record in records:
+            writer.writerow({**record, "image_urls": "|".join(record["image_urls"])})
+            saved += 1
+    return saved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    replay = subparsers.add_parser("replay", help="Parse recorded responses into tweet records")
+    replay.add_argument("record_dir", help="Directory of responses recorded by the scraper")
+    replay.add_argument("--output", help="Write the tweets to this CSV, in the scraper's schema")
+    replay.add_argument("--start-date", help="Keep tweets from this date (YYYY-MM-DD, needs --end-date)")
+    replay.add_argument("--end-date", help="Keep tweets up to and including this date")
+    replay.add_argument("--company-handle", help="Drop tweets posted by this handle")
+    replay.add_argument("--repeat", type=int, default=1, help="Parse the recording this many times and time it")
+    args = parser.parse_args()
+
+    responses = list(iter_recordings(args.record_dir))
+    if not responses:
+        raise SystemExit(f"No recorded responses in {args.record_dir}")
+    size_mb = sum(len(body) for _, body in responses) / 1e6
+
+    best = None
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        records = [record for _, body in responses for record in parse_response(body)]
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    logging.info(f"Parsed {len(records)} tweets from {len(responses)} responses ({size_mb:.1f} MB) in "
+                 f"{best * 1000:.1f} ms: {len(records) / best:,.0f} tweets/s, {size_mb / best:.1f} MB/s")
+
+    if args.output:
+        saved = write_csv(filter_records(records, args.start_date, args.end_date, args.company_handle), args.output)
+        logging.info(f"Saved {saved} tweets to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""LDA topic model over tweet text, trained in parallel and saved for labelling new tweets.
+
+    python topic_model.py train                 # train on every account's tweets
+    python topic_model.py update                # fold in months the model has not seen
+    python topic_model.py assign Fibe           # label one account's tweets with the saved model
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from gensim import corpora
+from gensim.models import LdaModel, LdaMulticore
+
+from config.accounts import resolve_accounts
+
+DEFAULT_MODEL_DIR = "models/topics"
+DEFAULT_OUTPUT_DIR = "cleaned_tweets/topics"
+
+URL_PATTERN = re.compile(r'http\S+|www\S+|https\S+', flags=re.MULTILINE)
+TAG_PATTERN = re.compile(r'@\w+|#\w+')
+NON_WORD_PATTERN = re.compile(r'\W|[\d_]')
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.getLogger('gensim').setLevel(logging.WARNING)
+
+
+@lru_cache(maxsize=None)
+def get_stopwords(language='english'):
+    """Load NLTK's stopword list once per process as a set, instead of once per token."""
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words(language))
+
+
+def preprocess_text(text):
+    """Lowercase, strip URLs, tags, digits and punctuation, and drop stopwords and words of two letters or fewer."""
+    text = URL_PATTERN.sub('', text.lower())
+    text = TAG_PATTERN.sub('', text)
+    # Only letters and spaces remain, so splitting on whitespace matches word_tokenize
+    words = NON_WORD_PATTERN.sub(' ', text).split()
+    stop_words = get_stopwords()
+    return [word for word in words if word not in stop_words and len(word) > 2]
+
+
+def _tokenize_chunk(texts):
+    return [preprocess_text(text) if isinstance(text, str) else [] for text in texts]
+
+
+def tokenize(texts, workers=1, chunk_size=2000):
+    """Tokenize texts with preprocess_text, split across worker processes when workers > 1."""
+    texts = list(texts)
+    if workers <= 1 or len(texts) <= chunk_size:
+        return _tokenize_chunk(texts)
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return [tokens for chunk in executor.map(_tokenize_chunk, chunks) for tokens in chunk]
+
+
+class TopicModel:
+    """A gensim dictionary and LDA model saved together with the months they were trained on."""
+
+    def __init__(self, dictionary, lda, months=()):
+        self.dictionary = dictionary
+        self.lda = lda
+        self.months = sorted(set(months))
+
+    @classmethod
+    def train(cls, token_lists, num_topics=5, passes=10, workers=1, months=(), no_below=5, no_above=0.5):
+        """Build the dictionary and train LDA, using LdaMulticore when more than one worker is given."""
+        dictionary = corpora.Dictionary(token_lists)
+        # Filter out rare and common words
+        dictionary.filter_extremes(no_below=no_below, no_above=no_above)
+        corpus = [dictionary.doc2bow(tokens) for tokens in token_lists]
+
+        started = time.perf_counter()
+        if workers > 1:
+            # LdaMulticore cannot learn an asymmetric alpha, so the prior stays symmetric
+            lda = LdaMulticore(corpus=corpus, id2word=dictionary, num_topics=num_topics, random_state=42,
+                               passes=passes, workers=workers)
+        else:
+            lda = LdaModel(corpus=corpus, id2word=dictionary, num_topics=num_topics, random_state=42,
+                           passes=passes, alpha='auto')
+        logging.info(f"Trained {num_topics} topics on {len(corpus)} tweets in {time.perf_counter() - started:.1f}s "
+                     f"({workers} worker(s), vocabulary {len(dictionary)})")
+        return cls(dictionary, lda, months)
+
+    def update(self, token_lists, months=(), passes=1):
+        """Fold new tweets into the model with online LDA, without retraining on the earlier months.
+
+        The vocabulary is fixed when the model is trained; words it has not seen are ignored.
+        """
+        corpus = [self.dictionary.doc2bow(tokens) for tokens in token_lists]
+        started = time.perf_counter()
+        if isinstance(self.lda, LdaMulticore):
+            # LdaMulticore.update makes a single pass and takes no passes argument
+            for _ in range(passes):
+                self.lda.update(corpus)
+        else:
+            self.lda.update(corpus, passes=passes)
+        self.months = sorted(set(self.months) | set(months))
+        logging.info(f"Updated topics with {len(corpus)} tweets in {time.perf_counter() - started:.1f}s")
+
+    def assign(self, token_lists, batch_size=2000):
+        """Return the most likely topic and its probability for each token list, inferred in batches."""
+        # Repeated tweets share one inference
+        unique = list(dict.fromkeys(tuple(tokens) for tokens in token_lists))
+        # Inference starts from random topic weights; reseeding gives the same input the same labels
+        self.lda.random_state = np.random.RandomState(42)
+        topics = np.empty(len(unique), dtype=np.int32)
+        scores = np.empty(len(unique), dtype=np.float32)
+        for start in range(0, len(unique), batch_size):
+            bows = [self.dictionary.doc2bow(tokens) for tokens in unique[start:start + batch_size]]
+            gamma, _ = self.lda.inference(bows)
+            distribution = gamma / gamma.sum(axis=1, keepdims=True)
+            topics[start:start + len(bows)] = distribution.argmax(axis=1)
+            scores[start:start + len(bows)] = distribution.max(axis=1)
+        positions = {tokens: i for i, tokens in enumerate(unique)}
+        order = np.array([positions[tuple(tokens)] for tokens in token_lists], dtype=np.int64)
+        return topics[order], scores[order]
+
+    def topic_labels(self, topn=4):
+        """Name each topic by its most probable words."""
+        return {
+            topic: ' '.join(word for word, _ in self.lda.show_topic(topic, topn=topn))
+            for topic in range(self.lda.num_topics)
+        }
+
+    def save(self, model_dir=DEFAULT_MODEL_DIR):
+        os.makedirs(model_dir, exist_ok=True)
+        self.dictionary.save(os.path.join(model_dir, "dictionary.gensim"))
+        self.lda.save(os.path.join(model_dir, "lda.gensim"))
+        with open(os.path.join(model_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"num_topics": self.lda.num_topics, "months": self.months}, f, indent=2)
+        logging.info(f"Saved topic model to {model_dir}")
+
+    @classmethod
+    def load(cls, model_dir=DEFAULT_MODEL_DIR):
+        dictionary = corpora.Dictionary.load(os.path.join(model_dir, "dictionary.gensim"))
+        lda = LdaModel.load(os.path.join(model_dir, "lda.gensim"))
+        lda.id2word = dictionary
+        with open(os.path.join(model_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(dictionary, lda, meta.get("months", []))
+
+
+def load_tweets(names=None):
+    """Read tweet_id, text and month for the selected accounts from their cleaned (or partial) CSVs."""
+    frames = []
+    for account, config in resolve_accounts(names):
+        path = config['cleaned'] if os.path.exists(config['cleaned']) else config['partial']
+        df = pd.read_csv(path, usecols=['tweet_id', 'text', 'timestamp'])
+        df['month'] = pd.to_datetime(df['timestamp'], utc=True, format='mixed').dt.strftime('%Y-%m')
+        frames.append(df.assign(account=account, slug=config['slug']))
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train, update and apply the LDA topic model.")
+    parser.add_argument("command", choices=["train", "update", "assign"])
+    parser.add_argument("accounts", nargs="*", help="Account names or slugs (default: all)")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Where assign writes topic labels")
+    parser.add_argument("--topics", type=int, default=5, help="Number of topics to train")
+    parser.add_argument("--passes", type=int, default=10, help="Passes over the corpus when training")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) - 1),
+                        help="Processes for tokenizing and training")
+    args = parser.parse_args()
+
+    tweets = load_tweets(args.accounts)
+
+    if args.command == "update":
+        model = TopicModel.load(args.model_dir)
+        tweets = tweets[~tweets['month'].isin(model.months)]
+        if tweets.empty:
+            logging.info("No new months to add to the topic model")
+            return
+
+    started = time.perf_counter()
+    tokens = tokenize(tweets['text'], args.workers)
+    logging.info(f"Tokenized {len(tokens)} tweets in {time.perf_counter() - started:.2f}s")
+
+    if args.command == "train":
+        TopicModel.train(tokens, args.topics, args.passes, args.workers, tweets['month'].unique()).save(args.model_dir)
+    elif args.command == "update":
+        model.update(tokens, tweets['month'].unique())
+        model.save(args.model_dir)
+    else:
+        model = TopicModel.load(args.model_dir)
+        started = time.perf_counter()
+        topics, scores = model.assign(tokens)
+        logging.info(f"Assigned topics to {len(tokens)} tweets in {time.perf_counter() - started:.2f}s")
+        labels = model.topic_labels()
+        tweets = tweets.assign(lda_topic=topics, lda_topic_label=[labels[topic] for topic in topics],
+                               lda_topic_score=scores)
+        os.makedirs(args.output_dir, exist_ok=True)
+        for slug, part in tweets.groupby('slug'):
+            path = os.path.join(args.output_dir, f"{slug}.csv")
+            part[['tweet_id', 'lda_topic', 'lda_topic_label', 'lda_topic_score']].to_csv(path, index=False)
+            logging.info(f"Wrote topic labels for {len(part)} tweets to {path}")
+
+
+if __name__ == "__main__":
+    main()
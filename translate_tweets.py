@@ -0,0 +1,262 @@
+"""Language detection and English translation stage, filling the language and tweets_transl columns.
+
+    python translate_tweets.py                              # every account, offline Marian translation
+    python translate_tweets.py Fibe --translator identity   # detect languages only, keep the text as is
+"""
+import argparse
+import importlib.metadata
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from config.accounts import resolve_accounts
+from instrumentation import metrics
+from model_cache import DEFAULT_CACHE_PATH, ModelCache
+
+ENGLISH = 'en'
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def _langdetect_chunk(texts):
+    from langdetect import DetectorFactory, LangDetectException, detect
+    # langdetect samples randomly; a fixed seed makes repeated runs agree
+    DetectorFactory.seed = 0
+    languages = []
+    for text in texts:
+        try:
+            languages.append(detect(text))
+        except LangDetectException:
+            # Raised for text with no letters at all (links, numbers, emoji)
+            languages.append(None)
+    return languages
+
+
+class LangdetectDetector:
+    """The notebook's langdetect model, run offline across worker processes."""
+
+    model_id = "langdetect"
+
+    def __init__(self, workers=1, chunk_size=1000):
+        self.version = importlib.metadata.version('langdetect')
+        self.workers = workers
+        self.chunk_size = chunk_size
+
+    def detect(self, texts):
+        if self.workers <= 1 or len(texts) <= self.chunk_size:
+            return _langdetect_chunk(texts)
+        chunks = [texts[start:start + self.chunk_size] for start in range(0, len(texts), self.chunk_size)]
+        with ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            return [language for chunk in executor.map(_langdetect_chunk, chunks) for language in chunk]
+
+
+class TransformersDetector:
+    """XLM-RoBERTa language identification, batched by token length like the sentiment model."""
+
+    model_id = "papluca/xlm-roberta-base-language-detection"
+
+    def __init__(self, batch_size=64):
+        from transformers import pipeline
+        from sentiment_analysis import resolve_model_version
+        self.version = resolve_model_version(self.model_id)
+        self.batch_size = batch_size
+        self.pipeline = pipeline("text-classification", model=self.model_id)
+
+    def detect(self, texts):
+        from sentiment_analysis import run_batches
+        return [label for label, _ in run_batches(self.pipeline, texts, self.batch_size)]
+
+
+class IdentityTranslator:
+    """Local stand-in that returns each text unchanged, for tests and language-only runs."""
+
+    model_id = "identity"
+    version = "1"
+    batch_size = 256
+    max_concurrency = 1
+    # Caching would rebind the translation cache and drop a real model's entries
+    cache_outputs = False
+
+    def translate_batch(self, texts):
+        return list(texts)
+
+
+class MarianTranslator:
+    """Offline many-to-English translation with a local MarianMT model."""
+
+    model_id = "Helsinki-NLP/opus-mt-mul-en"
+    # One pipeline shared across threads; torch already uses every core for a batch
+    max_concurrency = 1
+    cache_outputs = True
+
+    def __init__(self, batch_size=16):
+        from transformers import pipeline
+        from sentiment_analysis import resolve_model_version
+        self.version = resolve_model_version(self.model_id)
+        self.batch_size = batch_size
+        self.pipeline = pipeline("translation", model=self.model_id)
+
+    def translate_batch(self, texts):
+        results = self.pipeline(list(texts), batch_size=self.batch_size, truncation=True)
+        return [result['translation_text'] for result in results]
+
+
+class GoogleTranslator:
+    """The notebook's Google Translate service through deep_translator; needs network access."""
+
+    model_id = "google"
+    version = "1"
+    batch_size = 50
+    max_concurrency = 8
+    cache_outputs = True
+
+    def __init__(self):
+        from deep_translator import GoogleTranslator as Client
+        self.client = Client(source='auto', target=ENGLISH)
+
+    def translate_batch(self, texts):
+        return self.client.translate_batch(list(texts))
+
+
+DETECTORS = {'langdetect': LangdetectDetector, 'xlmr': TransformersDetector}
+TRANSLATORS = {'identity': IdentityTranslator, 'marian': MarianTranslator, 'google': GoogleTranslator}
+
+
+def detect_languages(texts, detector, cache=None):
+    """Return a language code (or None) per text, running the detector once per distinct uncached text."""
+    unique = list(dict.fromkeys(text for text in texts if isinstance(text, str)))
+    known = cache.get_many('language', unique) if cache is not None else {}
+    pending = [text for text in unique if text not in known]
+    if pending:
+        metrics.inc("texts_detected", len(pending))
+        with metrics.timer("language_detection", model=detector.model_id):
+            detected = detector.detect(pending)
+        known.update(zip(pending, detected))
+        if cache is not None:
+            cache.put_many('language', ((text, language) for text, language in zip(pending, detected)
+                                        if language is not None))
+    return [known.get(text) if isinstance(text, str) else None for text in texts]
+
+
+def _translate_with_retry(translator, texts, max_retries, backoff):
+    """Translate one batch, retrying with exponential backoff.
+
+    If the batch keeps failing, each text is tried on its own so one bad input does not
+    fail its neighbours. Texts that still fail come back as None.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            with metrics.timer("translation_batch", model=translator.model_id):
+                translated = translator.translate_batch(texts)
+            if len(translated) != len(texts):
+                raise ValueError(f"expected {len(texts)} translations, got {len(translated)}")
+            return translated
+        except Exception as e:
+            metrics.inc("errors", kind="translation")
+            if attempt == max_retries:
+                logging.warning(f"Translation of {len(texts)} texts failed after {attempt + 1} attempts: {e}")
+                break
+            delay = backoff * 2 ** attempt
+            logging.info(f"Translation attempt {attempt + 1} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+    if len(texts) == 1:
+        return [None]
+    return [_translate_with_retry(translator, [text], min(max_retries, 1), backoff)[0] for text in texts]
+
+
+def translate_texts(texts, languages, translator, cache=None, concurrency=4, max_retries=3, backoff=1.0):
+    """Return an English version of every text, or None where translation kept failing.
+
+    English and undetected texts are passed through untranslated. Distinct texts are
+    translated once, cached results are reused, and batches run on at most concurrency
+    threads. Failures are not cached, so the next run retries them.
+    """
+    cache = cache if translator.cache_outputs else None
+    result = [text if isinstance(text, str) else None for text in texts]
+    targets = [i for i, language in enumerate(languages) if language not in (None, ENGLISH) and result[i]]
+    unique = list(dict.fromkeys(texts[i] for i in targets))
+    known = cache.get_many('translation', unique) if cache is not None else {}
+    pending = [text for text in unique if text not in known]
+
+    failed = 0
+    if pending:
+        batches = [pending[start:start + translator.batch_size]
+                   for start in range(0, len(pending), translator.batch_size)]
+        workers = max(1, min(concurrency, translator.max_concurrency, len(batches)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_translate_with_retry, translator, batch, max_retries, backoff)
+                       for batch in batches]
+            for batch, future in zip(batches, futures):
+                translated = [(text, english) for text, english in zip(batch, future.result()) if english is not None]
+                failed += len(batch) - len(translated)
+                known.update(translated)
+                if cache is not None:
+                    cache.put_many('translation', translated)
+
+    for i in targets:
+        result[i] = known.get(texts[i])
+    logging.info(f"Translated {len(unique) - failed} distinct texts ({len(pending)} uncached, {failed} failed)")
+    return result
+
+
+def translate_file(input_path, output_path, detector, translator, cache=None, concurrency=4, max_retries=3):
+    """Add language and tweets_transl columns to a cleaned tweets CSV and save the result."""
+    df = pd.read_csv(input_path)
+    texts = df['text'].tolist()
+
+    started = time.perf_counter()
+    df['language'] = detect_languages(texts, detector, cache)
+    detect_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    df['tweets_transl'] = translate_texts(texts, df['language'].tolist(), translator, cache, concurrency, max_retries)
+    translate_time = time.perf_counter() - started
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    df.to_csv(output_path, index=False)
+    logging.info(f"{input_path} -> {output_path}: {len(df)} tweets, language detection {detect_time:.1f}s, "
+                 f"translation {translate_time:.1f}s, {df['tweets_transl'].isna().sum()} untranslated")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect tweet languages and translate non-English tweets.")
+    parser.add_argument("accounts", nargs="*", help="Account names or slugs (default: all)")
+    parser.add_argument("--detector", choices=list(DETECTORS), default="langdetect")
+    parser.add_argument("--translator", choices=list(TRANSLATORS), default="marian")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for langdetect")
+    parser.add_argument("--concurrency", type=int, default=4, help="Translation batches in flight")
+    parser.add_argument("--max-retries", type=int, default=3, help="Retries per failed translation batch")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Path of the model output cache")
+    parser.add_argument("--cache-max-mb", type=int, default=256, help="Evict cached outputs beyond this size")
+    parser.add_argument("--no-cache", action="store_true", help="Detect and translate every tweet again")
+    args = parser.parse_args()
+
+    detector = LangdetectDetector(args.workers) if args.detector == "langdetect" else DETECTORS[args.detector]()
+    translator = TRANSLATORS[args.translator]()
+    cache = None if args.no_cache else ModelCache(args.cache, args.cache_max_mb * 1024 * 1024)
+    try:
+        if cache is not None:
+            cache.bind('language', detector.model_id, detector.version)
+            if translator.cache_outputs:
+                cache.bind('translation', translator.model_id, translator.version)
+        for account, config in resolve_accounts(args.accounts):
+            if not os.path.exists(config['cleaned']):
+                logging.warning(f"Skipping {account}: {config['cleaned']} not found; run text_cleaning.py first")
+                continue
+            translate_file(config['cleaned'], config['translated'], detector, translator, cache,
+                           args.concurrency, args.max_retries)
+        if cache is not None:
+            stats = cache.stats()
+            print(f"Cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
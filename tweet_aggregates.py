@@ -0,0 +1,100 @@
+"""Small per-account summary tables read by the dashboard instead of the raw tweets.
+
+    python tweet_aggregates.py            # rebuild every account
+    python tweet_aggregates.py Fibe       # rebuild one account
+"""
+import argparse
+import logging
+import os
+
+import pandas as pd
+
+from config.accounts import resolve_accounts
+from tweet_store import has_dataset, prepare_tweets, read_tweets
+
+AGGREGATES_DIR = "final_tweets/aggregates"
+
+SENTIMENT_SCORES = {'positive': 5, 'neutral': 2.5, 'negative': 0}
+AGGREGATE_COLUMNS = ['timestamp', 'sentiment', 'topics']
+TABLES = ['summary', 'sentiment_counts', 'topic_counts', 'monthly_sentiment', 'monthly_topics']
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def build_aggregates(df):
+    """Compute the dashboard tables for one account from its timestamp, sentiment and topics columns."""
+    sentiment = df['sentiment'].astype(str).where(df['sentiment'].notna())
+    topics = df['topics'].astype(str).where(df['topics'].notna())
+    year_month = df['timestamp'].dt.tz_localize(None).dt.to_period('M').dt.to_timestamp()
+
+    sentiment_counts = sentiment.value_counts().reset_index()
+    sentiment_counts.columns = ['Sentiment', 'Count']
+
+    topic_counts = topics.value_counts().reset_index()
+    topic_counts.columns = ['Topic', 'Count']
+
+    monthly_sentiment = (pd.DataFrame({'year_month': year_month, 'sentiment': sentiment})
+                         .groupby(['year_month', 'sentiment'])
+                         .size()
+                         .reset_index(name='count'))
+
+    monthly_topics = (pd.DataFrame({'year_month': year_month, 'topics': topics})
+                      .groupby(['year_month', 'topics'])
+                      .size()
+                      .reset_index(name='count'))
+
+    summary = pd.DataFrame({
+        'tweets': [len(df)],
+        'score': [sentiment.map(SENTIMENT_SCORES).mean()],
+        'first_tweet': [df['timestamp'].min()],
+        'last_tweet': [df['timestamp'].max()],
+    })
+
+    return {
+        'summary': summary,
+        'sentiment_counts': sentiment_counts,
+        'topic_counts': topic_counts,
+        'monthly_sentiment': monthly_sentiment,
+        'monthly_topics': monthly_topics,
+    }
+
+
+def load_account_columns(config):
+    """Read the columns needed for aggregation from the Parquet dataset, or the final CSV."""
+    if has_dataset(config['slug']):
+        return read_tweets(config['slug'], AGGREGATE_COLUMNS)
+    return prepare_tweets(pd.read_csv(config['final'], usecols=AGGREGATE_COLUMNS))
+
+
+def publish_aggregates(config, aggregates_dir=AGGREGATES_DIR):
+    """Rebuild and save one account's aggregate tables."""
+    tables = build_aggregates(load_account_columns(config))
+    account_dir = os.path.join(aggregates_dir, config['slug'])
+    os.makedirs(account_dir, exist_ok=True)
+    for name, table in tables.items():
+        table.to_parquet(os.path.join(account_dir, f"{name}.parquet"), index=False)
+    logging.info(f"Published aggregates for {config['slug']} to {account_dir}")
+    return tables
+
+
+def has_aggregates(slug, aggregates_dir=AGGREGATES_DIR):
+    account_dir = os.path.join(aggregates_dir, slug)
+    return all(os.path.exists(os.path.join(account_dir, f"{name}.parquet")) for name in TABLES)
+
+
+def read_aggregate(slug, name, aggregates_dir=AGGREGATES_DIR):
+    return pd.read_parquet(os.path.join(aggregates_dir, slug, f"{name}.parquet"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the dashboard's per-account aggregate tables.")
+    parser.add_argument("accounts", nargs="*", help="Account names or slugs (default: all)")
+    parser.add_argument("--aggregates-dir", default=AGGREGATES_DIR)
+    args = parser.parse_args()
+
+    for _, config in resolve_accounts(args.accounts):
+        publish_aggregates(config, args.aggregates_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+from bs4 import BeautifulSoup
+from datetime import date, datetime, time, timedelta, timezone
+import logging
+
+# Tweet IDs are snowflakes: milliseconds since this instant, shifted left by 22 bits
+TWITTER_EPOCH_MS = 1288834974657
+
+
+def parse_count(count_text):
+    """Convert an engagement count such as '12', '1.2K' or '3M' to an int"""
+    # Handle K (thousands) and M (millions) suffixes
+    if 'K' in count_text:
+        return int(float(count_text.replace('K', '')) * 1000)
+    elif 'M' in count_text:
+        return int(float(count_text.replace('M', '')) * 1000000)
+    elif count_text.isdigit():
+        return int(count_text)
+    return 0
+
+
+def empty_tweet_data():
+    return {
+        "tweet_link": None,
+        "tweet_id": None,
+        "author_name": None,
+        "author_handle": None,
+        "text": None,
+        "timestamp": None,
+        "likes": 0,
+        "retweets": 0,
+        "replies": 0,
+        "image_urls": [],
+        "is_reply": False,
+        "reply_to": None,
+        "reply_to_id": None,
+        "conversation_id": None
+    }
+
+
+def extract_tweet_id(tweet_link):
+    """Extract tweet ID from tweet link"""
+    try:
+        return tweet_link.split('/')[-1]
+    except Exception:
+        return None
+
+
+def tweet_id_at(moment):
+    """Return the smallest tweet ID that can have been created at or after a UTC datetime"""
+    return max(0, int(moment.timestamp() * 1000) - TWITTER_EPOCH_MS) << 22
+
+
+def tweet_id_range(start_date, end_date):
+    """Convert an inclusive 'YYYY-MM-DD' UTC date window to a half-open [low, high) tweet ID range.
+
+    IDs from before snowflakes were introduced (November 2010) sort below every range.
+    """
+    start = datetime.combine(date.fromisoformat(start_date), time(), timezone.utc)
+    end = datetime.combine(date.fromisoformat(end_date) + timedelta(days=1), time(), timezone.utc)
+    return tweet_id_at(start), tweet_id_at(end)
+
+
+def tweet_created_at(tweet_id):
+    """Return the UTC creation time encoded in a snowflake tweet ID"""
+    return datetime.fromtimestamp(((int(tweet_id) >> 22) + TWITTER_EPOCH_MS) / 1000, timezone.utc)
+
+
+class SoupExtractor:
+    """Extract tweet records from timeline HTML with BeautifulSoup"""
+
+    name = "soup"
+
+    def parse_articles(self, html):
+        soup = BeautifulSoup(html, 'html.parser')
+        return soup.find_all("article", {"data-testid": "tweet"})
+
+    def get_timestamp(self, tweet):
+        time_element = tweet.find("time")
+        return time_element.get("datetime") if time_element else None
+
+    def get_tweet_id(self, tweet):
+        link_element = tweet.find("a", href=lambda href: href and "/status/" in href)
+        return extract_tweet_id(link_element['href']) if link_element else None
+
+    def extract_count_by_testid(self, tweet, testid):
+        """Extract engagement metrics from tweet"""
+        try:
+            button = tweet.find('button', {'data-testid': testid})
+            if button:
+                span = button.find('span', class_='css-1jxf684')
+                if span:
+                    return parse_count(span.get_text().strip())
+        except Exception as e:
+            logging.error(f"Error extracting {testid} count: {str(e)}")
+        return 0
+
+    def extract_tweet_data(self, tweet):
+        """Extract all data from a tweet element"""
+        try:
+            tweet_data = empty_tweet_data()
+
+            # Extract tweet link and ID
+            link_element = tweet.find("a", href=lambda href: href and "/status/" in href)
+            if link_element:
+                tweet_data["tweet_link"] = "https://x.com" + link_element['href']
+                tweet_data["tweet_id"] = extract_tweet_id(tweet_data["tweet_link"])
+
+            # Extract author information
+            author_element = tweet.find("div", {"data-testid": "User-Name"})
+            if author_element:
+                # Extract author name
+                name_spans = author_element.find_all("span", recursive=True)
+                for span in name_spans:
+                    text = span.get_text().strip()
+                    if text and not text.startswith("@"):
+                        tweet_data["author_name"] = text
+                        break
+
+                # Extract author handle
+                handle_span = author_element.find("span", string=lambda text: text and text.startswith("@"))
+                if handle_span:
+                    tweet_data["author_handle"] = handle_span.text.strip()
+
+            # Extract tweet text
+            text_element = tweet.find("div", {"data-testid": "tweetText"})
+            if text_element:
+                tweet_data["text"] = text_element.get_text(separator=' ').strip()
+
+            # Extract timestamp
+            tweet_data["timestamp"] = self.get_timestamp(tweet)
+
+            # Extract engagement metrics
+            tweet_data["likes"] = self.extract_count_by_testid(tweet, "like")
+            tweet_data["retweets"] = self.extract_count_by_testid(tweet, "retweet")
+            tweet_data["replies"] = self.extract_count_by_testid(tweet, "reply")
+
+            # Extract images
+            images = tweet.find_all("img", {"alt": "Image"})
+            tweet_data["image_urls"] = [img.get("src") for img in images if img.get("src")]
+
+            # Check if it's a reply
+            reply_element = tweet.find("div", string=lambda text: text and "Replying to" in str(text))
+            if reply_element:
+                tweet_data["is_reply"] = True
+                reply_to_element = reply_element.find("a")
+                if reply_to_element:
+                    tweet_data["reply_to"] = reply_to_element.get_text().strip()
+
+            return tweet_data
+
+        except Exception as e:
+            logging.error(f"Error extracting tweet data: {str(e)}")
+            return None
+
+
+def _element_string(element):
+    """Mirror BeautifulSoup's Tag.string: the text of an element whose only content is one string"""
+    children = list(element)
+    if not children:
+        return element.text
+    if len(children) == 1 and not element.text and not children[0].tail and isinstance(children[0].tag, str):
+        return _element_string(children[0])
+    return None
+
+
+def _collapse_whitespace(text):
+    # html.parser in BeautifulSoup stores whitespace-only strings as a single space or newline
+    if text.strip(' \t\n\r\x0c'):
+        return text
+    return '\n' if '\n' in text else ' '
+
+
+def _text_content(element, separator=''):
+    return separator.join(_collapse_whitespace(text) for text in element.itertext() if text)
+
+
+class LxmlExtractor:
+    """Extract tweet records with lxml and precompiled XPath selectors.
+
+    Produces the same records as SoupExtractor; run benchmarks/bench_extractors.py
+    after changing either backend to confirm they still agree.
+    """
+
+    name = "lxml"
+
+    def __init__(self):
+        from lxml import etree, html
+
+        self.html = html
+        self.articles = etree.XPath("//article[@data-testid='tweet']")
+        self.link = etree.XPath(".//a[contains(@href, '/status/')]/@href")
+        self.author = etree.XPath(".//div[@data-testid='User-Name']")
+        self.spans = etree.XPath(".//span")
+        self.handle_candidates = etree.XPath(".//span[starts-with(., '@')]")
+        self.text = etree.XPath(".//div[@data-testid='tweetText']")
+        self.time = etree.XPath("(.//time)[1]/@datetime")
+        self.count_span = etree.XPath(
+            "(.//button[@data-testid=$testid])[1]"
+            "//span[contains(concat(' ', normalize-space(@class), ' '), ' css-1jxf684 ')]"
+        )
+        self.image_srcs = etree.XPath(".//img[@alt='Image']/@src")
+        self.reply_candidates = etree.XPath(".//div[contains(., 'Replying to')]")
+        self.first_link = etree.XPath("(.//a)[1]")
+
+    def parse_articles(self, html):
+        if not html.strip():
+            return []
+        return self.articles(self.html.fromstring(html))
+
+    def get_timestamp(self, tweet):
+        timestamps = self.time(tweet)
+        return str(timestamps[0]) if timestamps else None
+
+    def get_tweet_id(self, tweet):
+        hrefs = self.link(tweet)
+        return extract_tweet_id(str(hrefs[0])) if hrefs else None
+
+    def extract_count_by_testid(self, tweet, testid):
+        """Extract engagement metrics from tweet"""
+        try:
+            spans = self.count_span(tweet, testid=testid)
+            if spans:
+                return parse_count(_text_content(spans[0]).strip())
+        except Exception as e:
+            logging.error(f"Error extracting {testid} count: {str(e)}")
+        return 0
+
+    def extract_tweet_data(self, tweet):
+        """Extract all data from a tweet element"""
+        try:
+            tweet_data = empty_tweet_data()
+
+            hrefs = self.link(tweet)
+            if hrefs:
+                tweet_data["tweet_link"] = "https://x.com" + hrefs[0]
+                tweet_data["tweet_id"] = extract_tweet_id(tweet_data["tweet_link"])
+
+            authors = self.author(tweet)
+            if authors:
+                author_element = authors[0]
+                for span in self.spans(author_element):
+                    text = _text_content(span).strip()
+                    if text and not text.startswith("@"):
+                        tweet_data["author_name"] = text
+                        break
+
+                for span in self.handle_candidates(author_element):
+                    string = _element_string(span)
+                    if string and string.startswith("@"):
+                        tweet_data["author_handle"] = _text_content(span).strip()
+                        break
+
+            text_elements = self.text(tweet)
+            if text_elements:
+                tweet_data["text"] = _text_content(text_elements[0], ' ').strip()
+
+            tweet_data["timestamp"] = self.get_timestamp(tweet)
+
+            tweet_data["likes"] = self.extract_count_by_testid(tweet, "like")
+            tweet_data["retweets"] = self.extract_count_by_testid(tweet, "retweet")
+            tweet_data["replies"] = self.extract_count_by_testid(tweet, "reply")
+
+            tweet_data["image_urls"] = [str(src) for src in self.image_srcs(tweet) if src]
+
+            for candidate in self.reply_candidates(tweet):
+                string = _element_string(candidate)
+                if string and "Replying to" in string:
+                    tweet_data["is_reply"] = True
+                    links = self.first_link(candidate)
+                    if links:
+                        tweet_data["reply_to"] = _text_content(links[0]).strip()
+                    break
+
+            return tweet_data
+
+        except Exception as e:
+            logging.error(f"Error extracting tweet data: {str(e)}")
+            return None
+
+
+EXTRACTORS = {
+    SoupExtractor.name: SoupExtractor,
+    LxmlExtractor.name: LxmlExtractor,
+}
+
+
+def get_extractor(name):
+    try:
+        return EXTRACTORS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown extraction backend: {name}") from None
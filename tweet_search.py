@@ -0,0 +1,208 @@
+"""Full-text search index over every account's tweets, stored in SQLite FTS5.
+
+    python tweet_search.py                          # (re)index every account
+    python tweet_search.py --query "credit limit"   # search from the command line
+"""
+import argparse
+import logging
+import re
+import sqlite3
+import time
+
+import pandas as pd
+
+from config.accounts import resolve_accounts
+from tweet_store import has_dataset, prepare_tweets, read_tweets
+
+INDEX_PATH = "final_tweets/search.sqlite"
+INDEX_COLUMNS = ['tweet_id', 'tweet_link', 'author_name', 'author_handle', 'text', 'timestamp', 'sentiment', 'topics']
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tweets (
+    rowid INTEGER PRIMARY KEY,
+    tweet_id TEXT NOT NULL,
+    account TEXT NOT NULL,
+    tweet_link TEXT,
+    author_name TEXT,
+    author_handle TEXT,
+    text TEXT,
+    timestamp TEXT,
+    sentiment TEXT,
+    topics TEXT
+);
+CREATE INDEX IF NOT EXISTS tweets_account_timestamp ON tweets (account, timestamp);
+CREATE INDEX IF NOT EXISTS tweets_account_sentiment ON tweets (account, sentiment);
+CREATE INDEX IF NOT EXISTS tweets_account_topics ON tweets (account, topics);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS tweets_fts USING fts5(
+    text, author_name, author_handle,
+    content='tweets', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+-- Keep the external-content FTS index in step with the tweets table
+CREATE TRIGGER IF NOT EXISTS tweets_ai AFTER INSERT ON tweets BEGIN
+    INSERT INTO tweets_fts (rowid, text, author_name, author_handle)
+    VALUES (new.rowid, new.text, new.author_name, new.author_handle);
+END;
+CREATE TRIGGER IF NOT EXISTS tweets_ad AFTER DELETE ON tweets BEGIN
+    INSERT INTO tweets_fts (tweets_fts, rowid, text, author_name, author_handle)
+    VALUES ('delete', old.rowid, old.text, old.author_name, old.author_handle);
+END;
+"""
+
+
+def connect(path=INDEX_PATH):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def month_range(month):
+    """The ISO timestamp bounds [start, end) of a 'YYYY-MM' month, as stored in the index"""
+    return month, (pd.Period(month, freq='M') + 1).strftime('%Y-%m')
+
+
+def index_account(conn, account, df, months=None):
+    """Replace one account's rows in the index with the tweets in df.
+
+    With months given ('YYYY-MM'), only the rows of those months are replaced, and df holds
+    just the tweets from them.
+    """
+    rows = pd.DataFrame({
+        'tweet_id': df['tweet_id'].astype(str),
+        'account': account,
+        'tweet_link': df['tweet_link'],
+        'author_name': df['author_name'],
+        'author_handle': df['author_handle'].astype(str).where(df['author_handle'].notna()),
+        'text': df['text'],
+        # ISO-8601 UTC strings sort chronologically, so date filters can use the index
+        'timestamp': df['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'sentiment': df['sentiment'].astype(str).where(df['sentiment'].notna()),
+        'topics': df['topics'].astype(str).where(df['topics'].notna()),
+    })
+    with conn:
+        if months is None:
+            conn.execute("DELETE FROM tweets WHERE account = ?", (account,))
+        for month in months or []:
+            conn.execute("DELETE FROM tweets WHERE account = ? AND timestamp >= ? AND timestamp < ?",
+                         (account, *month_range(month)))
+        conn.executemany(
+            "INSERT INTO tweets (tweet_id, account, tweet_link, author_name, author_handle, text, timestamp, "
+            "sentiment, topics) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows.astype(object).where(rows.notna(), None).itertuples(index=False, name=None)
+        )
+    scope = f" from {', '.join(months)}" if months is not None else ""
+    logging.info(f"Indexed {len(rows)} tweets{scope} for {account}")
+    return len(rows)
+
+
+def index_accounts(names=None, path=INDEX_PATH, months=None):
+    """Index the accounts' tweets; months maps an account to the only months to reindex."""
+    months = months or {}
+    conn = connect(path)
+    try:
+        for account, config in resolve_accounts(names):
+            account_months = months.get(account)
+            if has_dataset(config['slug']):
+                df = read_tweets(config['slug'], INDEX_COLUMNS, months=account_months)
+            else:
+                df = prepare_tweets(pd.read_csv(config['final'], usecols=INDEX_COLUMNS))
+                if account_months is not None:
+                    df = df[df['month'].isin(account_months)]
+            index_account(conn, account, df, account_months)
+        conn.execute("INSERT INTO tweets_fts (tweets_fts) VALUES ('optimize')")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def to_fts_query(text):
+    """Turn free text into an FTS5 query: every word or "quoted phrase" must match; a trailing * matches prefixes."""
+    terms = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', text):
+        if phrase:
+            terms.append('"' + phrase.replace('"', '') + '"')
+            continue
+        prefix = word.endswith('*')
+        word = re.sub(r'[^\w]+', ' ', word).strip()
+        for part in word.split():
+            terms.append(f'"{part}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+def search(conn, query, accounts=None, sentiment=None, topic=None, start_date=None, end_date=None,
+           page=1, page_size=20):
+    """Return (results frame, total matches) for a ranked keyword search with optional filters.
+
+    start_date and end_date are inclusive 'YYYY-MM-DD' strings; page numbers start at 1.
+    """
+    fts_query = to_fts_query(query)
+    if not fts_query:
+        return pd.DataFrame(columns=['account'] + INDEX_COLUMNS), 0
+
+    conditions = ["tweets_fts MATCH ?"]
+    params = [fts_query]
+    if accounts:
+        conditions.append(f"t.account IN ({','.join('?' * len(accounts))})")
+        params.extend(accounts)
+    if sentiment:
+        conditions.append("t.sentiment = ?")
+        params.append(sentiment)
+    if topic:
+        conditions.append("t.topics = ?")
+        params.append(topic)
+    if start_date:
+        conditions.append("t.timestamp >= ?")
+        params.append(str(start_date))
+    if end_date:
+        conditions.append("t.timestamp < date(?, '+1 day')")
+        params.append(str(end_date))
+    where = " AND ".join(conditions)
+
+    # CROSS JOIN keeps the full-text match as the outer loop; with filters the planner would
+    # otherwise walk the tweets indexes and re-run the match for every row
+    total = conn.execute(
+        f"SELECT COUNT(*) FROM tweets_fts CROSS JOIN tweets t ON t.rowid = tweets_fts.rowid WHERE {where}", params
+    ).fetchone()[0]
+    results = pd.read_sql_query(
+        f"""
+        SELECT t.account, t.tweet_id, t.tweet_link, t.author_name, t.author_handle, t.text,
+               t.timestamp, t.sentiment, t.topics
+        FROM tweets_fts CROSS JOIN tweets t ON t.rowid = tweets_fts.rowid
+        WHERE {where}
+        ORDER BY bm25(tweets_fts), t.timestamp DESC
+        LIMIT ? OFFSET ?
+        """,
+        conn,
+        params=params + [page_size, (max(page, 1) - 1) * page_size]
+    )
+    return results, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("accounts", nargs="*", help="Account names or slugs to index or search (default: all)")
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--query", help="Search instead of indexing")
+    parser.add_argument("--page", type=int, default=1)
+    args = parser.parse_args()
+
+    if not args.query:
+        index_accounts(args.accounts, args.index)
+        return
+
+    conn = connect(args.index)
+    names = [account for account, _ in resolve_accounts(args.accounts)] if args.accounts else None
+    started = time.perf_counter()
+    results, total = search(conn, args.query, names, page=args.page)
+    elapsed = (time.perf_counter() - started) * 1000
+    with pd.option_context('display.max_colwidth', 80, 'display.width', 200):
+        print(results[['account', 'timestamp', 'author_handle', 'text']])
+    print(f"{total} matches in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
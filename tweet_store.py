@@ -0,0 +1,98 @@
+"""Columnar copy of final_tweets/*.csv as a Parquet dataset partitioned by account and month.
+
+    python tweet_store.py            # publish every account
+    python tweet_store.py Fibe       # publish one account
+"""
+import argparse
+import logging
+import os
+import shutil
+
+import pandas as pd
+
+from config.accounts import resolve_accounts
+
+DATASET_DIR = "final_tweets/dataset"
+
+# Low-cardinality columns stored as dictionary-encoded categoricals
+CATEGORICAL_COLUMNS = ["sentiment", "topics", "language", "author_handle"]
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def prepare_tweets(df):
+    """Give a final tweets frame native timestamp, numeric and categorical dtypes."""
+    df = df.copy()
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, format="mixed")
+    df["month"] = df["timestamp"].dt.strftime("%Y-%m")
+    df = df.drop(columns=["year_month"], errors="ignore")
+    for column in ["likes", "retweets", "replies"]:
+        if column in df:
+            df[column] = pd.to_numeric(df[column], errors="coerce").fillna(0).astype("int32")
+    if "tweet_id" in df:
+        df["tweet_id"] = df["tweet_id"].astype("int64")
+    if "sentiment_score" in df:
+        df["sentiment_score"] = df["sentiment_score"].astype("float32")
+    for column in CATEGORICAL_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype("category")
+    return df
+
+
+def publish_account(csv_path, slug, dataset_dir=DATASET_DIR, months=None):
+    """Rewrite one account's partitions of the dataset from its final tweets CSV.
+
+    With months given, only those month partitions are rewritten, and partitions for
+    months no longer in the CSV are removed.
+    """
+    df = prepare_tweets(pd.read_csv(csv_path))
+    account_dir = os.path.join(dataset_dir, f"account={slug}")
+    if months is None and os.path.exists(account_dir):
+        shutil.rmtree(account_dir)
+    os.makedirs(account_dir, exist_ok=True)
+    present = set(df["month"].unique())
+    for name in os.listdir(account_dir):
+        if name.startswith("month=") and name[len("month="):] not in present:
+            shutil.rmtree(os.path.join(account_dir, name))
+    written = 0
+    for month, part in df.groupby("month", observed=True):
+        if months is not None and month not in months:
+            continue
+        month_dir = os.path.join(account_dir, f"month={month}")
+        os.makedirs(month_dir, exist_ok=True)
+        part.drop(columns=["month"]).to_parquet(
+            os.path.join(month_dir, "part-0.parquet"), index=False, compression="zstd"
+        )
+        written += len(part)
+    logging.info(f"Published {written} of {len(df)} tweets for {slug} to {account_dir}")
+    return written
+
+
+def has_dataset(slug, dataset_dir=DATASET_DIR):
+    return os.path.isdir(os.path.join(dataset_dir, f"account={slug}"))
+
+
+def read_tweets(slug, columns=None, dataset_dir=DATASET_DIR, months=None):
+    """Read one account's tweets from the dataset, loading only the requested columns and, with
+    months given, only those month partitions."""
+    account_dir = os.path.join(dataset_dir, f"account={slug}")
+    filters = [("month", "in", list(months))] if months is not None else None
+    df = pd.read_parquet(account_dir, columns=list(columns) if columns else None, filters=filters)
+    # The month partition key is only returned when asked for; it is derivable from timestamp
+    if "month" in df and (not columns or "month" not in columns):
+        df = df.drop(columns=["month"])
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish final tweets as a partitioned Parquet dataset.")
+    parser.add_argument("accounts", nargs="*", help="Account names or slugs (default: all)")
+    parser.add_argument("--dataset-dir", default=DATASET_DIR)
+    args = parser.parse_args()
+
+    for _, config in resolve_accounts(args.accounts):
+        publish_account(config['final'], config['slug'], args.dataset_dir)
+
+
+if __name__ == "__main__":
+    main()